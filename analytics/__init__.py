@@ -0,0 +1 @@
+# Make analytics a package
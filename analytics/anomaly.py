@@ -0,0 +1,195 @@
+"""
+Incremental anomaly detection on scan results.
+
+The detector keeps running statistics instead of re-reading history:
+
+- device count per hour-of-week (Welford mean/variance, 168 slots),
+- the set of MACs ever seen,
+- an EWMA of each neighbor AP's signal.
+
+The state is kept as keyed rows (detector_count_stats, detector_known_macs,
+detector_ap_signals) so it survives restarts, and each scan loads and
+upserts only its own hour-of-week slot and the MACs and APs it reported: a
+constant amount of work per reported device or AP, however long the
+history. Anomalies are stored in the anomalies table and published as
+`anomaly_*` scan events.
+"""
+import json
+import math
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import (
+    HOME_WIFI_CHANNEL, ANOMALY_Z_THRESHOLD, ANOMALY_MIN_SAMPLES, ANOMALY_STRONG_SIGNAL_DBM, ANOMALY_EWMA_ALPHA
+)
+from database.db import SessionLocal
+from database.models import (
+    Anomaly, DetectorState, DetectorCountStat, DetectorKnownMac, DetectorApSignal, Device, NeighborNetwork
+)
+
+STATE_NAME = "scan_anomaly"
+
+UNKNOWN_DEVICE = "unknown_device"
+DEVICE_COUNT = "device_count"
+STRONG_NEW_AP = "strong_new_ap"
+
+def hour_of_week(value: datetime) -> int:
+    return value.weekday() * 24 + value.hour  # Monday = 0
+
+def _overlaps_home_channel(channel) -> bool:
+    if HOME_WIFI_CHANNEL is None or channel is None:
+        return False
+    if channel <= 14 and HOME_WIFI_CHANNEL <= 14:
+        return abs(channel - HOME_WIFI_CHANNEL) < 5  # 22 MHz masks, 5 MHz spacing
+    return channel == HOME_WIFI_CHANNEL
+
+class AnomalyDetector:
+    def __init__(self, count_stats=None, known_macs=None, ap_signal=None):
+        self.count_stats = count_stats or {}  # hour_of_week (weekday 0 = Monday) -> [n, mean, m2]
+        self.known_macs = set(known_macs or ())
+        self.ap_signal = ap_signal or {}  # AP mac -> signal EWMA (dBm)
+
+    def _check_count(self, scanned_at: datetime, count: int) -> list[dict]:
+        slot = hour_of_week(scanned_at)
+        n, mean, m2 = self.count_stats.get(slot, [0, 0.0, 0.0])
+        anomalies = []
+        if n >= ANOMALY_MIN_SAMPLES:
+            std = math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+            deviation = count - mean
+            # A flat history (std 0) still flags a change of more than one device
+            if (std > 0 and abs(deviation) > ANOMALY_Z_THRESHOLD * std) or (std == 0 and abs(deviation) > 1):
+                anomalies.append({
+                    "anomaly_type": DEVICE_COUNT,
+                    "device_count": count,
+                    "expected_mean": round(mean, 2),
+                    "expected_std": round(std, 2),
+                    "z_score": round(deviation / std, 2) if std > 0 else None,
+                    "hour_of_week": slot
+                })
+        n += 1
+        delta = count - mean
+        mean += delta / n
+        m2 += delta * (count - mean)
+        self.count_stats[slot] = [n, mean, m2]
+        return anomalies
+
+    def observe(self, scanned_at: datetime, devices=None, networks=None) -> list[dict]:
+        """Update the running statistics with one scan and return the anomalies it triggered."""
+        anomalies = []
+        if devices is not None:
+            for device in devices:
+                if device.mac not in self.known_macs:
+                    anomalies.append({
+                        "anomaly_type": UNKNOWN_DEVICE,
+                        "device_id": device.id,
+                        "hostname": device.hostname,
+                        "mac": device.mac,
+                        "ip": device.ip
+                    })
+                    self.known_macs.add(device.mac)
+            anomalies.extend(self._check_count(scanned_at, len(devices)))
+
+        if networks is not None:
+            for network in networks:
+                signal = network.observed_signal
+                if signal is None:
+                    continue
+                previous = self.ap_signal.get(network.mac)
+                if previous is None:
+                    if signal >= ANOMALY_STRONG_SIGNAL_DBM and _overlaps_home_channel(network.channel):
+                        anomalies.append({
+                            "anomaly_type": STRONG_NEW_AP,
+                            "network_id": network.id,
+                            "ssid": network.ssid,
+                            "mac": network.mac,
+                            "channel": network.channel,
+                            "signal_strength": signal,
+                            "home_channel": HOME_WIFI_CHANNEL
+                        })
+                    self.ap_signal[network.mac] = float(signal)
+                else:
+                    self.ap_signal[network.mac] = ANOMALY_EWMA_ALPHA * signal + (1 - ANOMALY_EWMA_ALPHA) * previous
+        return anomalies
+
+def _save_state(db, count_stats: dict, known_macs, ap_signal: dict, now: datetime):
+    if count_stats:
+        stmt = sqlite_insert(DetectorCountStat)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["hour_of_week"],
+                set_={"n": stmt.excluded.n, "mean": stmt.excluded.mean, "m2": stmt.excluded.m2},
+            ),
+            [{"hour_of_week": slot, "n": n, "mean": mean, "m2": m2} for slot, (n, mean, m2) in count_stats.items()],
+        )
+    if known_macs:
+        db.execute(
+            sqlite_insert(DetectorKnownMac).on_conflict_do_nothing(index_elements=["mac"]),
+            [{"mac": mac, "added_at": now} for mac in known_macs],
+        )
+    if ap_signal:
+        stmt = sqlite_insert(DetectorApSignal)
+        db.execute(
+            stmt.on_conflict_do_update(index_elements=["mac"], set_={"signal_ewma": stmt.excluded.signal_ewma}),
+            [{"mac": mac, "signal_ewma": signal} for mac, signal in ap_signal.items()],
+        )
+
+def _seed(db, row: DetectorState, scanned_at: datetime) -> DetectorState:
+    if row and row.data:
+        # State saved as one JSON blob before the keyed tables existed
+        state = json.loads(row.data)
+        count_stats = {int(k): v for k, v in state["count_stats"].items()}
+        known_macs, ap_signal = state["known_macs"], state["ap_signal"]
+    else:
+        # First run: everything registered before this scan counts as known, not anomalous
+        count_stats = {}
+        known_macs = [
+            mac for (mac,) in
+            db.query(Device.mac).filter(or_(Device.first_seen.is_(None), Device.first_seen < scanned_at)).all()
+        ]
+        ap_signal = {}
+        for mac, signal in db.query(NeighborNetwork.mac, NeighborNetwork.signal_strength).all():
+            try:
+                ap_signal[mac] = float(str(signal).split("(")[0])
+            except (TypeError, ValueError):
+                continue
+    _save_state(db, count_stats, known_macs, ap_signal, scanned_at)
+    row = row or DetectorState(name=STATE_NAME)
+    row.data = None
+    db.add(row)
+    return row
+
+def _load_detector(db, scanned_at: datetime, devices=None, networks=None) -> tuple[DetectorState, AnomalyDetector]:
+    """The detector state this scan touches: its hour-of-week slot and the MACs and APs it reported."""
+    row = db.get(DetectorState, STATE_NAME)
+    if row is None or row.data:
+        row = _seed(db, row, scanned_at)
+
+    slot = hour_of_week(scanned_at)
+    count_stats = {
+        stat.hour_of_week: [stat.n, stat.mean, stat.m2]
+        for stat in db.query(DetectorCountStat).filter(DetectorCountStat.hour_of_week == slot)
+    }
+    macs = [device.mac for device in devices or ()]
+    known_macs = [mac for (mac,) in db.query(DetectorKnownMac.mac).filter(DetectorKnownMac.mac.in_(macs))] if macs else []
+    ap_macs = [network.mac for network in networks or ()]
+    ap_signal = {
+        mac: signal for mac, signal in
+        db.query(DetectorApSignal.mac, DetectorApSignal.signal_ewma).filter(DetectorApSignal.mac.in_(ap_macs))
+    } if ap_macs else {}
+    return row, AnomalyDetector(count_stats, known_macs, ap_signal)
+
+def detect_anomalies(scanned_at: datetime, devices=None, networks=None) -> list[dict]:
+    """Run one scan through the persisted detector and store the anomalies found."""
+    db = SessionLocal()
+    try:
+        row, detector = _load_detector(db, scanned_at, devices, networks)
+        known_before = set(detector.known_macs)
+        anomalies = detector.observe(scanned_at, devices, networks)
+        _save_state(db, detector.count_stats, detector.known_macs - known_before, detector.ap_signal, scanned_at)
+        row.updated_at = datetime.now()
+        for anomaly in anomalies:
+            db.add(Anomaly(detected_at=scanned_at, anomaly_type=anomaly["anomaly_type"], details=json.dumps(anomaly)))
+        db.commit()
+        return anomalies
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+"""
+Per-channel interference scores for neighbor networks.
+
+Sightings are aggregated in SQL to (channel, network, signal) counts and
+then scored with NumPy: every sighting contributes its received power in
+mW, 2.4 GHz channels leak into neighbours in proportion to how much their
+22 MHz masks overlap (channels are 5 MHz apart), and 5 GHz channels only
+interfere with themselves. The score is the average interfering power per
+scan, reported in dBm.
+"""
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, cast, Integer
+from database.models import NeighborNetwork
+from database.shards import iter_segments
+
+CHANNEL_SPACING_MHZ = 5
+CHANNEL_WIDTH_MHZ = 22
+CHANNELS_24GHZ = np.arange(1, 14)  # 14 is Japan-only 802.11b and left out
+
+def overlap_matrix(channels: np.ndarray, sources: np.ndarray) -> np.ndarray:
+    """Fraction of a source channel's mask that falls on each channel (2.4 GHz)."""
+    distance = np.abs(channels[:, None] - sources[None, :]) * CHANNEL_SPACING_MHZ
+    return np.clip(1 - distance / CHANNEL_WIDTH_MHZ, 0, None)
+
+def _load_observations(db, start: datetime = None, end: datetime = None):
+    rows, scan_count = [], 0
+    # Counts add up across monthly shards; the same (channel, network, signal)
+    # may appear once per shard, which the weighted sums below absorb
+    for shards, segment in iter_segments(db, start, end):
+        statuses = shards.statuses
+        # Fall back to the network's last known signal for sightings recorded
+        # before NeighborStatus carried its own reading
+        signal = func.coalesce(statuses.signal_strength, cast(NeighborNetwork.signal_strength, Integer))
+        in_range = segment.clause(statuses.timestamp)
+        rows += (
+            db.query(NeighborNetwork.channel, statuses.network_id, signal, func.count())
+            .join(NeighborNetwork, NeighborNetwork.id == statuses.network_id)
+            .filter(NeighborNetwork.channel.isnot(None), signal.isnot(None), *in_range)
+            .group_by(NeighborNetwork.channel, statuses.network_id, signal)
+            .all()
+        )
+        scan_count += db.query(func.count(func.distinct(statuses.timestamp))).filter(*in_range).scalar() or 0
+
+    if not rows:
+        return None, 0
+    return np.array(rows, dtype=np.float64).T, scan_count
+
+def _to_dbm(power_mw: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.where(power_mw > 0, 10 * np.log10(power_mw), -np.inf)
+
+def channel_congestion(db, start: datetime = None, end: datetime = None) -> dict:
+    columns, scan_count = _load_observations(db, start, end)
+    if columns is None or scan_count == 0:
+        return None
+
+    channel, network_id, signal_dbm, count = columns
+    channel = channel.astype(np.int64)
+    size = max(int(channel.max()), int(CHANNELS_24GHZ[-1])) + 1
+
+    power = np.power(10.0, signal_dbm / 10) * count  # total mW per group
+    power_by_channel = np.bincount(channel, weights=power, minlength=size)
+    sightings_by_channel = np.bincount(channel, weights=count, minlength=size)
+    pairs = np.unique(np.stack([channel, network_id.astype(np.int64)]), axis=1)
+    aps_by_channel = np.bincount(pairs[0], minlength=size)
+
+    # 5 GHz channels only see co-channel power; 2.4 GHz ones add the overlap
+    # from every other 2.4 GHz channel
+    interference = power_by_channel.copy()
+    interference[CHANNELS_24GHZ] = overlap_matrix(CHANNELS_24GHZ, CHANNELS_24GHZ) @ power_by_channel[CHANNELS_24GHZ]
+    interference /= scan_count
+    interference_dbm = _to_dbm(interference)
+
+    scored = np.union1d(np.flatnonzero(sightings_by_channel), CHANNELS_24GHZ)
+    scored = scored[np.argsort(-interference[scored], kind="stable")]
+    channels = [
+        {
+            "channel": int(ch),
+            "band": "2.4GHz" if ch <= 14 else "5GHz",
+            "access_points": int(aps_by_channel[ch]),
+            "sightings": int(sightings_by_channel[ch]),
+            "interference_dbm": round(float(interference_dbm[ch]), 2) if np.isfinite(interference_dbm[ch]) else None,
+        }
+        for ch in scored
+    ]
+
+    return {
+        "scans": int(scan_count),
+        "channels": channels,
+        "least_congested_24ghz_channel": int(CHANNELS_24GHZ[np.argmin(interference[CHANNELS_24GHZ])]),
+    }
@@ -0,0 +1,95 @@
+"""
+Per-device history and uptime analytics.
+
+Everything is computed from the device's presence intervals overlapping
+the range (the (device_id, last_seen) index), so the cost depends on how
+often that device connected in the range rather than on the number of
+scans. Online minutes are the intervals' spans clipped to the range, as in
+/devices/online-time, and are split at hour boundaries for the heatmap and
+the daily totals. Each interval after the first is a reconnect. Results are
+cached per (device, range) until the next scan is published.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import PRESENCE_MAX_GAP_MINUTES, HISTORY_CACHE_SIZE
+from database.models import PresenceInterval
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _hour_pieces(first: datetime, last: datetime):
+    """(start, minutes) pieces of [first, last] cut at hour boundaries."""
+    cursor = first
+    while cursor < last:
+        boundary = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        piece_end = min(boundary, last)
+        yield cursor, (piece_end - cursor).total_seconds() / 60
+        cursor = piece_end
+
+def _reconnects(intervals: list[PresenceInterval], start: datetime) -> list[dict]:
+    reconnects = []
+    for previous, interval in zip(intervals, intervals[1:]):
+        if interval.first_seen < start:
+            continue
+        gap = (interval.first_seen - previous.last_seen).total_seconds() / 60
+        reconnects.append({
+            "at": interval.first_seen.isoformat(),
+            "offline_since": previous.last_seen.isoformat(),
+            "gap_minutes": round(gap, 1),
+            "reason": "gap" if gap > PRESENCE_MAX_GAP_MINUTES else "duration_reset"
+        })
+    return reconnects
+
+def _compute(db, device_id: int, start: datetime, end: datetime) -> dict:
+    intervals = (
+        db.query(PresenceInterval)
+        .filter(
+            PresenceInterval.device_id == device_id,
+            PresenceInterval.last_seen >= start,
+            PresenceInterval.first_seen <= end,
+        )
+        .order_by(PresenceInterval.first_seen)
+        .all()
+    )
+
+    heatmap = [[0] * 24 for _ in range(7)]  # [weekday, 0 = Monday as in the anomaly detector][hour]
+    daily = {}
+    for interval in intervals:
+        for piece_start, minutes in _hour_pieces(max(interval.first_seen, start), min(interval.last_seen, end)):
+            heatmap[piece_start.weekday()][piece_start.hour] += minutes
+            daily[piece_start.date()] = daily.get(piece_start.date(), 0) + minutes
+
+    range_minutes = max((end - start).total_seconds() / 60, 1)
+    online_minutes = round(sum(daily.values()), 2)
+
+    return {
+        "device_id": device_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "uptime_percent": round(min(online_minutes / range_minutes * 100, 100), 2),
+        "online_minutes": online_minutes,
+        "reconnects": _reconnects(intervals, start),
+        "hour_of_week_minutes": [[round(minutes, 2) for minutes in day] for day in heatmap],
+        "daily_online_minutes": [
+            {"date": day.isoformat(), "online_minutes": round(minutes, 2)}
+            for day, minutes in sorted(daily.items())
+        ]
+    }
+
+def device_history(db, device_id: int, start: datetime, end: datetime, scan_marker) -> dict:
+    """History for one device, cached until scan_marker (the latest scan time) changes."""
+    key = (device_id, start, end)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == scan_marker:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    result = _compute(db, device_id, start, end)
+    with _cache_lock:
+        _cache[key] = (scan_marker, result)
+        _cache.move_to_end(key)
+        while len(_cache) > HISTORY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,459 @@
+"""
+Mergeable per-day sketches for approximate long-range statistics.
+
+The exact /devices/stats walks every session row and /networks/stats only
+looks at the latest scan. With ?approx=true both answer for any range of
+days from daily_sketches instead: one small row per day and kind holding
+
+- a HyperLogLog of the device / AP ids seen (2**HLL_PRECISION one-byte
+  registers, relative standard error 1.04 / sqrt(registers) = 1.6%),
+- a merging t-digest of the values seen: online durations for devices,
+  observed signal strength (dBm) for networks. A quantile's rank error is
+  about 2 q (1 - q) / TDIGEST_COMPRESSION, smallest in the tails,
+- a Space-Saving table of the TOP_K ids with the largest duration total
+  (devices) or most sightings (networks); each count over-estimates by at
+  most its error, and no unlisted id can exceed the table's floor,
+- exact scan, sighting and value totals, the extremes with their ids, and
+  the largest scan of the day.
+
+Every part merges (registers by max, digests by re-clustering centroids,
+top-K tables by adding counts), so a range costs one merge per day no
+matter how many scans it holds, and sealed shards are never attached.
+
+publish_scan() folds every scan into today's sketches. Replay rewrites
+scans behind their back and rebuilds the days it touched; the table can be
+rebuilt from device_sessions / neighbor_statuses (shards included) with
+
+    python -m analytics.sketches rebuild [--since 2026-01-01] [--until 2026-03-31]
+"""
+import argparse
+import math
+import struct
+import zlib
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from sqlalchemy import select
+from config import DEVICE_SESSIONS_ENABLED
+from database.db import SessionLocal, engine, init_db
+from database.models import DailySketch
+from database.shards import iter_segments
+
+DEVICES = "devices"
+NETWORKS = "networks"
+KINDS = (DEVICES, NETWORKS)
+
+HLL_PRECISION = 12
+TDIGEST_COMPRESSION = 100
+TOP_K = 64
+QUANTILES = (0.5, 0.9, 0.99)
+
+_MAGIC = b"SK1"
+_HEADER = struct.Struct("<3sBHH")  # magic, HLL precision, t-digest compression, top-K capacity
+_TOTALS = struct.Struct("<qqqdddqq")  # scans, sightings, peak, value sum, low, high, low id, high id
+_COUNT = struct.Struct("<I")
+_TOP = struct.Struct("<Id")  # entries, floor
+
+def _hash64(ids) -> np.ndarray:
+    """splitmix64 finalizer: integer ids to well-mixed 64-bit hashes."""
+    x = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length += shift * high
+        x = np.where(high, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+class HyperLogLog:
+    def __init__(self, precision: int = HLL_PRECISION, registers: np.ndarray = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, ids):
+        if len(ids) == 0:
+            return
+        hashes = _hash64(ids)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = suffix_bits - _bit_length(suffix) + 1  # leading zeros of the suffix + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError(f"cannot merge HyperLogLog precision {other.precision} into {self.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting: near exact for small sets
+        return raw
+
+class TDigest:
+    """Merging t-digest: centroids sorted by mean, at most 4 n q (1 - q) / compression heavy."""
+
+    def __init__(self, compression: int = TDIGEST_COMPRESSION, means: np.ndarray = None, weights: np.ndarray = None):
+        self.compression = compression
+        self.means = means if means is not None else np.zeros(0)
+        self.weights = weights if weights is not None else np.zeros(0)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        # Durations and dBm are integers, so many values collapse into one exact centroid
+        values, counts = np.unique(values, return_counts=True)
+        self.merge_centroids([values], [counts.astype(np.float64)])
+
+    def merge_centroids(self, means: list, weights: list):
+        """Re-cluster this digest together with other centroid arrays."""
+        means, weights = np.concatenate([self.means, *means]), np.concatenate([self.weights, *weights])
+        if not len(means):
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order].tolist(), weights[order].tolist()
+        total = sum(weights)
+        out_means, out_weights = [], []
+        before = 0.0
+        mean, weight = means[0], weights[0]
+        for next_mean, next_weight in zip(means[1:], weights[1:]):
+            merged = weight + next_weight
+            q = (before + merged / 2) / total
+            if merged <= 4 * total * q * (1 - q) / self.compression:
+                mean += (next_mean - mean) * next_weight / merged
+                weight = merged
+            else:
+                out_means.append(mean)
+                out_weights.append(weight)
+                before += weight
+                mean, weight = next_mean, next_weight
+        out_means.append(mean)
+        out_weights.append(weight)
+        self.means, self.weights = np.array(out_means), np.array(out_weights)
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means):
+            return None
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, centers, self.means))
+
+    def rank_error(self, q: float) -> float:
+        """Bound on |estimated rank - q| as a fraction of the count: half the largest centroid allowed at q."""
+        return 2 * q * (1 - q) / self.compression
+
+class TopK:
+    """Space-Saving heavy hitters over weighted keys."""
+
+    def __init__(self, capacity: int = TOP_K, counts: dict = None, errors: dict = None, floor: float = 0.0):
+        self.capacity = capacity
+        self.counts = counts or {}  # key -> over-estimated total
+        self.errors = errors or {}  # key -> maximum over-estimate
+        self.floor = floor  # upper bound on the total of any key not listed
+
+    @classmethod
+    def from_totals(cls, keys, totals, capacity: int = TOP_K) -> "TopK":
+        """Exact table from complete per-key totals, truncated to capacity."""
+        order = np.argsort(-np.asarray(totals, dtype=np.float64), kind="stable")
+        kept = order[:capacity]
+        floor = float(totals[order[capacity]]) if len(order) > capacity else 0.0
+        return cls(capacity, {int(keys[i]): float(totals[i]) for i in kept}, {int(keys[i]): 0.0 for i in kept}, floor)
+
+    def add(self, keys, weights):
+        for key, weight in zip(keys, weights):
+            if key in self.counts:
+                self.counts[key] += weight
+                continue
+            if len(self.counts) >= self.capacity:
+                evicted = min(self.counts, key=self.counts.get)
+                self.floor = max(self.floor, self.counts.pop(evicted))
+                del self.errors[evicted]
+            self.counts[key] = self.floor + weight
+            self.errors[key] = self.floor
+
+    def merge(self, other: "TopK"):
+        keys = set(self.counts) | set(other.counts)
+        counts = {k: self.counts.get(k, self.floor) + other.counts.get(k, other.floor) for k in keys}
+        errors = {k: self.errors.get(k, self.floor) + other.errors.get(k, other.floor) for k in keys}
+        floor = self.floor + other.floor
+        if len(counts) > self.capacity:
+            ranked = sorted(counts, key=counts.get, reverse=True)
+            floor = max(floor, counts[ranked[self.capacity]])
+            counts = {k: counts[k] for k in ranked[:self.capacity]}
+            errors = {k: errors[k] for k in counts}
+        self.counts, self.errors, self.floor = counts, errors, floor
+
+    def top(self, n: int) -> list[tuple[int, float, float]]:
+        """(key, estimated total, maximum over-estimate) for the n largest estimates."""
+        ranked = sorted(self.counts, key=lambda k: (-self.counts[k], k))[:n]
+        return [(k, self.counts[k], self.errors[k]) for k in ranked]
+
+class DaySketch:
+    """Every sketch of one kind over one day (or, once merged, over a range of days)."""
+
+    def __init__(self, kind: str, hll: HyperLogLog = None, digest: TDigest = None, top: TopK = None):
+        self.kind = kind
+        self.hll = hll or HyperLogLog()
+        self.digest = digest or TDigest()
+        self.top = top or TopK()
+        self.scans = 0
+        self.sightings = 0
+        self.peak = 0  # largest single scan
+        self.value_sum = 0.0
+        self.low = (None, None)  # (value, id); devices only count durations above zero, like /devices/stats
+        self.high = (None, None)
+
+    def _extremes(self, keys: np.ndarray, values: np.ndarray):
+        if self.kind == DEVICES:
+            keys, values = keys[values > 0], values[values > 0]
+        if not len(values):
+            return
+        low, high = int(np.argmin(values)), int(np.argmax(values))
+        if self.low[0] is None or values[low] < self.low[0]:
+            self.low = (float(values[low]), int(keys[low]))
+        if self.high[0] is None or values[high] > self.high[0]:
+            self.high = (float(values[high]), int(keys[high]))
+
+    def _weights(self, values: np.ndarray) -> np.ndarray:
+        # Devices rank by summed durations (top5_most_active_all_time), networks by sightings
+        return np.nan_to_num(values) if self.kind == DEVICES else np.ones(len(values))
+
+    def add_scan(self, keys, values):
+        """One scan: the ids seen and their duration / signal (None when unknown)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        known = ~np.isnan(values)
+        self.scans += 1
+        self.sightings += len(keys)
+        self.peak = max(self.peak, len(keys))
+        self.hll.add(keys)
+        self.digest.add(values[known])
+        self.value_sum += float(values[known].sum())
+        self._extremes(keys[known], values[known])
+        self.top.add(keys.tolist(), self._weights(values).tolist())
+
+    @classmethod
+    def from_rows(cls, kind: str, keys, minutes, values) -> "DaySketch":
+        """Build a day in one pass from its history rows (id, scan minute, value)."""
+        sketch = cls(kind)
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        known = ~np.isnan(values)
+        _, per_scan = np.unique(np.asarray(minutes, dtype="datetime64[m]"), return_counts=True)
+        sketch.scans = len(per_scan)
+        sketch.sightings = len(keys)
+        sketch.peak = int(per_scan.max()) if len(per_scan) else 0
+        sketch.hll.add(keys)
+        sketch.digest.add(values[known])
+        sketch.value_sum = float(values[known].sum())
+        sketch._extremes(keys[known], values[known])
+        ids, inverse = np.unique(keys, return_inverse=True)
+        sketch.top = TopK.from_totals(ids, np.bincount(inverse, weights=sketch._weights(values), minlength=len(ids)))
+        return sketch
+
+    @classmethod
+    def merge_all(cls, kind: str, sketches: list) -> "DaySketch":
+        merged = cls(kind)
+        for sketch in sketches:
+            merged.hll.merge(sketch.hll)
+            merged.top.merge(sketch.top)
+            merged.scans += sketch.scans
+            merged.sightings += sketch.sightings
+            merged.peak = max(merged.peak, sketch.peak)
+            merged.value_sum += sketch.value_sum
+            if sketch.low[0] is not None and (merged.low[0] is None or sketch.low[0] < merged.low[0]):
+                merged.low = sketch.low
+            if sketch.high[0] is not None and (merged.high[0] is None or sketch.high[0] > merged.high[0]):
+                merged.high = sketch.high
+        # One re-clustering over every day's centroids instead of one per merge
+        merged.digest.merge_centroids([s.digest.means for s in sketches], [s.digest.weights for s in sketches])
+        return merged
+
+    def to_bytes(self) -> bytes:
+        counts = self.top.counts
+        keys = list(counts)
+        parts = [
+            _HEADER.pack(_MAGIC, self.hll.precision, self.digest.compression, self.top.capacity),
+            _TOTALS.pack(
+                self.scans, self.sightings, self.peak, self.value_sum,
+                math.nan if self.low[0] is None else self.low[0],
+                math.nan if self.high[0] is None else self.high[0],
+                -1 if self.low[1] is None else self.low[1],
+                -1 if self.high[1] is None else self.high[1],
+            ),
+            self.hll.registers.tobytes(),
+            _COUNT.pack(len(self.digest.means)),
+            self.digest.means.astype("<f8").tobytes(),
+            self.digest.weights.astype("<f8").tobytes(),
+            _TOP.pack(len(keys), self.top.floor),
+            np.array(keys, dtype="<i8").tobytes(),
+            np.array([counts[k] for k in keys], dtype="<f8").tobytes(),
+            np.array([self.top.errors[k] for k in keys], dtype="<f8").tobytes(),
+        ]
+        return zlib.compress(b"".join(parts), 6)
+
+    @classmethod
+    def from_bytes(cls, kind: str, data: bytes) -> "DaySketch":
+        raw = zlib.decompress(data)
+        magic, precision, compression, capacity = _HEADER.unpack_from(raw, 0)
+        if magic != _MAGIC:
+            raise ValueError("not a daily sketch")
+        offset = _HEADER.size
+
+        def array(dtype: str, n: int) -> np.ndarray:
+            nonlocal offset
+            values = np.frombuffer(raw, dtype=dtype, count=n, offset=offset).copy()
+            offset += values.nbytes
+            return values
+
+        scans, sightings, peak, value_sum, low, high, low_id, high_id = _TOTALS.unpack_from(raw, offset)
+        offset += _TOTALS.size
+        registers = array("u1", 1 << precision)
+        (n_centroids,) = _COUNT.unpack_from(raw, offset)
+        offset += _COUNT.size
+        means, weights = array("<f8", n_centroids), array("<f8", n_centroids)
+        n_top, floor = _TOP.unpack_from(raw, offset)
+        offset += _TOP.size
+        keys, counts, errors = array("<i8", n_top).tolist(), array("<f8", n_top).tolist(), array("<f8", n_top).tolist()
+
+        sketch = cls(
+            kind, HyperLogLog(precision, registers), TDigest(compression, means, weights),
+            TopK(capacity, dict(zip(keys, counts)), dict(zip(keys, errors)), floor),
+        )
+        sketch.scans, sketch.sightings, sketch.peak, sketch.value_sum = scans, sightings, peak, value_sum
+        sketch.low = (None, None) if math.isnan(low) else (low, low_id)
+        sketch.high = (None, None) if math.isnan(high) else (high, high_id)
+        return sketch
+
+    def distinct(self) -> dict:
+        """HyperLogLog estimate with its standard error and a ~95% interval (two standard errors)."""
+        estimate = self.hll.estimate()
+        error = self.hll.relative_error
+        return {
+            "estimate": round(estimate),
+            "relative_standard_error": round(error, 4),
+            "interval_95": [max(round(estimate * (1 - 2 * error)), 0), round(estimate * (1 + 2 * error))],
+        }
+
+    def quantiles(self) -> dict:
+        return {
+            f"p{round(q * 100)}": {"value": None if value is None else round(value, 2), "rank_error": round(self.digest.rank_error(q), 4)}
+            for q, value in ((q, self.digest.quantile(q)) for q in QUANTILES)
+        }
+
+def record_scan(scanned_at: datetime, devices=None, networks=None):
+    """Fold one published scan into the sketches of its day."""
+    db = SessionLocal()
+    try:
+        day = scanned_at.date()
+        for kind, states in ((DEVICES, devices), (NETWORKS, networks)):
+            if states is None:
+                continue
+            row = db.get(DailySketch, (day, kind)) or DailySketch(day=day, kind=kind)
+            sketch = DaySketch.from_bytes(kind, row.data) if row.data else DaySketch(kind)
+            if kind == DEVICES:
+                sketch.add_scan([d.id for d in states], [d.online_duration for d in states])
+            else:
+                sketch.add_scan([n.id for n in states], [n.observed_signal for n in states])
+            row.data = sketch.to_bytes()
+            row.scans = sketch.scans
+            row.updated_at = datetime.now()
+            db.add(row)
+        db.commit()
+    finally:
+        db.close()
+
+def merge_days(db, kind: str, start: date = None, end: date = None) -> tuple[DaySketch, list[date]]:
+    """Merged sketch of every stored day in [start, end] and the days it covers."""
+    query = db.query(DailySketch).filter(DailySketch.kind == kind)
+    if start is not None:
+        query = query.filter(DailySketch.day >= start)
+    if end is not None:
+        query = query.filter(DailySketch.day <= end)
+    rows = query.order_by(DailySketch.day).all()
+    return DaySketch.merge_all(kind, [DaySketch.from_bytes(kind, row.data) for row in rows]), [row.day for row in rows]
+
+def _history_columns(scope, kind: str):
+    if kind == DEVICES:
+        return scope.sessions, scope.sessions.device_id, scope.sessions.online_duration
+    return scope.statuses, scope.statuses.network_id, scope.statuses.signal_strength
+
+def rebuild_daily_sketches(start: date = None, end: date = None) -> int:
+    """Recompute daily_sketches for the whole days in [start, end] from history; returns the rows written."""
+    lower = datetime.combine(start, time.min) if start else None
+    upper = datetime.combine(end + timedelta(days=1), time.min) if end else None
+    # Without device_sessions there is no device history to rebuild from; keep what the collector recorded
+    kinds = KINDS if DEVICE_SESSIONS_ENABLED else (NETWORKS,)
+    days = {}
+
+    # Shards cannot be ATTACHed inside the write transaction, so history is read on its own connection first
+    with engine.connect() as reader:
+        for kind in kinds:
+            for scope, segment in iter_segments(reader, lower, upper):
+                model, key_column, value_column = _history_columns(scope, kind)
+                stmt = (
+                    select(key_column, model.timestamp, value_column)
+                    .where(*segment.clause(model.timestamp))
+                    .order_by(model.timestamp)
+                )
+                if upper is not None:
+                    stmt = stmt.where(model.timestamp < upper)
+                day, keys, minutes, values = None, [], [], []
+                for key, timestamp, value in reader.execution_options(yield_per=50000).execute(stmt):
+                    if timestamp.date() != day:
+                        if keys:
+                            days[(day, kind)] = DaySketch.from_rows(kind, keys, minutes, values)
+                        day, keys, minutes, values = timestamp.date(), [], [], []
+                    keys.append(key)
+                    minutes.append(timestamp)
+                    values.append(value)
+                if keys:
+                    days[(day, kind)] = DaySketch.from_rows(kind, keys, minutes, values)
+
+    db = SessionLocal()
+    try:
+        query = db.query(DailySketch).filter(DailySketch.kind.in_(kinds))
+        if start is not None:
+            query = query.filter(DailySketch.day >= start)
+        if end is not None:
+            query = query.filter(DailySketch.day <= end)
+        query.delete(synchronize_session=False)
+        for (day, kind), sketch in days.items():
+            db.add(DailySketch(day=day, kind=kind, scans=sketch.scans, data=sketch.to_bytes()))
+        db.commit()
+    finally:
+        db.close()
+    return len(days)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-day approximate statistics sketches.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--since", help="first day to rebuild (YYYY-MM-DD), default: all history")
+    parser.add_argument("--until", help="last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    init_db()
+    written = rebuild_daily_sketches(
+        date.fromisoformat(args.since) if args.since else None,
+        date.fromisoformat(args.until) if args.until else None,
+    )
+    print(f"Rebuilt {written} daily sketch(es).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Time-bucketed device activity.
+
+Hourly and daily buckets come from the device_activity rollup
+(database/activity.py): one row per device and bucket, so a query is one
+indexed range scan over (buckets x devices seen) rows however many scans the
+range holds. 5-minute buckets are built from the per-scan presence bitmaps
+and the scans' intervals, which costs one small row per scan instead of one
+per device sighting. New devices are counted from devices.first_seen.
+
+Buckets are counted whole: a range starting mid-bucket reports that
+bucket's full activity. Online minutes add up the collection interval of
+every scan that saw the device.
+"""
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func
+from config import COLLECTOR_INTERVAL_MINUTES
+from database.activity import ROLLUP_SECONDS, bucket_start, epoch, from_epoch
+from database.models import Device, DeviceActivity, PresenceBitmap, Scan
+from database.presence_bitmap import decode
+
+BUCKET_SECONDS = {"5m": 300, "1h": 3600, "1d": 86400}
+
+def _rollup_activity(db, start: datetime, end: datetime, size: int, port_type: str = None) -> dict:
+    activity = (
+        db.query(DeviceActivity.bucket_start, func.count(), func.sum(DeviceActivity.online_minutes))
+        .filter(
+            DeviceActivity.bucket_seconds == size,
+            DeviceActivity.bucket_start.between(bucket_start(start, size), end),
+        )
+        .group_by(DeviceActivity.bucket_start)
+    )
+    if port_type:
+        activity = activity.join(Device, Device.id == DeviceActivity.device_id).filter(Device.port_type == port_type)
+    return {epoch(b): (devices, minutes) for b, devices, minutes in activity.all()}
+
+def _bitmap_activity(db, start: datetime, end: datetime, size: int, port_type: str = None) -> dict:
+    scans = (
+        db.query(PresenceBitmap, func.coalesce(Scan.interval_minutes, COLLECTOR_INTERVAL_MINUTES))
+        .join(Scan, Scan.id == PresenceBitmap.scan_id)
+        .filter(PresenceBitmap.scanned_at.between(bucket_start(start, size), end))
+        .order_by(PresenceBitmap.scanned_at)
+        .all()
+    )
+    mask = None
+    if port_type:
+        device_ids = [device_id for device_id, in db.query(Device.id).filter(Device.port_type == port_type).all()]
+        width = max([b.width for b, _ in scans] + device_ids, default=0) + 1
+        mask = np.zeros(width, dtype=bool)
+        mask[device_ids] = True
+
+    activity = {}
+    current, seen, minutes = None, None, 0.0
+    for bitmap, interval in scans:
+        b = epoch(bitmap.scanned_at) // size * size
+        if b != current:
+            if current is not None:
+                activity[current] = (int(seen.sum()), minutes)
+            current, seen, minutes = b, np.zeros(0, dtype=bool), 0.0
+        online = np.unpackbits(decode(bitmap), bitorder="little").astype(bool)[:bitmap.width]
+        if mask is not None:
+            online &= mask[:len(online)]
+        if len(online) > len(seen):
+            seen = np.concatenate([seen, np.zeros(len(online) - len(seen), dtype=bool)])
+        seen[:len(online)] |= online
+        minutes += int(online.sum()) * interval
+    if current is not None:
+        activity[current] = (int(seen.sum()), minutes)
+    return activity
+
+def device_timeline(db, start: datetime, end: datetime, bucket: str = "1h", port_type: str = None) -> list[dict]:
+    size = BUCKET_SECONDS[bucket]
+    if size in ROLLUP_SECONDS:
+        active_by_bucket = _rollup_activity(db, start, end, size, port_type)
+    else:
+        active_by_bucket = _bitmap_activity(db, start, end, size, port_type)
+
+    new_devices = db.query(Device.first_seen).filter(Device.first_seen.between(start, end))
+    if port_type:
+        new_devices = new_devices.filter(Device.port_type == port_type)
+    new_by_bucket = {}
+    for (first,) in new_devices.all():
+        b = epoch(first) // size * size
+        new_by_bucket[b] = new_by_bucket.get(b, 0) + 1
+
+    # Zero-fill so the series has one point per bucket in the range
+    timeline = []
+    for b in range(epoch(start) // size * size, epoch(end) + 1, size):
+        devices, minutes = active_by_bucket.get(b, (0, 0))
+        timeline.append({
+            "bucket_start": from_epoch(b).isoformat(),
+            "distinct_devices": devices,
+            "new_devices": new_by_bucket.get(b, 0),
+            "online_minutes": round(minutes, 2)
+        })
+    return timeline
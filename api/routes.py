@@ -1,18 +1,51 @@
-from flask import Flask, jsonify, request
-from flasgger import Swagger
-from router.scraper import RouterScraper
-from database.db import init_db, SessionLocal
-from database.models import Device, DeviceSession, NeighborNetwork, NeighborStatus
-from config import ROUTER_URL, USERNAME, PASSWORD, COLLECTOR_ENABLED, COLLECTOR_INTERVAL_MINUTES
+from functools import wraps
+import json
+from flask import Flask, jsonify, request, Response, stream_with_context
+from database.db import SessionLocal
+from database.models import (
+    Device, NeighborNetwork, NeighborStatus, PresenceInterval, PresenceBitmap, Anomaly, CollectionRun
+)
+from config import (
+    COLLECTOR_ENABLED, COLLECTOR_INTERVAL_MINUTES, API_READ_ONLY, SWAGGER_ENABLED, EVENT_POLL_SECONDS
+)
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
-from collector import start_collector_background, stop_collector_background, is_collector_running
+from sqlalchemy import func, and_, case
+from database.presence import online_at, online_minutes
+from database import presence_bitmap
+from database.run_ledger import run_to_dict, summarize_runs
+from database.shards import iter_segments
+from analytics.congestion import channel_congestion
+from analytics.timeline import device_timeline, BUCKET_SECONDS
+from analytics.history import device_history
+from analytics import sketches
+from database.export import iter_export, EXPORT_FORMATS, DEFAULT_CHUNK_SIZE
+from summary_cache import get_summary
+from snapshot import get_snapshot
+from events import event_feed
+from collector import collect_data, start_collector_background, stop_collector_background, get_collector_status, is_collector_running
+from oui import lookup_vendor
+from router.governor import router_session, governor_stats, RouterBusyError, INTERACTIVE
 from flask import request, abort
 
+# Selenium/BeautifulSoup (router.scraper) are only imported by router_session()
+# when a handler talks to the router, so read-only workers never load them.
+# The schema is created once by main.py / gunicorn.conf.py rather than on
+# every import.
+
 app = Flask(__name__)
-swagger = Swagger(app)
 
-init_db()
+if SWAGGER_ENABLED:
+    from flasgger import Swagger
+    swagger = Swagger(app)
+
+def requires_router(view):
+    """Reject endpoints that scrape the router in read-only mode."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if API_READ_ONLY:
+            return jsonify({"error": "Not available: API is running in read-only mode"}), 403
+        return view(*args, **kwargs)
+    return wrapper
 
 @app.before_request
 def limit_remote_addr():
@@ -24,6 +57,8 @@ def limit_remote_addr():
 def start_collector():
     """
     Start the background collector.
+    Only flips the shared collector state, so it also works on read-only
+    workers; the scraping happens in the leader or external collector process.
     ---
     tags:
       - Collector
@@ -82,14 +117,84 @@ def collector_status():
                 collector_status:
                   type: string
                   example: running
+                leader_pid:
+                  type: integer
+                  description: PID of the process currently holding collector leadership
+                leader_role:
+                  type: string
+                  description: embedded (an API process) or standalone (python -m collector)
+                mode:
+                  type: string
+                  description: COLLECTOR_MODE of this API process
+                heartbeat_at:
+                  type: string
+                  format: date-time
+                last_run_at:
+                  type: string
+                  format: date-time
+                  description: Last device scan
+                last_network_run_at:
+                  type: string
+                  format: date-time
+                  description: Last neighbor AP scan
+                adaptive:
+                  type: object
+                  description: Current device / neighbor intervals and smoothed changes per minute (COLLECTOR_ADAPTIVE only)
     """
-    status = "running" if is_collector_running() else "stopped"
-    return jsonify({"collector_status": status})
+    state = get_collector_status()
+    status = "running" if state["running"] else "stopped"
+    return jsonify({"collector_status": status, **state})
+
+@app.route('/collector/runs', methods=['GET'])
+def collector_runs():
+    """
+    Recent collection runs with per-phase timings and percentile summaries.
+    ---
+    tags:
+      - Collector
+    parameters:
+      - name: trigger
+        in: query
+        type: string
+        enum: [collector, manual_devices, manual_networks]
+      - name: since
+        in: query
+        type: string
+        format: date-time
+        description: Summarize runs started after this timestamp (ISO 8601), defaults to 7 days ago
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+        description: Number of most recent runs to list
+    responses:
+      200:
+        description: Runs newest first, plus p50/p95/p99/max of run and phase durations
+    """
+    trigger = request.args.get('trigger')
+    since = parse_datetime_safe(request.args.get('since')) or datetime.now() - timedelta(days=7)
+    limit = min(max(request.args.get('limit', default=50, type=int), 1), 1000)
+
+    db = SessionLocal()
+    query = db.query(CollectionRun).filter(CollectionRun.started_at >= since)
+    if trigger:
+        query = query.filter(CollectionRun.trigger == trigger)
+    runs = query.order_by(CollectionRun.started_at.desc()).all()
+    db.close()
+
+    return jsonify({
+        "since": since.isoformat(),
+        "summary": summarize_runs(runs),
+        "entries": [run_to_dict(r) for r in runs[:limit]]
+    })
 
 @app.route('/devices/collect', methods=['POST'])
+@requires_router
 def collect_devices():
     """
     Collect active devices from the router.
+    Runs one device scan through the collector's write path (batched,
+    resumable, with its scan row, presence bitmap and activity rollup).
     ---
     tags:
       - Devices
@@ -104,42 +209,16 @@ def collect_devices():
                 status:
                   type: string
                   example: devices collected
+      503:
+        description: No router session slot became free in time
     """
-    scraper = RouterScraper(ROUTER_URL)
-    scraper.login(USERNAME, PASSWORD)
-    devices = scraper.scrape_all()
-    db = SessionLocal()
-
-    for device in devices:
-        if device.status.lower() != "online":
-            continue  # Only save active devices
-
-        existing_device = db.query(Device).filter(Device.mac == device.mac).first()
-
-        if existing_device:
-            existing_device.hostname = device.hostname
-            existing_device.ip = device.ip
-            existing_device.port_type = device.port_type
-        else:
-            existing_device = Device(
-                hostname=device.hostname,
-                ip=device.ip,
-                mac=device.mac,
-                port_type=device.port_type,
-            )
-            db.add(existing_device)
-            db.flush()
-
-        session = DeviceSession(
-            device_id=existing_device.id,
-            timestamp=datetime.now(),
-            online_duration=device.duration
-        )
-        db.add(session)
-
-    db.commit()
-    db.close()
-    scraper.quit()
+    # While the collector runs its scans already stand for this time, so a
+    # manual scan adds sightings but no online minutes
+    interval_minutes = 0 if is_collector_running() else None
+    try:
+        collect_data("manual_devices", scan_neighbors=False, interval_minutes=interval_minutes, priority=INTERACTIVE)
+    except RouterBusyError as e:
+        return jsonify({"error": str(e)}), 503
     return jsonify({"status": "devices collected"})
 
 @app.route('/devices/list', methods=['GET'])
@@ -164,6 +243,7 @@ def get_devices_list():
     results = [d.__dict__ for d in devices]
     for r in results:
         r.pop('_sa_instance_state', None)
+        r['vendor'] = lookup_vendor(r.get('mac'))
     db.close()
     return jsonify(results)
 
@@ -196,18 +276,142 @@ def get_device(device_id):
             "hostname": device.hostname,
             "ip": device.ip,
             "mac": device.mac,
+            "vendor": lookup_vendor(device.mac),
             "port_type": device.port_type
         })
     else:
         return jsonify({"error": "Device not found"}), 404
 
+@app.route('/devices/<int:device_id>/history', methods=['GET'])
+def get_device_history(device_id):
+    """
+    Uptime, reconnects and activity patterns of one device.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: device_id
+        in: path
+        type: integer
+        required: true
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601), defaults to 7 days before end
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601), defaults to the latest scan
+    responses:
+      200:
+        description: Uptime percentage, reconnect events, hour-of-week heatmap (weekday 0 = Monday, as hour_of_week in /anomalies) and daily online minutes
+      400:
+        description: start is after end
+      404:
+        description: Device not found
+    """
+    db = SessionLocal()
+    if not db.query(Device.id).filter(Device.id == device_id).first():
+        db.close()
+        return jsonify({"error": "Device not found"}), 404
+
+    snapshot = get_snapshot()
+    if snapshot and snapshot.devices_scanned_at:
+        latest_scan = snapshot.devices_scanned_at
+    else:
+        latest_scan = db.query(func.max(PresenceInterval.last_seen)).scalar()
+
+    end_time = parse_datetime_safe(request.args.get('end')) or latest_scan or datetime.now()
+    start_time = parse_datetime_safe(request.args.get('start')) or end_time - timedelta(days=7)
+    if start_time > end_time:
+        db.close()
+        return jsonify({"error": "start must be before end"}), 400
+
+    history = device_history(db, device_id, start_time, end_time, latest_scan)
+    db.close()
+    return jsonify(history)
+
+def _approx_days():
+    """Whole days covered by the start / end query parameters of an approx=true request."""
+    start = parse_datetime_safe(request.args.get('start'))
+    end = parse_datetime_safe(request.args.get('end'))
+    if start and end and start > end:
+        return None, None, (jsonify({"error": "start must be before end"}), 400)
+    return start.date() if start else None, end.date() if end else None, None
+
+def _approx_range(days) -> dict:
+    return {"approx": True, "first_day": days[0].isoformat(), "last_day": days[-1].isoformat(), "days": len(days)}
+
+def _approx_device_stats():
+    start, end, error = _approx_days()
+    if error:
+        return error
+    db = SessionLocal()
+    sketch, days = sketches.merge_days(db, sketches.DEVICES, start, end)
+    if not days or not sketch.sightings:
+        db.close()
+        return jsonify({"error": "No sketches available for this range"}), 404
+
+    top = sketch.top.top(5)
+    low, high = sketch.low, sketch.high
+    names = {
+        d.id: d.hostname
+        for d in db.query(Device.id, Device.hostname).filter(Device.id.in_([k for k, _, _ in top] + [low[1], high[1]])).all()
+    }
+    db.close()
+
+    return jsonify({
+        **_approx_range(days),
+        "scans": sketch.scans,
+        "sightings": sketch.sightings,
+        "distinct_devices": sketch.distinct(),
+        "historical_max_connected_devices": sketch.peak,
+        "mean_online_duration_minutes": round(sketch.value_sum / sketch.digest.count, 2) if sketch.digest.count else None,
+        "online_duration_quantiles": sketch.quantiles(),
+        "longest_connection": {
+            "device_id": high[1], "hostname": names.get(high[1], "--"), "minutes": high[0]
+        } if high[0] is not None else None,
+        "shortest_connection": {
+            "device_id": low[1], "hostname": names.get(low[1], "--"), "minutes": low[0]
+        } if low[0] is not None else None,
+        "top5_most_active": [
+            {"device_id": k, "hostname": names.get(k, "--"), "total_minutes": count, "max_overestimate": over}
+            for k, count, over in top
+        ]
+    })
+
 @app.route('/devices/stats', methods=['GET'])
 def device_stats():
     """
     Retrieve statistics about devices and their sessions.
+    Each presence interval counts as one connection, as long as the online
+    time the router reported at its last sighting; the historical maximum is
+    the largest scan in the presence bitmaps.
+    With approx=true the statistics cover [start, end] and are merged from the
+    per-day sketches instead of scanning session history: distinct devices
+    come with their relative standard error, duration quantiles with their
+    rank error and each top device with its maximum over-estimate. Days are
+    included whole.
     ---
     tags:
       - Devices
+    parameters:
+      - name: approx
+        in: query
+        type: boolean
+        description: Answer from the per-day sketches, default false
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: First day of the range (approx only), defaults to the oldest sketch
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: Last day of the range (approx only), defaults to the newest sketch
     responses:
       200:
         description: Device session statistics
@@ -215,42 +419,51 @@ def device_stats():
           application/json:
             schema:
               type: object
+      400:
+        description: start is after end
+      404:
+        description: No data (or no sketches in the range)
     """
+    if request.args.get('approx', default='false', type=str).lower() == 'true':
+        return _approx_device_stats()
+
     db = SessionLocal()
     devices = db.query(Device).all()
-    sessions = db.query(DeviceSession).order_by(DeviceSession.timestamp).all()
-
-    if not devices or not sessions:
-        db.close()
-        return jsonify({"error": "No data available"}), 404
 
     device_id_to_hostname = {device.id: device.hostname for device in devices}
     device_id_to_port_type = {device.id: device.port_type for device in devices}
 
-    scans = {}
-    for session in sessions:
-        minute_key = session.timestamp.replace(second=0, microsecond=0)
-        scans.setdefault(minute_key, []).append(session)
-
-    sorted_scans = sorted(scans.items())
-
-    last_scan_timestamp, last_scan_sessions = sorted_scans[-1]
+    # Every presence interval is one connection; its last reported duration is
+    # how long that connection lasted
+    reported = PresenceInterval.last_duration
+    per_device = (
+        db.query(
+            PresenceInterval.device_id,
+            func.sum(func.coalesce(reported, 0)),
+            func.max(reported),
+            func.min(case((reported > 0, reported))),
+        )
+        .group_by(PresenceInterval.device_id)
+        .all()
+    )
+    if not devices or not per_device:
+        db.close()
+        return jsonify({"error": "No data available"}), 404
 
-    current_connected_devices = len(last_scan_sessions)
-    historical_max = max(len(scan) for _, scan in sorted_scans)
+    device_durations = {device_id: total for device_id, total, _, _ in per_device}
+    device_longest_online = {device_id: longest for device_id, _, longest, _ in per_device if longest is not None}
+    device_shortest_online = {device_id: shortest for device_id, _, _, shortest in per_device if shortest is not None}
+    historical_max = db.query(func.max(PresenceBitmap.online_count)).scalar() or 0
 
-    device_durations = {}
-    device_longest_online = {}
-    device_shortest_online = {}
+    snapshot = get_snapshot()
+    if snapshot and snapshot.devices_scanned_at:
+        last_scan = [(device.id, device.online_duration) for device in snapshot.devices]
+    else:
+        latest = db.query(func.max(PresenceInterval.last_seen)).scalar()
+        last_scan = db.query(PresenceInterval.device_id, PresenceInterval.last_duration).filter(PresenceInterval.last_seen == latest).all()
+    historical_max = max(historical_max, len(last_scan))
 
-    for session in sessions:
-        device_durations[session.device_id] = device_durations.get(session.device_id, 0) + session.online_duration
-        device_longest_online[session.device_id] = max(device_longest_online.get(session.device_id, 0), session.online_duration)
-        if session.online_duration > 0:
-            if session.device_id not in device_shortest_online:
-                device_shortest_online[session.device_id] = session.online_duration
-            else:
-                device_shortest_online[session.device_id] = min(device_shortest_online[session.device_id], session.online_duration)
+    current_connected_devices = len(last_scan)
 
     longest_connection = None
     shortest_connection = None
@@ -281,14 +494,14 @@ def device_stats():
         for dev_id, duration in top5_all_time
     ]
 
-    top5_last_scan = sorted(last_scan_sessions, key=lambda x: x.online_duration, reverse=True)[:5]
+    top5_last_scan = sorted(last_scan, key=lambda x: x[1] or 0, reverse=True)[:5]
     top5_last_scan_result = [
         {
-            "device_id": session.device_id,
-            "hostname": device_id_to_hostname.get(session.device_id, "--"),
-            "online_minutes": session.online_duration
+            "device_id": dev_id,
+            "hostname": device_id_to_hostname.get(dev_id, "--"),
+            "online_minutes": minutes
         }
-        for session in top5_last_scan
+        for dev_id, minutes in top5_last_scan
     ]
 
     port_type_usage = {}
@@ -350,8 +563,6 @@ def filter_devices():
       200:
         description: Filtered devices list
     """
-    db = SessionLocal()
-
     ip_start = request.args.get('ip_start')
     ip_end = request.args.get('ip_end')
     port_type = request.args.get('port_type')
@@ -359,24 +570,38 @@ def filter_devices():
     start_time = parse_datetime_safe(request.args.get('start'))
     end_time = parse_datetime_safe(request.args.get('end'))
 
-    query = db.query(Device)
-
-    if ip_start and ip_end:
-        query = query.filter(and_(Device.ip >= ip_start, Device.ip <= ip_end))
+    snapshot = get_snapshot() if batch_type == 'recent' else None
+    if snapshot and snapshot.devices_scanned_at:
+        # Current devices come from the live snapshot, no database round trip
+        results = [
+            d for d in snapshot.devices
+            if (not (ip_start and ip_end) or (d.ip is not None and ip_start <= d.ip <= ip_end))
+            and (not port_type or d.port_type == port_type)
+        ]
+    else:
+        db = SessionLocal()
+        query = db.query(Device)
 
-    if port_type:
-        query = query.filter(Device.port_type == port_type)
+        if ip_start and ip_end:
+            query = query.filter(and_(Device.ip >= ip_start, Device.ip <= ip_end))
 
-    if batch_type == 'recent':
-        latest_timestamp = db.query(DeviceSession.timestamp).order_by(DeviceSession.timestamp.desc()).first()
-        if latest_timestamp:
-            recent_device_ids = db.query(DeviceSession.device_id).filter(DeviceSession.timestamp == latest_timestamp[0]).subquery()
-            query = query.filter(Device.id.in_(recent_device_ids))
-    elif batch_type == 'timeframe' and start_time and end_time:
-        ids_in_time = db.query(DeviceSession.device_id).filter(DeviceSession.timestamp.between(start_time, end_time)).subquery()
-        query = query.filter(Device.id.in_(ids_in_time))
+        if port_type:
+            query = query.filter(Device.port_type == port_type)
+
+        if batch_type == 'recent':
+            latest = db.query(func.max(PresenceInterval.last_seen)).scalar()
+            if latest:
+                recent_device_ids = db.query(PresenceInterval.device_id).filter(PresenceInterval.last_seen == latest)
+                query = query.filter(Device.id.in_(recent_device_ids))
+        elif batch_type == 'timeframe' and start_time and end_time:
+            # Devices with a presence interval overlapping the range
+            ids_in_time = db.query(PresenceInterval.device_id).filter(
+                PresenceInterval.first_seen <= end_time, PresenceInterval.last_seen >= start_time
+            )
+            query = query.filter(Device.id.in_(ids_in_time))
 
-    results = query.all()
+        results = query.all()
+        db.close()
 
     filtered = []
     for d in results:
@@ -385,17 +610,441 @@ def filter_devices():
             'hostname': d.hostname,
             'ip': d.ip,
             'mac': d.mac,
+            'vendor': lookup_vendor(d.mac),
             'port_type': d.port_type
         })
 
-    db.close()
-
     return jsonify({
         "total_matched": len(filtered),
         "filters_used": request.args.to_dict(),
         "entries": filtered
     })
 
+@app.route('/devices/online', methods=['GET'])
+def devices_online_at():
+    """
+    List devices that were online at a point in time, from presence intervals.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: at
+        in: query
+        type: string
+        format: date-time
+        description: Point in time (ISO 8601), defaults to now
+    responses:
+      200:
+        description: Devices online at the given time
+    """
+    at = parse_datetime_safe(request.args.get('at')) or datetime.now()
+    db = SessionLocal()
+    intervals = online_at(db, at)
+    devices = {d.id: d for d in db.query(Device).filter(Device.id.in_([i.device_id for i in intervals])).all()}
+    db.close()
+
+    entries = []
+    for interval in intervals:
+        device = devices.get(interval.device_id)
+        entries.append({
+            "device_id": interval.device_id,
+            "hostname": device.hostname if device else "--",
+            "mac": device.mac if device else None,
+            "vendor": lookup_vendor(device.mac) if device else None,
+            "online_since": interval.first_seen.isoformat(),
+            "last_seen": interval.last_seen.isoformat()
+        })
+
+    return jsonify({
+        "at": at.isoformat(),
+        "total_online": len(entries),
+        "entries": entries
+    })
+
+@app.route('/devices/online-time', methods=['GET'])
+def devices_online_time():
+    """
+    Total online minutes per device over a time range, from presence intervals.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601), defaults to 24 hours before end
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601), defaults to now
+      - name: device_id
+        in: query
+        type: integer
+        description: Restrict to a single device
+    responses:
+      200:
+        description: Online minutes per device, most active first
+    """
+    end_time = parse_datetime_safe(request.args.get('end')) or datetime.now()
+    start_time = parse_datetime_safe(request.args.get('start')) or end_time - timedelta(days=1)
+    device_id = request.args.get('device_id', type=int)
+
+    db = SessionLocal()
+    minutes = online_minutes(db, start_time, end_time, device_id)
+    hostnames = dict(db.query(Device.id, Device.hostname).filter(Device.id.in_(list(minutes))).all())
+    db.close()
+
+    entries = [
+        {
+            "device_id": dev_id,
+            "hostname": hostnames.get(dev_id, "--"),
+            "online_minutes": total
+        }
+        for dev_id, total in sorted(minutes.items(), key=lambda x: x[1], reverse=True)
+    ]
+
+    return jsonify({
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "entries": entries
+    })
+
+def _presence_devices(db, device_ids) -> dict:
+    return {d.id: d for d in db.query(Device).filter(Device.id.in_(list(device_ids))).all()}
+
+@app.route('/devices/presence/at', methods=['GET'])
+def devices_presence_at():
+    """
+    Devices online in the scan closest before a point in time, from the presence bitmaps.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: at
+        in: query
+        type: string
+        format: date-time
+        description: Point in time (ISO 8601), defaults to now
+    responses:
+      200:
+        description: The scan used and the devices online in it
+      404:
+        description: No scan ran within PRESENCE_MAX_GAP_MINUTES before that time
+    """
+    at = parse_datetime_safe(request.args.get('at')) or datetime.now()
+    db = SessionLocal()
+    bitmap = presence_bitmap.bitmap_at(db, at)
+    if bitmap is None:
+        db.close()
+        return jsonify({"error": "No scan near that time"}), 404
+    device_ids = presence_bitmap.members(presence_bitmap.decode(bitmap))
+    devices = _presence_devices(db, device_ids)
+    db.close()
+
+    return jsonify({
+        "at": at.isoformat(),
+        "scan_id": bitmap.scan_id,
+        "scanned_at": bitmap.scanned_at.isoformat(),
+        "total_online": len(device_ids),
+        "entries": [
+            {
+                "device_id": device_id,
+                "hostname": devices[device_id].hostname if device_id in devices else "--",
+                "mac": devices[device_id].mac if device_id in devices else None
+            }
+            for device_id in device_ids
+        ]
+    })
+
+@app.route('/devices/presence/range', methods=['GET'])
+def devices_presence_range():
+    """
+    Set operations over every scan in a time range, from the presence bitmaps.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601), defaults to 24 hours before end
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601), defaults to now
+      - name: op
+        in: query
+        type: string
+        enum: [union, intersection, fraction]
+        default: union
+        description: Devices online in any scan, in every scan, or in at least min_fraction of the scans
+      - name: min_fraction
+        in: query
+        type: number
+        default: 0.5
+        description: Share of scans (0-1) a device must be present in, for op=fraction
+    responses:
+      200:
+        description: Matching devices with the number and share of scans they were present in
+      400:
+        description: Unknown op
+    """
+    end_time = parse_datetime_safe(request.args.get('end')) or datetime.now()
+    start_time = parse_datetime_safe(request.args.get('start')) or end_time - timedelta(days=1)
+    op = request.args.get('op', default='union', type=str)
+    min_fraction = request.args.get('min_fraction', default=0.5, type=float)
+    if op not in ("union", "intersection", "fraction"):
+        return jsonify({"error": "op must be union, intersection or fraction"}), 400
+
+    db = SessionLocal()
+    scanned_at, matrix = presence_bitmap.load_range(db, start_time, end_time)
+    counts = presence_bitmap.scan_counts(matrix)
+    if op == "union":
+        device_ids = presence_bitmap.members(presence_bitmap.union(matrix))
+    elif op == "intersection":
+        device_ids = presence_bitmap.members(presence_bitmap.intersection(matrix))
+    else:
+        device_ids = presence_bitmap.present_in(counts, len(scanned_at), min_fraction)
+    devices = _presence_devices(db, device_ids)
+    db.close()
+
+    entries = sorted((
+        {
+            "device_id": device_id,
+            "hostname": devices[device_id].hostname if device_id in devices else "--",
+            "scans_present": int(counts[device_id]),
+            "fraction": round(counts[device_id] / len(scanned_at), 4)
+        }
+        for device_id in device_ids
+    ), key=lambda e: e["scans_present"], reverse=True)
+
+    return jsonify({
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "op": op,
+        "scans": len(scanned_at),
+        "total_matched": len(entries),
+        "entries": entries
+    })
+
+@app.route('/devices/presence/co-occurrence', methods=['GET'])
+def devices_presence_co_occurrence():
+    """
+    Device pairs most often online in the same scans, from the presence bitmaps.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601), defaults to 7 days before end
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601), defaults to now
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+        description: Number of pairs to return
+      - name: min_together
+        in: query
+        type: integer
+        default: 1
+        description: Minimum number of scans the pair must share
+    responses:
+      200:
+        description: Pairs by scans seen together, with each device's scan count and the Jaccard index
+    """
+    end_time = parse_datetime_safe(request.args.get('end')) or datetime.now()
+    start_time = parse_datetime_safe(request.args.get('start')) or end_time - timedelta(days=7)
+    limit = min(max(request.args.get('limit', default=20, type=int), 1), 1000)
+    min_together = max(request.args.get('min_together', default=1, type=int), 1)
+
+    db = SessionLocal()
+    scanned_at, matrix = presence_bitmap.load_range(db, start_time, end_time)
+    pairs = presence_bitmap.co_occurrence(matrix, limit, min_together)
+    hostnames = dict(db.query(Device.id, Device.hostname).filter(Device.id.in_({i for p in pairs for i in p[:2]})).all())
+    db.close()
+
+    return jsonify({
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "scans": len(scanned_at),
+        "entries": [
+            {
+                "device_a": {"device_id": a, "hostname": hostnames.get(a, "--"), "scans_present": scans_a},
+                "device_b": {"device_id": b, "hostname": hostnames.get(b, "--"), "scans_present": scans_b},
+                "scans_together": together,
+                "jaccard": round(together / (scans_a + scans_b - together), 4)
+            }
+            for a, b, together, scans_a, scans_b in pairs
+        ]
+    })
+
+@app.route('/devices/timeline', methods=['GET'])
+def devices_timeline():
+    """
+    Connected-device counts per time bucket, read from the device activity rollup.
+    ---
+    tags:
+      - Devices
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601), defaults to 24 hours before end
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601), defaults to now
+      - name: bucket
+        in: query
+        type: string
+        enum: [5m, 1h, 1d]
+        default: 1h
+      - name: port_type
+        in: query
+        type: string
+        description: Only count devices with this port type
+    responses:
+      200:
+        description: Distinct devices, new devices and online minutes per bucket
+      400:
+        description: Invalid bucket or range
+    """
+    bucket = request.args.get('bucket', default='1h', type=str)
+    port_type = request.args.get('port_type')
+    end_time = parse_datetime_safe(request.args.get('end')) or datetime.now()
+    start_time = parse_datetime_safe(request.args.get('start')) or end_time - timedelta(days=1)
+
+    if bucket not in BUCKET_SECONDS:
+        return jsonify({"error": f"bucket must be one of {', '.join(BUCKET_SECONDS)}"}), 400
+    if start_time > end_time:
+        return jsonify({"error": "start must be before end"}), 400
+
+    db = SessionLocal()
+    timeline = device_timeline(db, start_time, end_time, bucket, port_type)
+    db.close()
+
+    return jsonify({
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "bucket": bucket,
+        "port_type": port_type,
+        "timeline": timeline
+    })
+
+@app.route('/events', methods=['GET'])
+def events_stream():
+    """
+    Server-Sent Events stream of scan changes.
+    Emits device_joined, device_left, device_ip_changed, network_appeared and
+    network_disappeared as each scan is stored. Reconnecting clients resume
+    from the Last-Event-ID header (or last_event_id parameter) as long as the
+    event is still in the replay buffer; otherwise the stream starts with a
+    reset event and the client should refetch current state.
+    Each stream is closed after EVENT_STREAM_MAX_SECONDS (EventSource clients
+    reconnect by themselves), and a worker accepts at most
+    EVENT_MAX_STREAMS_PER_WORKER streams at a time, since each one holds a
+    worker thread.
+    ---
+    tags:
+      - Events
+    parameters:
+      - name: last_event_id
+        in: query
+        type: integer
+        description: Resume after this event id (alternative to the Last-Event-ID header)
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: text/event-stream of scan events
+      503:
+        description: This worker already serves EVENT_MAX_STREAMS_PER_WORKER streams; retry later
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_event_id = None
+
+    if not event_feed.open_stream():
+        response = jsonify({"error": "too many event streams on this worker, retry later"})
+        response.headers["Retry-After"] = str(max(int(EVENT_POLL_SECONDS * 2), 1))
+        return response, 503
+
+    response = Response(
+        stream_with_context(event_feed.stream(last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(event_feed.close_stream)
+    return response
+
+@app.route('/anomalies', methods=['GET'])
+def list_anomalies():
+    """
+    Recent anomalies flagged by the scan detector.
+    The same anomalies are pushed on /events as anomaly_unknown_device,
+    anomaly_device_count and anomaly_strong_new_ap.
+    ---
+    tags:
+      - Events
+    parameters:
+      - name: type
+        in: query
+        type: string
+        enum: [unknown_device, device_count, strong_new_ap]
+      - name: since
+        in: query
+        type: string
+        format: date-time
+        description: Only anomalies detected after this timestamp (ISO 8601)
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+    responses:
+      200:
+        description: Anomalies, newest first
+    """
+    anomaly_type = request.args.get('type')
+    since = parse_datetime_safe(request.args.get('since'))
+    limit = min(max(request.args.get('limit', default=100, type=int), 1), 1000)
+
+    db = SessionLocal()
+    query = db.query(Anomaly)
+    if anomaly_type:
+        query = query.filter(Anomaly.anomaly_type == anomaly_type)
+    if since:
+        query = query.filter(Anomaly.detected_at > since)
+    anomalies = query.order_by(Anomaly.detected_at.desc(), Anomaly.id.desc()).limit(limit).all()
+    db.close()
+
+    return jsonify({
+        "total_returned": len(anomalies),
+        "entries": [
+            {
+                "id": a.id,
+                "detected_at": a.detected_at.isoformat(),
+                "anomaly_type": a.anomaly_type,
+                "details": json.loads(a.details) if a.details else {}
+            }
+            for a in anomalies
+        ]
+    })
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -410,55 +1059,25 @@ def health_check():
     return jsonify({"status": "ok"})
 
 @app.route('/networks/collect', methods=['POST'])
+@requires_router
 def collect_neighbors():
     """
     Collect neighboring Wi-Fi networks from the router.
+    Runs one neighbor scan through the collector's write path, like
+    /devices/collect.
     ---
     tags:
       - Networks
     responses:
       200:
         description: Neighboring networks collected and saved
+      503:
+        description: No router session slot became free in time
     """
-    scraper = RouterScraper(ROUTER_URL)
-    scraper.login(USERNAME, PASSWORD)
-    neighbors = scraper.scrape_neighboring_aps()
-    db = SessionLocal()
-
-    for neighbor in neighbors:
-        existing_network = db.query(NeighborNetwork).filter(NeighborNetwork.mac == neighbor.get("mac")).first()
-
-        if existing_network:
-            existing_network.ssid = neighbor.get("ssid")
-            existing_network.network_type = neighbor.get("network_type")
-            existing_network.channel = int(neighbor.get("channel")) if neighbor.get("channel") else None
-            existing_network.signal_strength = neighbor.get("signal_strength")
-            existing_network.auth_mode = neighbor.get("auth_mode")
-            existing_network.working_mode = neighbor.get("working_mode")
-            existing_network.max_rate = neighbor.get("max_rate")
-        else:
-            existing_network = NeighborNetwork(
-                ssid=neighbor.get("ssid"),
-                mac=neighbor.get("mac"),
-                network_type=neighbor.get("network_type"),
-                channel=int(neighbor.get("channel")) if neighbor.get("channel") else None,
-                signal_strength=neighbor.get("signal_strength"),
-                auth_mode=neighbor.get("auth_mode"),
-                working_mode=neighbor.get("working_mode"),
-                max_rate=neighbor.get("max_rate"),
-            )
-            db.add(existing_network)
-            db.flush()
-
-        status = NeighborStatus(
-            network_id=existing_network.id,
-            timestamp=datetime.now()
-        )
-        db.add(status)
-
-    db.commit()
-    db.close()
-    scraper.quit()
+    try:
+        collect_data("manual_networks", scan_devices=False, priority=INTERACTIVE)
+    except RouterBusyError as e:
+        return jsonify({"error": str(e)}), 503
     return jsonify({"status": "neighbors collected"})
 
 @app.route('/networks/list', methods=['GET'])
@@ -477,40 +1096,113 @@ def get_neighbors_list():
     results = [n.__dict__ for n in neighbors]
     for r in results:
         r.pop('_sa_instance_state', None)
+        r['vendor'] = lookup_vendor(r.get('mac'))
     db.close()
     return jsonify(results)
 
+def _approx_network_stats():
+    start, end, error = _approx_days()
+    if error:
+        return error
+    db = SessionLocal()
+    sketch, days = sketches.merge_days(db, sketches.NETWORKS, start, end)
+    if not days or not sketch.sightings:
+        db.close()
+        return jsonify({"error": "No sketches available for this range"}), 404
+
+    top = sketch.top.top(5)
+    low, high = sketch.low, sketch.high
+    networks = {
+        n.id: n
+        for n in db.query(NeighborNetwork).filter(NeighborNetwork.id.in_([k for k, _, _ in top] + [low[1], high[1]])).all()
+    }
+    db.close()
+
+    def network(network_id):
+        net = networks.get(network_id)
+        return {"network_id": network_id, "ssid": net.ssid if net else None}
+
+    return jsonify({
+        **_approx_range(days),
+        "scans": sketch.scans,
+        "sightings": sketch.sightings,
+        "distinct_networks": sketch.distinct(),
+        "max_networks_in_one_scan": sketch.peak,
+        "average_signal_strength": round(sketch.value_sum / sketch.digest.count, 2) if sketch.digest.count else None,
+        "signal_strength_quantiles": sketch.quantiles(),
+        "strongest_network": {**network(high[1]), "signal_strength": high[0]} if high[0] is not None else None,
+        "weakest_network": {**network(low[1]), "signal_strength": low[0]} if low[0] is not None else None,
+        "top5_most_seen": [
+            {**network(k), "sightings": round(count), "max_overestimate": round(over)}
+            for k, count, over in top
+        ]
+    })
+
 @app.route('/networks/stats', methods=['GET'])
 def network_stats():
     """
     Retrieve statistics about neighboring Wi-Fi networks.
+    Without approx the statistics describe the latest scan. With approx=true
+    they cover [start, end], merged from the per-day sketches: distinct APs
+    with their relative standard error, observed signal quantiles (dBm) with
+    their rank error, and the most frequently seen APs with their maximum
+    over-count. Days are included whole.
     ---
     tags:
       - Networks
+    parameters:
+      - name: approx
+        in: query
+        type: boolean
+        description: Answer from the per-day sketches, default false
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: First day of the range (approx only), defaults to the oldest sketch
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: Last day of the range (approx only), defaults to the newest sketch
     responses:
       200:
         description: Wi-Fi network statistics
+      400:
+        description: start is after end
+      404:
+        description: No data (or no sketches in the range)
     """
-    db = SessionLocal()
-    latest_status = db.query(NeighborStatus).order_by(NeighborStatus.timestamp.desc()).first()
-    if not latest_status:
-        db.close()
-        return jsonify({"error": "No network data available"}), 404
+    if request.args.get('approx', default='false', type=str).lower() == 'true':
+        return _approx_network_stats()
+
+    snapshot = get_snapshot()
+    if snapshot and snapshot.networks_scanned_at:
+        networks = list(snapshot.networks)
+        if not networks:
+            return jsonify({"error": "No recent network data available"}), 404
+    else:
+        db = SessionLocal()
+        latest_status = db.query(NeighborStatus).order_by(NeighborStatus.timestamp.desc()).first()
+        if not latest_status:
+            db.close()
+            return jsonify({"error": "No network data available"}), 404
 
-    latest_time = latest_status.timestamp
-    interval_start = latest_time - timedelta(minutes=1)
+        latest_time = latest_status.timestamp
+        interval_start = latest_time - timedelta(minutes=1)
 
-    recent_statuses = db.query(NeighborStatus).filter(
-        NeighborStatus.timestamp.between(interval_start, latest_time)
-    ).all()
+        recent_statuses = db.query(NeighborStatus).filter(
+            NeighborStatus.timestamp.between(interval_start, latest_time)
+        ).all()
 
-    network_ids = [status.network_id for status in recent_statuses]
+        network_ids = [status.network_id for status in recent_statuses]
 
-    if not network_ids:
-        db.close()
-        return jsonify({"error": "No recent network data available"}), 404
+        if not network_ids:
+            db.close()
+            return jsonify({"error": "No recent network data available"}), 404
 
-    networks = db.query(NeighborNetwork).filter(NeighborNetwork.id.in_(network_ids)).all()
+        networks = db.query(NeighborNetwork).filter(NeighborNetwork.id.in_(network_ids)).all()
+        db.close()
 
     total_networks_detected_now = len(networks)
     signal_strengths = []
@@ -554,8 +1246,6 @@ def network_stats():
         strongest = None
         weakest = None
 
-    db.close()
-
     return jsonify({
         "total_networks_detected_now": total_networks_detected_now,
         "average_signal_strength": average_signal_strength,
@@ -573,6 +1263,48 @@ def network_stats():
         } if weakest else None
     })
 
+@app.route('/networks/congestion', methods=['GET'])
+def network_congestion():
+    """
+    Per-channel interference score over a time range.
+    Each sighting in NeighborStatus adds its received power to its channel; on
+    2.4 GHz, overlapping neighbour channels contribute in proportion to how
+    much their spectrum masks overlap.
+    ---
+    tags:
+      - Networks
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601)
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601)
+    responses:
+      200:
+        description: Channels ordered from most to least congested
+      404:
+        description: No sightings in the range
+    """
+    start_time = parse_datetime_safe(request.args.get('start'))
+    end_time = parse_datetime_safe(request.args.get('end'))
+
+    db = SessionLocal()
+    result = channel_congestion(db, start_time, end_time)
+    db.close()
+
+    if not result:
+        return jsonify({"error": "No network data available"}), 404
+    return jsonify({
+        "start": start_time.isoformat() if start_time else None,
+        "end": end_time.isoformat() if end_time else None,
+        **result
+    })
+
 @app.route('/networks/<int:network_id>', methods=['GET'])
 def get_network(network_id):
     """
@@ -597,6 +1329,7 @@ def get_network(network_id):
             "id": network.id,
             "ssid": network.ssid,
             "mac": network.mac,
+            "vendor": lookup_vendor(network.mac),
             "network_type": network.network_type,
             "channel": network.channel,
             "signal_strength": network.signal_strength,
@@ -648,8 +1381,6 @@ def filter_networks():
       200:
         description: Filtered list of networks
     """
-    db = SessionLocal()
-
     channel_min = request.args.get('channel_min', type=int)
     channel_max = request.args.get('channel_max', type=int)
     signal_sort = request.args.get('signal_sort', default=None, type=str)
@@ -657,27 +1388,46 @@ def filter_networks():
     start_time = parse_datetime_safe(request.args.get('start'))
     end_time = parse_datetime_safe(request.args.get('end'))
 
-    query = db.query(NeighborNetwork)
-
-    if channel_min is not None and channel_max is not None:
-        query = query.filter(NeighborNetwork.channel.between(channel_min, channel_max))
-
-    if batch_type == 'recent':
-        latest_timestamp = db.query(NeighborStatus.timestamp).order_by(NeighborStatus.timestamp.desc()).first()
-        if latest_timestamp:
-            recent_ids = db.query(NeighborStatus.network_id).filter(NeighborStatus.timestamp == latest_timestamp[0]).subquery()
-            query = query.filter(NeighborNetwork.id.in_(recent_ids))
-    elif batch_type == 'timeframe' and start_time and end_time:
-        ids_in_time = db.query(NeighborStatus.network_id).filter(NeighborStatus.timestamp.between(start_time, end_time)).subquery()
-        query = query.filter(NeighborNetwork.id.in_(ids_in_time))
-
-    if signal_sort:
-        if signal_sort == 'asc':
-            query = query.order_by(NeighborNetwork.signal_strength.asc())
-        elif signal_sort == 'desc':
-            query = query.order_by(NeighborNetwork.signal_strength.desc())
-
-    results = query.all()
+    snapshot = get_snapshot() if batch_type == 'recent' else None
+    if snapshot and snapshot.networks_scanned_at:
+        # Current networks come from the live snapshot, no database round trip
+        results = [
+            n for n in snapshot.networks
+            if channel_min is None or channel_max is None
+            or (n.channel is not None and channel_min <= n.channel <= channel_max)
+        ]
+        if signal_sort in ('asc', 'desc'):
+            # Same ordering as the SQL path: signal_strength is stored as text
+            results.sort(key=lambda n: (n.signal_strength is not None, n.signal_strength or ""), reverse=signal_sort == 'desc')
+    else:
+        db = SessionLocal()
+        query = db.query(NeighborNetwork)
+
+        if channel_min is not None and channel_max is not None:
+            query = query.filter(NeighborNetwork.channel.between(channel_min, channel_max))
+
+        if batch_type == 'recent':
+            latest_timestamp = db.query(NeighborStatus.timestamp).order_by(NeighborStatus.timestamp.desc()).first()
+            if latest_timestamp:
+                recent_ids = db.query(NeighborStatus.network_id).filter(NeighborStatus.timestamp == latest_timestamp[0]).subquery()
+                query = query.filter(NeighborNetwork.id.in_(recent_ids))
+        elif batch_type == 'timeframe' and start_time and end_time:
+            ids_in_time = set()
+            for shards, segment in iter_segments(db, start_time, end_time):
+                ids_in_time.update(
+                    network_id for (network_id,) in
+                    db.query(shards.statuses.network_id).filter(*segment.clause(shards.statuses.timestamp)).distinct()
+                )
+            query = query.filter(NeighborNetwork.id.in_(ids_in_time))
+
+        if signal_sort:
+            if signal_sort == 'asc':
+                query = query.order_by(NeighborNetwork.signal_strength.asc())
+            elif signal_sort == 'desc':
+                query = query.order_by(NeighborNetwork.signal_strength.desc())
+
+        results = query.all()
+        db.close()
 
     filtered = []
     for n in results:
@@ -685,6 +1435,7 @@ def filter_networks():
             'id': n.id,
             'ssid': n.ssid,
             'mac': n.mac,
+            'vendor': lookup_vendor(n.mac),
             'network_type': n.network_type,
             'channel': n.channel,
             'signal_strength': n.signal_strength,
@@ -693,8 +1444,6 @@ def filter_networks():
             'max_rate': n.max_rate
         })
 
-    db.close()
-
     return jsonify({
         "total_matched": len(filtered),
         "filters_used": request.args.to_dict(),
@@ -702,25 +1451,147 @@ def filter_networks():
     })
 
 @app.route('/router/summary', methods=['GET'])
+@requires_router
 def router_summary():
     """
     Retrieve a full summary of router information.
+    Concurrent requests share one scrape; the result is cached for
+    SUMMARY_CACHE_TTL_SECONDS and then served stale while it refreshes.
+    The X-Summary-Cache header is hit, stale or miss and Age gives the
+    summary's age in seconds.
     ---
     tags:
       - Router
+    parameters:
+      - name: refresh
+        in: query
+        type: boolean
+        required: false
+        description: Skip the cache and wait for a fresh scrape
     responses:
       200:
         description: Router summary information
+      503:
+        description: No router session slot became free in time
     """
-    scraper = RouterScraper(ROUTER_URL)
+    refresh = request.args.get('refresh', default='false', type=str).lower() == 'true'
     try:
-        scraper.login(USERNAME, PASSWORD)
-        summary = scraper.scrape_router_summary()
-        return jsonify(summary)
+        summary, age, state = get_summary(_scrape_router_summary, force_refresh=refresh)
+    except RouterBusyError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        scraper.quit()
+    response = jsonify(summary)
+    response.headers["X-Summary-Cache"] = state
+    response.headers["Age"] = str(int(age))
+    return response
+
+def _scrape_router_summary() -> dict:
+    with router_session(INTERACTIVE) as scraper:
+        return scraper.scrape_router_summary()
+
+@app.route('/router/governor', methods=['GET'])
+def router_governor():
+    """
+    Router access governor limits and this worker's wait times.
+    Slot waits are per priority (interactive requests before background
+    collection) over the most recent acquisitions; the collector's own
+    waits are in /collector/runs as slot_wait and throttle phases.
+    ---
+    tags:
+      - Router
+    responses:
+      200:
+        description: Session and page-rate limits, slot wait percentiles and page throttling totals
+    """
+    return jsonify(governor_stats())
+
+def _export_response(kind: str):
+    fmt = request.args.get('format', default='csv', type=str)
+    chunk_size = request.args.get('chunk_size', default=DEFAULT_CHUNK_SIZE, type=int)
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    start_time = parse_datetime_safe(request.args.get('start'))
+    end_time = parse_datetime_safe(request.args.get('end'))
+    extension, mimetype = ("parquet", "application/vnd.apache.parquet") if fmt == "parquet" else ("csv", "text/csv")
+    return Response(
+        stream_with_context(iter_export(kind, fmt, start_time, end_time, max(chunk_size, 1))),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={kind}.{extension}"}
+    )
+
+@app.route('/export/sessions', methods=['GET'])
+def export_sessions():
+    """
+    Stream device sessions (presence intervals overlapping the range) joined with device attributes.
+    ---
+    tags:
+      - Export
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601)
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601)
+      - name: format
+        in: query
+        type: string
+        enum: [csv, parquet]
+        default: csv
+      - name: chunk_size
+        in: query
+        type: integer
+        default: 5000
+        description: Rows fetched from the database per chunk
+    responses:
+      200:
+        description: CSV or zstd-compressed Parquet stream
+      400:
+        description: Unknown format
+    """
+    return _export_response("sessions")
+
+@app.route('/export/networks', methods=['GET'])
+def export_networks():
+    """
+    Stream neighbor network sightings joined with network attributes.
+    ---
+    tags:
+      - Export
+    parameters:
+      - name: start
+        in: query
+        type: string
+        format: date-time
+        description: Start timestamp (ISO 8601)
+      - name: end
+        in: query
+        type: string
+        format: date-time
+        description: End timestamp (ISO 8601)
+      - name: format
+        in: query
+        type: string
+        enum: [csv, parquet]
+        default: csv
+      - name: chunk_size
+        in: query
+        type: integer
+        default: 5000
+        description: Rows fetched from the database per chunk
+    responses:
+      200:
+        description: CSV or zstd-compressed Parquet stream
+      400:
+        description: Unknown format
+    """
+    return _export_response("networks")
 
 def parse_datetime_safe(value: str):
     """
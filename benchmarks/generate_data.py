@@ -0,0 +1,168 @@
+"""
+Fill router_data.db with synthetic collector history.
+
+Devices follow one of a few daily routines (always on, work hours,
+evenings, occasional visitors) as a two-state Markov chain per scan, so
+sessions come in realistic runs rather than coin flips. Neighbor networks
+are sighted with a per-network probability and a noisy signal around a
+fixed mean. Rows are written with executemany in large transactions:
+
+    python -m benchmarks.generate_data --devices 500 --networks 80 --scans 200000 --reset
+
+200k scans at the default 2 minute interval is about nine months of
+history ending now. Presence intervals and bitmaps are rebuilt from the
+generated sessions at the end and the live snapshot is published for the
+last scan.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from database.db import engine, init_db
+from database.models import (
+    Device, DeviceSession, NeighborNetwork, NeighborStatus, PresenceInterval, PresenceBitmap, DailySketch, DeviceActivity,
+    Scan, ArchivedPage
+)
+from database.presence import backfill_presence_intervals
+from database.presence_bitmap import backfill_presence_bitmaps
+from database.activity import rebuild_activity
+from analytics.sketches import rebuild_daily_sketches
+from snapshot import publish_snapshot, DeviceState, NetworkState
+
+# Share of devices per routine and their online probability by hour of day
+ROUTINES = {
+    "always_on": (0.25, np.full(24, 0.97)),
+    "work_hours": (0.25, np.array([0.05] * 8 + [0.85] * 10 + [0.1] * 6)),
+    "evenings": (0.35, np.array([0.6] * 7 + [0.3] * 10 + [0.9] * 7)),
+    "visitor": (0.15, np.array([0.0] * 10 + [0.08] * 12 + [0.0] * 2)),
+}
+PORT_TYPES = ["WIFI 2.4G", "WIFI 5G", "ETH"]
+PORT_WEIGHTS = [0.45, 0.4, 0.15]
+VENDOR_PREFIXES = ["3C:22:FB", "F0:18:98", "B8:27:EB", "00:1A:11", "DC:A6:32", "A4:5E:60", "FC:FB:FB", "30:05:5C"]
+CHANNELS = [1, 6, 11, 1, 6, 11, 3, 9, 36, 40, 44, 48, 149, 153]
+AUTH_MODES = ["WPA2-PSK", "WPA2-PSK", "WPA/WPA2-PSK", "WPA3-SAE", "Open"]
+# SQLAlchemy's SQLite DateTime storage format; range filters compare these as strings
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+# Chance per scan that a device changes state; sets the typical session length
+TRANSITION_RATE = 0.08
+
+def _reset(conn):
+    for model in (ArchivedPage, NeighborStatus, DeviceSession, PresenceInterval, PresenceBitmap, DailySketch, DeviceActivity,
+                  Scan, NeighborNetwork, Device):
+        conn.execute(model.__table__.delete())
+
+def _insert(conn, table: str, columns: list[str], rows):
+    placeholders = ", ".join("?" for _ in columns)
+    conn.exec_driver_sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+def generate(n_devices: int, n_networks: int, n_scans: int, interval_minutes: int, seed: int,
+             chunk_scans: int = 2000, reset: bool = False):
+    rng = np.random.default_rng(seed)
+    end = datetime.now().replace(second=0, microsecond=0)
+    start = end - timedelta(minutes=interval_minutes * (n_scans - 1))
+
+    with engine.begin() as conn:
+        if reset:
+            _reset(conn)
+        elif conn.exec_driver_sql("SELECT (SELECT COUNT(*) FROM devices) + (SELECT COUNT(*) FROM neighbor_networks)").scalar():
+            raise SystemExit("router_data.db already has devices or networks; pass --reset to replace them.")
+        first_scan_id = conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) + 1 FROM scans").scalar()
+
+        routine_names = list(ROUTINES)
+        shares = np.array([ROUTINES[name][0] for name in routine_names])
+        device_routine = rng.choice(len(routine_names), size=n_devices, p=shares / shares.sum())
+        hourly = np.stack([ROUTINES[name][1] for name in routine_names])[device_routine]  # (devices, 24)
+        port_types = rng.choice(PORT_TYPES, size=n_devices, p=PORT_WEIGHTS)
+        devices = []
+        for i in range(n_devices):
+            prefix = VENDOR_PREFIXES[i % len(VENDOR_PREFIXES)]
+            mac = f"{prefix}:{(i >> 16) & 0xFF:02X}:{(i >> 8) & 0xFF:02X}:{i & 0xFF:02X}"
+            devices.append((i + 1, f"{routine_names[device_routine[i]]}-{i}", f"192.168.{1 + i // 250}.{2 + i % 250}", mac, str(port_types[i])))
+        _insert(conn, "devices", ["id", "hostname", "ip", "mac", "port_type"], devices)
+
+        net_channels = rng.choice(CHANNELS, size=n_networks)
+        net_signal = rng.integers(-92, -45, size=n_networks)
+        net_visibility = rng.uniform(0.3, 1.0, size=n_networks)
+        networks = [
+            (i + 1, f"Neighbor-{i}", f"02:4E:{(i >> 16) & 0xFF:02X}:{(i >> 8) & 0xFF:02X}:{i & 0xFF:02X}:01",
+             "11ax" if net_channels[i] > 14 else "11n", int(net_channels[i]), str(net_signal[i]),
+             str(rng.choice(AUTH_MODES)), "Infrastructure", "574")
+            for i in range(n_networks)
+        ]
+        _insert(conn, "neighbor_networks",
+                ["id", "ssid", "mac", "network_type", "channel", "signal_strength", "auth_mode", "working_mode", "max_rate"],
+                networks)
+
+    online = rng.random(n_devices) < hourly[:, start.hour]
+    online_since = np.where(online, 0, -1).astype(np.int64)
+    device_ids = np.arange(1, n_devices + 1)
+    network_ids = np.arange(1, n_networks + 1)
+    totals = {"scans": 0, "device_sessions": 0, "neighbor_statuses": 0}
+    started = time.perf_counter()
+
+    for chunk_start in range(0, n_scans, chunk_scans):
+        scans, sessions, statuses = [], [], []
+        for scan_index in range(chunk_start, min(chunk_start + chunk_scans, n_scans)):
+            scanned_at = start + timedelta(minutes=interval_minutes * scan_index)
+            stamp = scanned_at.strftime(TIMESTAMP_FORMAT)
+            scan_id = first_scan_id + scan_index
+
+            target = hourly[:, scanned_at.hour]
+            flip = rng.random(n_devices)
+            joins = ~online & (flip < TRANSITION_RATE * target)
+            leaves = online & (flip < TRANSITION_RATE * (1 - target))
+            online = (online | joins) & ~leaves
+            online_since[joins] = scan_index
+            online_since[~online] = -1
+
+            on_ids = device_ids[online]
+            durations = (scan_index - online_since[online]) * interval_minutes + rng.integers(0, interval_minutes, size=len(on_ids))
+            sessions.extend(zip(on_ids.tolist(), [stamp] * len(on_ids), durations.tolist(), [scan_id] * len(on_ids)))
+
+            visible = rng.random(n_networks) < net_visibility
+            signals = net_signal[visible] + rng.normal(0, 3, size=int(visible.sum())).round().astype(int)
+            statuses.extend(zip(network_ids[visible].tolist(), [stamp] * int(visible.sum()), signals.tolist(), [scan_id] * int(visible.sum())))
+
+            finished = (scanned_at + timedelta(seconds=40)).strftime(TIMESTAMP_FORMAT)
+            scans.append((scan_id, stamp, finished, "complete", 1, 1, len(on_ids), int(visible.sum())))
+
+        with engine.begin() as conn:
+            _insert(conn, "scans", ["id", "started_at", "finished_at", "status", "devices_complete", "networks_complete",
+                                    "devices_written", "networks_written"], scans)
+            _insert(conn, "device_sessions", ["device_id", "timestamp", "online_duration", "scan_id"], sessions)
+            _insert(conn, "neighbor_statuses", ["network_id", "timestamp", "signal_strength", "scan_id"], statuses)
+        totals["scans"] += len(scans)
+        totals["device_sessions"] += len(sessions)
+        totals["neighbor_statuses"] += len(statuses)
+        rate = totals["scans"] / (time.perf_counter() - started)
+        print(f"{totals['scans']}/{n_scans} scans, {totals['device_sessions']} sessions, "
+              f"{totals['neighbor_statuses']} statuses ({rate:.0f} scans/s)")
+
+    totals["presence_intervals"] = backfill_presence_intervals()
+    totals["presence_bitmaps"] = backfill_presence_bitmaps()
+    totals["daily_sketches"] = rebuild_daily_sketches()
+    totals["device_activity"] = rebuild_activity()
+    # Last scan becomes the live snapshot, as the collector would leave it
+    publish_snapshot(
+        scanned_at,
+        devices=[DeviceState(i, *devices[i - 1][1:], duration) for i, duration in zip(on_ids.tolist(), durations.tolist())],
+        networks=[NetworkState(i, *networks[i - 1][1:], signal) for i, signal in zip(network_ids[visible].tolist(), signals.tolist())],
+    )
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--networks", type=int, default=80)
+    parser.add_argument("--scans", type=int, default=200000)
+    parser.add_argument("--interval-minutes", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete existing devices, networks and scans first")
+    args = parser.parse_args()
+
+    init_db()
+    totals = generate(args.devices, args.networks, args.scans, args.interval_minutes, args.seed, reset=args.reset)
+    print(f"Generated {totals}")
+
+if __name__ == "__main__":
+    main()
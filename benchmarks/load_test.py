@@ -0,0 +1,218 @@
+"""
+Concurrent load test for the read endpoints.
+
+Drives a running API (python main.py, or SERVER_MODE=production) with a
+fixed number of client threads, one endpoint at a time and then as a
+weighted mix. For every phase it reports p50/p95/p99 latency, throughput,
+errors and the peak RSS of the server process tree (sampled from /proc,
+so pass --server-pid when the server runs on this machine):
+
+    python -m benchmarks.generate_data --scans 200000 --reset
+    python -m benchmarks.load_test --server-pid $(pgrep -of main.py) --save
+    python -m benchmarks.load_test --baseline benchmarks/results/<earlier>.json
+
+Results are written to benchmarks/results/ with --save. With --baseline,
+phases whose p95 or p99 got worse by more than --tolerance are listed and
+the exit status is 1.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# name: (path template, weight in the mix)
+ENDPOINTS = {
+    "devices_stats": ("/devices/stats", 1),
+    "networks_stats": ("/networks/stats", 3),
+    "devices_stats_approx": ("/devices/stats?approx=true", 1),
+    "networks_stats_approx": ("/networks/stats?approx=true", 1),
+    "devices_filter_recent": ("/devices/filter?batch=recent", 4),
+    "devices_filter_timeframe": ("/devices/filter?batch=timeframe&start={day_ago}&end={now}", 2),
+    "networks_filter_recent": ("/networks/filter?batch=recent&signal_sort=desc", 3),
+    "devices_online_time": ("/devices/online-time?start={week_ago}&end={now}", 2),
+    "devices_timeline": ("/devices/timeline?bucket=1h&start={day_ago}&end={now}", 2),
+    "devices_history": ("/devices/{device_id}/history?start={week_ago}&end={now}", 2),
+    "networks_congestion": ("/networks/congestion?start={day_ago}&end={now}", 1),
+    "devices_presence_range": ("/devices/presence/range?op=fraction&start={week_ago}&end={now}", 1),
+    "devices_co_occurrence": ("/devices/presence/co-occurrence?start={week_ago}&end={now}", 1),
+}
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def _process_tree_rss_kb(pid: int) -> int:
+    """Current RSS of a process and all its descendants (gunicorn master + workers)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+class RSSSampler:
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, _process_tree_rss_kb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+def _fetch(url: str, timeout: float) -> tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 500
+    except urllib.error.HTTPError as e:
+        e.read()
+        ok = e.code < 500  # 404 "no data" is a valid answer
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_phase(name: str, paths: list[str], base_url: str, concurrency: int, timeout: float, server_pid: int = None) -> dict:
+    latencies, errors = [], 0
+    with RSSSampler(server_pid) as sampler, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        for latency, ok in pool.map(lambda path: _fetch(base_url + path, timeout), paths):
+            latencies.append(latency)
+            errors += not ok
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "peak_rss_mb": round(sampler.peak_kb / 1024, 1) if server_pid else None,
+    }
+
+def _device_ids(base_url: str, timeout: float) -> list[int]:
+    try:
+        with urllib.request.urlopen(base_url + "/devices/list", timeout=timeout) as response:
+            return [d["id"] for d in json.load(response)] or [1]
+    except (urllib.error.URLError, ValueError):
+        return [1]
+
+def build_paths(names: list[str], count: int, device_ids: list[int], rng: random.Random, weighted: bool) -> list[str]:
+    now = datetime.now()
+    values = {
+        "now": now.isoformat(timespec="seconds"),
+        "day_ago": (now - timedelta(days=1)).isoformat(timespec="seconds"),
+        "week_ago": (now - timedelta(days=7)).isoformat(timespec="seconds"),
+    }
+    weights = [ENDPOINTS[name][1] for name in names] if weighted else None
+    return [
+        ENDPOINTS[name][0].format(device_id=rng.choice(device_ids), **values)
+        for name in rng.choices(names, weights=weights, k=count)
+    ]
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    previous = {r["endpoint"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        old = previous.get(r["endpoint"])
+        if not old:
+            continue
+        if r["errors"] > old["errors"]:
+            regressions.append(f"{r['endpoint']}: errors {old['errors']} -> {r['errors']}")
+        for metric in ("p95_ms", "p99_ms"):
+            if old[metric] and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{r['endpoint']}: {metric} {old[metric]} -> {r[metric]}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--server-pid", type=int, help="sample peak RSS of this process and its children")
+    parser.add_argument("--no-mix", action="store_true", help="skip the weighted mixed phase")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help=f"write results to {RESULTS_DIR}")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/p99 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    rng = random.Random(args.seed)
+    device_ids = _device_ids(base_url, args.timeout)
+
+    phases = [(name, [name]) for name in args.endpoints]
+    if not args.no_mix:
+        phases.append(("mix", args.endpoints))
+
+    results = []
+    print(f"{'endpoint':<26} {'req':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MB':>8}")
+    for name, names in phases:
+        paths = build_paths(names, args.requests, device_ids, rng, weighted=name == "mix")
+        r = run_phase(name, paths, base_url, args.concurrency, args.timeout, args.server_pid)
+        results.append(r)
+        print(f"{name:<26} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>8} {r['p50_ms']:>9} "
+              f"{r['p95_ms']:>9} {r['p99_ms']:>9} {str(r['peak_rss_mb']):>8}")
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(path, "w") as f:
+            json.dump({"url": base_url, "created_at": datetime.now().isoformat(), "args": vars(args), "results": results}, f, indent=2)
+        print(f"Saved {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
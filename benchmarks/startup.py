@@ -0,0 +1,68 @@
+"""
+Measure API worker cold-start time and memory.
+
+Each sample imports api.routes in a fresh interpreter (what a gunicorn worker
+does) and reports import time, peak RSS and whether Selenium/BeautifulSoup
+got loaded. Run from the repository root:
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import api.routes
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "selenium_loaded": "selenium" in sys.modules,
+    "bs4_loaded": "bs4" in sys.modules,
+}))
+"""
+
+MODES = {
+    "full": {"API_READ_ONLY": "False", "SWAGGER_ENABLED": "True"},
+    "read_only": {"API_READ_ONLY": "True", "SWAGGER_ENABLED": "False"},
+}
+
+def measure(mode: str, runs: int) -> dict:
+    env = {**os.environ, **MODES[mode]}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "mode": mode,
+        "runs": runs,
+        "median_import_ms": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+        "median_max_rss_mb": round(statistics.median(s["max_rss_kb"] for s in samples) / 1024, 1),
+        "modules": samples[-1]["modules"],
+        "selenium_loaded": samples[-1]["selenium_loaded"],
+        "bs4_loaded": samples[-1]["bs4_loaded"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [measure(mode, args.runs) for mode in MODES]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<10} {'import ms':>10} {'rss MB':>8} {'modules':>8} {'selenium':>9} {'bs4':>5}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['median_import_ms']:>10} {r['median_max_rss_mb']:>8} {r['modules']:>8} "
+              f"{str(r['selenium_loaded']):>9} {str(r['bs4_loaded']):>5}")
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,354 @@
+import fcntl
+import os
+import signal
+import socket
 import threading
-import time
-from router.scraper import RouterScraper
 from database.db import SessionLocal
-from database.models import Device, DeviceSession, NeighborNetwork, NeighborStatus
-from config import ROUTER_URL, USERNAME, PASSWORD
-from datetime import datetime
+from database.models import CollectorState
+from database.scan_writer import ScanWriter
+from database.run_ledger import RunRecorder
+from snapshot import device_state, network_state
+from events import publish_scan, DEVICE_JOINED, DEVICE_LEFT, DEVICE_IP_CHANGED, NETWORK_APPEARED
+from config import (
+    COLLECTOR_ENABLED, COLLECTOR_INTERVAL_MINUTES, COLLECTOR_LOCK_FILE, COLLECTOR_HEARTBEAT_SECONDS, COLLECTOR_MODE,
+    PAGE_ARCHIVE_ENABLED, COLLECTOR_ADAPTIVE, COLLECTOR_MIN_INTERVAL_MINUTES, COLLECTOR_MAX_INTERVAL_MINUTES,
+    NEIGHBOR_MIN_INTERVAL_MINUTES, NEIGHBOR_MAX_INTERVAL_MINUTES, COLLECTOR_TARGET_CHANGES, NEIGHBOR_TARGET_CHANGES,
+    COLLECTOR_CHURN_ALPHA, API_READ_ONLY
+)
+from datetime import datetime, timedelta
 
+# Every process (dev server or WSGI worker) runs one election thread. The
+# process holding the flock on COLLECTOR_LOCK_FILE is the leader and is the
+# only one that scrapes. The kernel drops the lock when the leader dies, so
+# another process picks it up on its next attempt.
+#
+# With COLLECTOR_MODE=external the API processes stay out of the election
+# and `python -m collector` runs it as a separate process instead; the two
+# only share the database (CollectorState is the control channel).
+election_thread = None
 collector_thread = None
-collector_running = False
+leader_lock = None
+leader_role = "embedded"
+shutdown_event = threading.Event()
 
-def collect_data():
-    scraper = RouterScraper(ROUTER_URL)
-    scraper.login(USERNAME, PASSWORD)
+# Adaptive cadence (COLLECTOR_ADAPTIVE): devices and neighbor APs each get an
+# interval between their bounds, driven by how many changes recent scans saw.
+# A part that is at least this far into its interval rides along when the
+# other part's scan opens a router session.
+PIGGYBACK_FRACTION = 0.5
+DEVICE_CHANGE_EVENTS = (DEVICE_JOINED, DEVICE_LEFT, DEVICE_IP_CHANGED)
 
+def _scan_kind(scan_devices: bool, scan_neighbors: bool) -> str:
+    if scan_devices and scan_neighbors:
+        return "full"
+    return "devices" if scan_devices else "networks"
+
+def collect_data(trigger: str = "collector", scan_devices: bool = True, scan_neighbors: bool = True,
+                 interval_minutes: float = None, priority: str = None) -> list[tuple[str, dict]]:
+    """
+    Scan the device list and/or the neighbor APs in one router session; returns the published events.
+    The manual collect endpoints call it too, with interactive priority and their own trigger.
+    """
+    from router.governor import router_session, BACKGROUND
+    run = RunRecorder(trigger)
     db = SessionLocal()
-    devices = scraper.scrape_all()
-    now = datetime.now()
-    for device in devices:
-            existing = db.query(Device).filter_by(mac=device.mac).first()
-            if not existing:
-                existing = Device(
-                    hostname=device.hostname,
-                    ip=device.ip,
-                    mac=device.mac,
-                    port_type=device.port_type
-                )
-                db.add(existing)
-                db.commit()
-
-            if device.status.lower() == "online":
-                session = DeviceSession(
-                    device_id=existing.id,
-                    timestamp=now,
-                    online_duration=device.duration
-                )
-                db.add(session)
-
-    neighbors = scraper.scrape_neighboring_aps()
-    for net in neighbors:
-        existing = db.query(NeighborNetwork).filter_by(mac=net.get("mac")).first()
-        if not existing:
-            existing = NeighborNetwork(
-                ssid=net.get("ssid"),
-                mac=net.get("mac"),
-                network_type=net.get("network_type"),
-                channel=int(net.get("channel")),
-                signal_strength=net.get("signal_strength"),
-                auth_mode=net.get("auth_mode"),
-                working_mode=net.get("working_mode"),
-                max_rate=net.get("max_rate"),
-            )
-            db.add(existing)
-            db.commit()
+    writer = scraper = None
+    try:
+        # Background scans wait behind interactive router users, step aside for them between
+        # page loads and give up when the collector shuts down; interactive ones give up
+        # after ROUTER_SLOT_TIMEOUT_SECONDS.
+        # The scan is started only once the session is open, so its rows carry the time
+        # of the scan rather than of the wait, and a failed wait leaves no Scan row.
+        with router_session(priority or BACKGROUND, cancel_event=shutdown_event) as scraper:
+            writer = ScanWriter.start(db, _scan_kind(scan_devices, scan_neighbors))
+            writer.scan.interval_minutes = interval_minutes
+            if PAGE_ARCHIVE_ENABLED:
+                scraper.page_sink = writer.archive_page
 
-        status = NeighborStatus(
-            network_id=existing.id,
-            timestamp=now
-        )
-        db.add(status)
+            if scan_devices and not writer.scan.devices_complete:
+                for device in scraper.iter_devices(*writer.resume_point()):
+                    run.devices_parsed += 1
+                    writer.add_device(device, scraper.device_cursor)
+                writer.complete_devices()
+
+            if scan_neighbors and not writer.scan.networks_complete:
+                writer.begin_networks()
+                for net in scraper.iter_neighboring_aps():
+                    run.networks_parsed += 1
+                    writer.add_network(net)
+                writer.complete_networks()
+
+        writer.finish()
+    except Exception as e:
+        if writer is not None:
+            writer.interrupt(e)
+        run.finish(scraper, writer, error=e)
+        db.close()
+        raise
+    run.finish(scraper, writer)
 
-    db.commit()
+    # A part that was not scanned keeps its previous snapshot
+    online_devices = [device_state(device, duration) for device, duration in writer.online_devices()] if scan_devices else None
+    visible_networks = [network_state(network, signal) for network, signal in writer.visible_networks()] if scan_neighbors else None
+    scanned_at = writer.scanned_at
     db.close()
-    scraper.quit()
+    return publish_scan(scanned_at, devices=online_devices, networks=visible_networks)
+
+def _next_interval(current: float, churn: float, changes: int, elapsed_minutes: float,
+                   target: float, lower: float, upper: float) -> tuple[float, float]:
+    """
+    New (interval, churn) for one scan part after a scan that saw `changes`
+    events since the previous one. churn is an EWMA of changes per minute;
+    the interval aims for `target` changes per scan. It shrinks at once
+    when things get busy but at most doubles per scan when they calm down.
+    """
+    current = current or lower
+    if elapsed_minutes is None or elapsed_minutes <= 0:
+        return current, churn
+    rate = changes / elapsed_minutes
+    churn = rate if churn is None else COLLECTOR_CHURN_ALPHA * rate + (1 - COLLECTOR_CHURN_ALPHA) * churn
+    desired = target / churn if churn > 0 else upper
+    return min(max(min(desired, current * 2), lower), upper), churn
+
+def _due(last_run_at: datetime, interval_minutes: float, now: datetime, fraction: float = 1.0) -> bool:
+    return last_run_at is None or now - last_run_at >= timedelta(minutes=interval_minutes * fraction)
+
+def _plan_scan(state: CollectorState, now: datetime):
+    """(scan_devices, scan_neighbors, device interval) for a scan that is due now, or None."""
+    if not COLLECTOR_ADAPTIVE:
+        interval_minutes = state.interval_minutes or COLLECTOR_INTERVAL_MINUTES
+        return (True, True, interval_minutes) if _due(state.last_run_at, interval_minutes, now) else None
+
+    device_interval = state.device_interval_minutes or COLLECTOR_MIN_INTERVAL_MINUTES
+    network_interval = state.network_interval_minutes or NEIGHBOR_MIN_INTERVAL_MINUTES
+    devices_due = _due(state.last_run_at, device_interval, now)
+    networks_due = _due(state.last_network_run_at, network_interval, now)
+    if not devices_due and not networks_due:
+        return None
+    # Share the browser session and login with the other part when it is nearly due anyway
+    scan_devices = devices_due or _due(state.last_run_at, device_interval, now, PIGGYBACK_FRACTION)
+    scan_neighbors = networks_due or _due(state.last_network_run_at, network_interval, now, PIGGYBACK_FRACTION)
+    return scan_devices, scan_neighbors, device_interval
+
+def _adapt(state: CollectorState, started: datetime, scan_devices: bool, scan_neighbors: bool, events: list):
+    kinds = [event_type for event_type, _ in events]
+    if scan_devices:
+        changes = sum(kinds.count(k) for k in DEVICE_CHANGE_EVENTS)
+        elapsed = (started - state.last_run_at).total_seconds() / 60 if state.last_run_at else None
+        state.device_interval_minutes, state.device_churn = _next_interval(
+            state.device_interval_minutes, state.device_churn, changes, elapsed,
+            COLLECTOR_TARGET_CHANGES, COLLECTOR_MIN_INTERVAL_MINUTES, COLLECTOR_MAX_INTERVAL_MINUTES
+        )
+    if scan_neighbors:
+        changes = kinds.count(NETWORK_APPEARED)
+        elapsed = (started - state.last_network_run_at).total_seconds() / 60 if state.last_network_run_at else None
+        state.network_interval_minutes, state.network_churn = _next_interval(
+            state.network_interval_minutes, state.network_churn, changes, elapsed,
+            NEIGHBOR_TARGET_CHANGES, NEIGHBOR_MIN_INTERVAL_MINUTES, NEIGHBOR_MAX_INTERVAL_MINUTES
+        )
+
+def _get_state(db) -> CollectorState:
+    state = db.get(CollectorState, 1)
+    if not state:
+        state = CollectorState(id=1, enabled=COLLECTOR_ENABLED, interval_minutes=COLLECTOR_INTERVAL_MINUTES)
+        db.add(state)
+        db.commit()
+    return state
+
+def _try_acquire_leadership() -> bool:
+    global leader_lock
+    if leader_lock is not None:
+        return True
+    lock_file = open(COLLECTOR_LOCK_FILE, "a+")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    leader_lock = lock_file
+    return True
+
+def _heartbeat():
+    db = SessionLocal()
+    try:
+        state = _get_state(db)
+        state.leader_pid = os.getpid()
+        state.leader_host = socket.gethostname()
+        state.leader_role = leader_role
+        state.heartbeat_at = datetime.now()
+        db.commit()
+    finally:
+        db.close()
+
+def _collector_loop():
+    while not shutdown_event.is_set():
+        db = SessionLocal()
+        try:
+            state = _get_state(db)
+            enabled = state.enabled
+            plan = _plan_scan(state, datetime.now()) if enabled else None
+        finally:
+            db.close()
+
+        if plan is None:
+            shutdown_event.wait(COLLECTOR_HEARTBEAT_SECONDS)
+            continue
 
-def _collector_loop(interval_minutes: int):
-    global collector_running
-    while collector_running:
-        print("Collector: Starting data collection...")
-        collect_data()
-        print(f"Collector: Sleeping {interval_minutes} minutes...")
-        time.sleep(interval_minutes * 60)
+        scan_devices, scan_neighbors, interval_minutes = plan
+        parts = " and ".join(part for part, wanted in (("devices", scan_devices), ("neighbor APs", scan_neighbors)) if wanted)
+        print(f"Collector: Starting data collection ({parts})...")
+        started = datetime.now()
+        error = None
+        events = []
+        try:
+            events = collect_data(scan_devices=scan_devices, scan_neighbors=scan_neighbors, interval_minutes=interval_minutes)
+        except Exception as e:
+            error = str(e)
+            print(f"Collector: Data collection failed: {e}")
+
+        db = SessionLocal()
+        try:
+            state = _get_state(db)
+            if COLLECTOR_ADAPTIVE and error is None:
+                _adapt(state, started, scan_devices, scan_neighbors, events)
+            if scan_devices:
+                state.last_run_at = datetime.now()
+            if scan_neighbors:
+                state.last_network_run_at = datetime.now()
+            state.last_error = error
+            db.commit()
+            if COLLECTOR_ADAPTIVE:
+                next_devices = state.device_interval_minutes or COLLECTOR_MIN_INTERVAL_MINUTES
+                next_networks = state.network_interval_minutes or NEIGHBOR_MIN_INTERVAL_MINUTES
+                print(f"Collector: Next device scan in {next_devices:.1f} minutes, neighbor scan in {next_networks:.1f} minutes...")
+            else:
+                print(f"Collector: Next collection in {interval_minutes} minutes...")
+        finally:
+            db.close()
+
+def _election_loop():
+    global collector_thread
+    while not shutdown_event.is_set():
+        if _try_acquire_leadership():
+            try:
+                _heartbeat()
+            except Exception as e:
+                print(f"Collector: Heartbeat failed: {e}")
+            if collector_thread is None:
+                print(f"Collector: Process {os.getpid()} is now the collector leader.")
+                collector_thread = threading.Thread(target=_collector_loop, daemon=True)
+                collector_thread.start()
+        shutdown_event.wait(COLLECTOR_HEARTBEAT_SECONDS)
+
+def start_leader_election():
+    global election_thread
+    if election_thread is None:
+        election_thread = threading.Thread(target=_election_loop, daemon=True)
+        election_thread.start()
 
 def start_collector_background(interval_minutes: int = 2):
-    global collector_thread, collector_running
-    if not collector_running:
-        collector_running = True
-        collector_thread = threading.Thread(target=_collector_loop, args=(interval_minutes,))
-        collector_thread.daemon = True
-        collector_thread.start()
-        print("Collector started.")
-    else:
-        print("Collector already running.")
+    db = SessionLocal()
+    try:
+        state = _get_state(db)
+        if state.enabled:
+            print("Collector already running.")
+            return
+        state.enabled = True
+        state.interval_minutes = interval_minutes
+        db.commit()
+    finally:
+        db.close()
+    # Read-only workers cannot scrape; the leader among the other processes picks the state up
+    if COLLECTOR_MODE == "embedded" and not API_READ_ONLY:
+        start_leader_election()
+    print("Collector started.")
 
 def stop_collector_background():
-    global collector_running
-    collector_running = False
+    db = SessionLocal()
+    try:
+        state = _get_state(db)
+        state.enabled = False
+        db.commit()
+    finally:
+        db.close()
     print("Collector stopped.")
 
+def get_collector_status() -> dict:
+    db = SessionLocal()
+    try:
+        state = _get_state(db)
+        stale_after = timedelta(seconds=COLLECTOR_HEARTBEAT_SECONDS * 3)
+        leader_alive = state.heartbeat_at is not None and datetime.now() - state.heartbeat_at <= stale_after
+        return {
+            "enabled": state.enabled,
+            "running": state.enabled and leader_alive,
+            "interval_minutes": state.interval_minutes,
+            "leader_pid": state.leader_pid if leader_alive else None,
+            "leader_host": state.leader_host if leader_alive else None,
+            "leader_role": state.leader_role if leader_alive else None,
+            "mode": COLLECTOR_MODE,
+            "heartbeat_at": state.heartbeat_at.isoformat() if state.heartbeat_at else None,
+            "last_run_at": state.last_run_at.isoformat() if state.last_run_at else None,
+            "last_network_run_at": state.last_network_run_at.isoformat() if state.last_network_run_at else None,
+            "last_error": state.last_error,
+            "adaptive": {
+                "device_interval_minutes": round(state.device_interval_minutes or COLLECTOR_MIN_INTERVAL_MINUTES, 2),
+                "network_interval_minutes": round(state.network_interval_minutes or NEIGHBOR_MIN_INTERVAL_MINUTES, 2),
+                "device_changes_per_minute": round(state.device_churn, 4) if state.device_churn is not None else None,
+                "network_changes_per_minute": round(state.network_churn, 4) if state.network_churn is not None else None,
+            } if COLLECTOR_ADAPTIVE else None,
+        }
+    finally:
+        db.close()
+
 def is_collector_running() -> bool:
-    return collector_running
\ No newline at end of file
+    return get_collector_status()["running"]
+
+def _release_leadership():
+    global leader_lock
+    db = SessionLocal()
+    try:
+        state = _get_state(db)
+        if state.leader_pid == os.getpid():
+            state.leader_pid = None
+            state.heartbeat_at = None
+            db.commit()
+    finally:
+        db.close()
+    if leader_lock is not None:
+        fcntl.flock(leader_lock.fileno(), fcntl.LOCK_UN)
+        leader_lock.close()
+        leader_lock = None
+
+def run_standalone():
+    """Run the collector as its own process until SIGTERM/SIGINT.
+
+    The first signal lets a scan in progress finish and commit; a second
+    one exits at once, leaving the scan to be resumed by the next leader.
+    """
+    global leader_role
+    from database.db import init_db
+    init_db()
+    leader_role = "standalone"
+
+    def request_shutdown(signum, frame):
+        if shutdown_event.is_set():
+            raise KeyboardInterrupt
+        print(f"Collector: Received signal {signum}, stopping after the current scan...")
+        shutdown_event.set()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    print(f"Collector: Standalone collector started (pid {os.getpid()}), waiting for leadership...")
+    start_leader_election()
+    while not shutdown_event.is_set():
+        shutdown_event.wait(1)
+    election_thread.join()
+    if collector_thread is not None:
+        collector_thread.join()
+    _release_leadership()
+    print("Collector: Stopped.")
+
+if __name__ == "__main__":
+    run_standalone()
@@ -8,4 +8,93 @@ USERNAME = "root"
 PASSWORD = os.getenv("PASSWORD")
 
 COLLECTOR_ENABLED = os.getenv("COLLECTOR_ENABLED", "True") == "True"
-COLLECTOR_INTERVAL_MINUTES = int(os.getenv("COLLECTOR_INTERVAL_MINUTES", 2))
\ No newline at end of file
+COLLECTOR_INTERVAL_MINUTES = int(os.getenv("COLLECTOR_INTERVAL_MINUTES", 2))
+COLLECTOR_LOCK_FILE = os.getenv("COLLECTOR_LOCK_FILE", "collector.lock")
+COLLECTOR_HEARTBEAT_SECONDS = int(os.getenv("COLLECTOR_HEARTBEAT_SECONDS", 10))
+# embedded: API processes elect a collector among themselves; external: run `python -m collector`
+COLLECTOR_MODE = os.getenv("COLLECTOR_MODE", "embedded")
+# Adaptive cadence: scan devices and neighbor APs on separate intervals that
+# shrink when scans see changes and grow when they don't, within these bounds
+COLLECTOR_ADAPTIVE = os.getenv("COLLECTOR_ADAPTIVE", "False") == "True"
+COLLECTOR_MIN_INTERVAL_MINUTES = float(os.getenv("COLLECTOR_MIN_INTERVAL_MINUTES", 1))
+COLLECTOR_MAX_INTERVAL_MINUTES = float(os.getenv("COLLECTOR_MAX_INTERVAL_MINUTES", 15))
+NEIGHBOR_MIN_INTERVAL_MINUTES = float(os.getenv("NEIGHBOR_MIN_INTERVAL_MINUTES", 5))
+NEIGHBOR_MAX_INTERVAL_MINUTES = float(os.getenv("NEIGHBOR_MAX_INTERVAL_MINUTES", 60))
+# Changes (joins, leaves, IP changes / new APs) a scan should see on average
+COLLECTOR_TARGET_CHANGES = float(os.getenv("COLLECTOR_TARGET_CHANGES", 1))
+NEIGHBOR_TARGET_CHANGES = float(os.getenv("NEIGHBOR_TARGET_CHANGES", 1))
+COLLECTOR_CHURN_ALPHA = float(os.getenv("COLLECTOR_CHURN_ALPHA", 0.5))
+# Longest expected gap between two device scans
+SCAN_INTERVAL_CEILING_MINUTES = COLLECTOR_MAX_INTERVAL_MINUTES if COLLECTOR_ADAPTIVE else COLLECTOR_INTERVAL_MINUTES
+
+SERVER_MODE = os.getenv("SERVER_MODE", "development")  # development | production
+WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:5000")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+
+# Read-only workers serve the analytics endpoints without Selenium installed
+API_READ_ONLY = os.getenv("API_READ_ONLY", "False") == "True"
+SWAGGER_ENABLED = os.getenv("SWAGGER_ENABLED", "True") == "True"
+
+# A device missing from scans for longer than this starts a new presence interval
+PRESENCE_MAX_GAP_MINUTES = float(os.getenv("PRESENCE_MAX_GAP_MINUTES", SCAN_INTERVAL_CEILING_MINUTES * 3))
+# Also keep one DeviceSession row per device per scan. Device history is read
+# from the presence intervals and bitmaps; the per-scan rows only feed the
+# rebuild/backfill tools (presence, bitmaps, activity rollup, daily sketches)
+DEVICE_SESSIONS_ENABLED = os.getenv("DEVICE_SESSIONS_ENABLED", "False") == "True"
+
+# Latest-scan snapshot shared between worker processes
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "live_snapshot.json")
+
+# Scan events (/events SSE stream)
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 1000))
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", 1))
+EVENT_KEEPALIVE_SECONDS = int(os.getenv("EVENT_KEEPALIVE_SECONDS", 15))
+# Every open stream holds one of a worker's WEB_THREADS threads. Streams end
+# after EVENT_STREAM_MAX_SECONDS (clients reconnect and resume), and a worker
+# refuses streams beyond EVENT_MAX_STREAMS_PER_WORKER with 503
+EVENT_STREAM_MAX_SECONDS = float(os.getenv("EVENT_STREAM_MAX_SECONDS", 300))
+EVENT_MAX_STREAMS_PER_WORKER = int(os.getenv("EVENT_MAX_STREAMS_PER_WORKER", max(WEB_THREADS // 2, 1)))
+
+# Scans are persisted in batches; an interrupted scan younger than this is resumed
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", 10))
+SCAN_RESUME_MAX_AGE_MINUTES = int(os.getenv("SCAN_RESUME_MAX_AGE_MINUTES", COLLECTOR_INTERVAL_MINUTES * 5))
+
+# Read device records from the list page's inline JavaScript array instead of one detail page per device
+SCRAPE_INLINE_JS = os.getenv("SCRAPE_INLINE_JS", "True") == "True"
+
+# Cached /devices/<id>/history results (invalidated by the next scan)
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", 256))
+
+# Streaming anomaly detection on each scan
+HOME_WIFI_CHANNEL = int(os.getenv("HOME_WIFI_CHANNEL")) if os.getenv("HOME_WIFI_CHANNEL") else None
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", 3))
+ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", 4))
+ANOMALY_STRONG_SIGNAL_DBM = int(os.getenv("ANOMALY_STRONG_SIGNAL_DBM", -60))
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", 0.2))
+
+# MAC vendor index built with `python -m oui build`
+OUI_INDEX_FILE = os.getenv("OUI_INDEX_FILE", "oui.idx")
+
+# Raw router page archive for offline replay (python -m router.replay)
+PAGE_ARCHIVE_ENABLED = os.getenv("PAGE_ARCHIVE_ENABLED", "False") == "True"
+PAGE_ARCHIVE_CODEC = os.getenv("PAGE_ARCHIVE_CODEC", "lzma")  # lzma | zlib
+
+# Sealed monthly history shards (python -m database.shards seal)
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+SHARD_MMAP_BYTES = int(os.getenv("SHARD_MMAP_BYTES", 256 * 1024 * 1024))
+
+# /router/summary: concurrent requests share one scrape, cached for the TTL and
+# then served stale for up to SUMMARY_STALE_SECONDS while it refreshes
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", 30))
+SUMMARY_STALE_SECONDS = int(os.getenv("SUMMARY_STALE_SECONDS", 300))
+SUMMARY_CACHE_FILE = os.getenv("SUMMARY_CACHE_FILE", "router_summary.json")
+SUMMARY_LOCK_FILE = os.getenv("SUMMARY_LOCK_FILE", "router_summary.lock")
+
+# Router access governor (router/governor.py): concurrent admin sessions across
+# all processes, page loads per second, and how long interactive callers wait
+ROUTER_GOVERNOR_DIR = os.getenv("ROUTER_GOVERNOR_DIR", "router_governor")
+ROUTER_MAX_SESSIONS = int(os.getenv("ROUTER_MAX_SESSIONS", 1))
+ROUTER_PAGES_PER_SECOND = float(os.getenv("ROUTER_PAGES_PER_SECOND", 1))
+ROUTER_PAGE_BURST = int(os.getenv("ROUTER_PAGE_BURST", 3))
+ROUTER_SLOT_TIMEOUT_SECONDS = float(os.getenv("ROUTER_SLOT_TIMEOUT_SECONDS", 60))
@@ -0,0 +1,130 @@
+"""
+Per-device activity rollup behind /devices/timeline.
+
+device_activity holds one row per device and hour, and per device and
+day, with the number of scans that saw the device and the online minutes
+they add up to (each scan weighs its collection interval). The collector
+and the manual collect endpoint upsert both rows of every sighting, one
+statement per batch of a scan's devices, so a timeline reads one row per
+device and bucket instead of grouping every sighting. Finer buckets are
+read from the per-scan presence bitmaps.
+
+Devices.first_seen (the first online sighting, behind the timeline's
+new-device counts) is set by the same writers; rebuild also fills it in for
+devices recorded before the column existed.
+
+Buckets are counted from the epoch, so days start at midnight and no bucket
+straddles two monthly shards. Replay rebuilds the days it rewrote; the whole
+table can be rebuilt from device_sessions (sealed shards included) with
+
+    python -m database.activity rebuild [--since 2026-01-01] [--until 2026-03-31]
+"""
+import argparse
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import func, cast, select, insert, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import COLLECTOR_INTERVAL_MINUTES, DEVICE_SESSIONS_ENABLED
+from .db import engine, init_db
+from .models import Device, DeviceActivity, PresenceInterval, Scan
+from .shards import iter_segments
+
+ROLLUP_SECONDS = (3600, 86400)
+
+def epoch(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+def from_epoch(value: int) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+def bucket_start(value: datetime, size: int) -> datetime:
+    return from_epoch(epoch(value) // size * size)
+
+def record_activity(db, device_ids, seen_at: datetime, interval_minutes: float = None):
+    """Add one scan's sightings to each device's hour and day rows; committed with the caller's session."""
+    if not device_ids:
+        return
+    minutes = COLLECTOR_INTERVAL_MINUTES if interval_minutes is None else interval_minutes
+    stmt = sqlite_insert(DeviceActivity).values([
+        {"bucket_seconds": size, "bucket_start": bucket_start(seen_at, size), "device_id": device_id,
+         "scans": 1, "online_minutes": minutes}
+        for device_id in device_ids
+        for size in ROLLUP_SECONDS
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["bucket_seconds", "bucket_start", "device_id"],
+        set_={
+            "scans": DeviceActivity.scans + stmt.excluded.scans,
+            "online_minutes": DeviceActivity.online_minutes + stmt.excluded.online_minutes,
+        },
+    ))
+
+def rebuild_activity(start: date = None, end: date = None) -> int:
+    """
+    Recompute device_activity for the whole days in [start, end] from
+    device_sessions and fill in missing devices.first_seen; returns the rows written.
+    """
+    lower = datetime.combine(start, time.min) if start else None
+    upper = datetime.combine(end + timedelta(days=1), time.min) if end else None
+    written = 0
+
+    # Shards cannot be ATTACHed inside the write transaction, so sessions are read on a second connection
+    with engine.begin() as conn, engine.connect() as reader:
+        clear = DeviceActivity.__table__.delete()
+        if lower is not None:
+            clear = clear.where(DeviceActivity.bucket_start >= lower)
+        if upper is not None:
+            clear = clear.where(DeviceActivity.bucket_start < upper)
+        conn.execute(clear)
+
+        for scope, segment in iter_segments(reader, lower, upper):
+            sessions = scope.sessions
+            for size in ROLLUP_SECONDS:
+                bucket = (cast(func.strftime('%s', sessions.timestamp), Integer) // size * size).label("bucket")
+                stmt = (
+                    select(
+                        bucket, sessions.device_id, func.count(),
+                        func.sum(func.coalesce(Scan.interval_minutes, COLLECTOR_INTERVAL_MINUTES)),
+                    )
+                    .select_from(sessions)
+                    .outerjoin(Scan, Scan.id == sessions.scan_id)
+                    .where(*segment.clause(sessions.timestamp))
+                    .group_by(bucket, sessions.device_id)
+                )
+                if upper is not None:
+                    stmt = stmt.where(sessions.timestamp < upper)
+                rows = [
+                    {"bucket_seconds": size, "bucket_start": from_epoch(b), "device_id": device_id,
+                     "scans": scans, "online_minutes": minutes}
+                    for b, device_id, scans, minutes in reader.execute(stmt)
+                ]
+                if rows:
+                    conn.execute(insert(DeviceActivity), rows)
+                    written += len(rows)
+
+        first_seen = (
+            select(func.min(PresenceInterval.first_seen))
+            .where(PresenceInterval.device_id == Device.id)
+            .scalar_subquery()
+        )
+        conn.execute(Device.__table__.update().where(Device.first_seen.is_(None)).values(first_seen=first_seen))
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-device activity rollup.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--since", help="first day to rebuild (YYYY-MM-DD), default: all history")
+    parser.add_argument("--until", help="last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if not DEVICE_SESSIONS_ENABLED:
+        print("Device sessions are disabled; there is no history to rebuild from.")
+        return
+    init_db()
+    written = rebuild_activity(
+        date.fromisoformat(args.since) if args.since else None,
+        date.fromisoformat(args.until) if args.until else None,
+    )
+    print(f"Rebuilt {written} device activity row(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Streaming export of device presence and neighbor history.
+
+Rows are pulled from the database in chunks with a server-side cursor
+(stream_results + yield_per) and encoded chunk by chunk, so memory stays
+flat regardless of how many rows the range covers. The sessions export
+has one row per presence interval overlapping the range; the networks
+export one row per neighbor sighting, shard by shard. Used by the
+/export/* endpoints and from the command line:
+
+    python -m database.export sessions --start 2025-01-01 --end 2025-02-01 -f parquet -o sessions.parquet
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+from sqlalchemy import select
+from .db import engine
+from .models import Device, PresenceInterval, NeighborNetwork, NeighborStatus
+from .shards import iter_segments
+
+EXPORT_FORMATS = ("csv", "parquet")
+DEFAULT_CHUNK_SIZE = 5000
+
+SESSION_COLUMNS = [
+    ("interval_id", PresenceInterval.id, "int64"),
+    ("first_seen", PresenceInterval.first_seen, "timestamp"),
+    ("last_seen", PresenceInterval.last_seen, "timestamp"),
+    ("online_duration", PresenceInterval.last_duration, "int64"),
+    ("device_id", Device.id, "int64"),
+    ("hostname", Device.hostname, "string"),
+    ("ip", Device.ip, "string"),
+    ("mac", Device.mac, "string"),
+    ("port_type", Device.port_type, "string"),
+]
+
+NETWORK_COLUMNS = [
+    ("status_id", NeighborStatus.id, "int64"),
+    ("timestamp", NeighborStatus.timestamp, "timestamp"),
+    ("observed_signal_strength", NeighborStatus.signal_strength, "int64"),
+    ("network_id", NeighborNetwork.id, "int64"),
+    ("ssid", NeighborNetwork.ssid, "string"),
+    ("mac", NeighborNetwork.mac, "string"),
+    ("network_type", NeighborNetwork.network_type, "string"),
+    ("channel", NeighborNetwork.channel, "int64"),
+    ("signal_strength", NeighborNetwork.signal_strength, "string"),
+    ("auth_mode", NeighborNetwork.auth_mode, "string"),
+    ("working_mode", NeighborNetwork.working_mode, "string"),
+    ("max_rate", NeighborNetwork.max_rate, "string"),
+]
+
+# kind -> (columns, fact table, joined table, fact column referencing the joined table)
+EXPORTS = {
+    "sessions": (SESSION_COLUMNS, PresenceInterval, Device, "device_id"),
+    "networks": (NETWORK_COLUMNS, NeighborStatus, NeighborNetwork, "network_id"),
+}
+
+def _build_query(kind: str, fact, in_range: list):
+    columns, table, joined, foreign_key = EXPORTS[kind]
+    # Point the fact-table columns at fact (the scope's view over an attached shard)
+    adapt = lambda col: getattr(fact, col.key) if col.class_ is table else col
+
+    stmt = (
+        select(*[adapt(col).label(name) for name, col, _ in columns])
+        .select_from(fact)
+        .join(joined, joined.id == getattr(fact, foreign_key))
+        .where(*in_range)
+    )
+    # Primary key order lets SQLite walk the table without a sort step
+    return stmt.order_by(fact.id)
+
+def _statements(conn, kind: str, start: datetime = None, end: datetime = None):
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    if kind == "sessions":
+        # Intervals overlapping the range; they are not sharded
+        in_range = []
+        if start is not None:
+            in_range.append(PresenceInterval.last_seen >= start)
+        if end is not None:
+            in_range.append(PresenceInterval.first_seen <= end)
+        yield _build_query(kind, PresenceInterval, in_range)
+        return
+    for scope, segment in iter_segments(conn, start, end):
+        statuses = scope.statuses
+        yield _build_query(kind, statuses, segment.clause(statuses.timestamp))
+
+def iter_row_chunks(kind: str, start: datetime = None, end: datetime = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield lists of result rows, at most chunk_size at a time, oldest shard first."""
+    with engine.connect() as conn:
+        for stmt in _statements(conn, kind, start, end):
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+            for chunk in result.partitions():
+                yield chunk
+
+def _iter_csv(kind, chunks):
+    columns = EXPORTS[kind][0]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in columns])
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink:
+    """Write-only file object that hands out whatever has been written since the last drain."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+def _iter_parquet(kind, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = EXPORTS[kind][0]
+    arrow_types = {"int64": pa.int64(), "timestamp": pa.timestamp("us"), "string": pa.string()}
+    schema = pa.schema([(name, arrow_types[kind_]) for name, _, kind_ in columns])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for chunk in chunks:
+        # One row group per chunk, flushed to the client straight away
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+def iter_export(kind: str, fmt: str = "csv", start: datetime = None, end: datetime = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield the encoded export as a stream of byte chunks."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    chunks = iter_row_chunks(kind, start, end, chunk_size)
+    if fmt == "parquet":
+        return _iter_parquet(kind, chunks)
+    return _iter_csv(kind, chunks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export device presence or neighbor history.")
+    parser.add_argument("kind", choices=["sessions", "networks"])
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ISO 8601 start timestamp")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ISO 8601 end timestamp")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for data in iter_export(args.kind, args.format, args.start, args.end, args.chunk_size):
+            out.write(data)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == "__main__":
+    main()
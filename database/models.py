@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, Text, LargeBinary, Date
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -12,6 +12,27 @@ class Device(Base):
     ip = Column(String)
     mac = Column(String, unique=True, nullable=False)
     port_type = Column(String)
+    first_seen = Column(DateTime, index=True)  # first online sighting
+
+class Scan(Base):
+    __tablename__ = 'scans'
+
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, default=datetime.now, nullable=False)  # timestamp stamped on every row
+    finished_at = Column(DateTime)
+    status = Column(String, default="running", nullable=False)  # running | interrupted | complete
+    kind = Column(String, default="full")  # full | devices | networks (NULL on older rows: full)
+    # Collector interval this scan's device sightings stand for (NULL: COLLECTOR_INTERVAL_MINUTES)
+    interval_minutes = Column(Float)
+    # Resume point of the device pages: next page, its first global index, devices done on it
+    device_page = Column(Integer, default=1)
+    device_page_start_index = Column(Integer, default=0)
+    device_page_done = Column(Integer, default=0)
+    devices_complete = Column(Boolean, default=False)
+    networks_complete = Column(Boolean, default=False)
+    devices_written = Column(Integer, default=0)
+    networks_written = Column(Integer, default=0)
+    error = Column(String)
 
 class DeviceSession(Base):
     __tablename__ = 'device_sessions'
@@ -20,6 +41,41 @@ class DeviceSession(Base):
     device_id = Column(Integer, ForeignKey('devices.id'), nullable=False)
     timestamp = Column(DateTime, default=datetime.now)
     online_duration = Column(Integer)  # in minutes
+    scan_id = Column(Integer, ForeignKey('scans.id'), index=True)
+
+    __table_args__ = (
+        Index('ix_device_sessions_timestamp_device', 'timestamp', 'device_id'),
+        Index('ix_device_sessions_device_timestamp', 'device_id', 'timestamp'),
+    )
+
+class PresenceInterval(Base):
+    __tablename__ = 'presence_intervals'
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False)
+    first_seen = Column(DateTime, nullable=False, index=True)
+    last_seen = Column(DateTime, nullable=False, index=True)
+    last_duration = Column(Integer)  # router-reported online minutes at last_seen
+
+    __table_args__ = (Index('ix_presence_device_last_seen', 'device_id', 'last_seen'),)
+
+class PresenceBitmap(Base):
+    __tablename__ = 'presence_bitmaps'
+
+    scan_id = Column(Integer, ForeignKey('scans.id'), primary_key=True)
+    scanned_at = Column(DateTime, nullable=False, index=True)
+    width = Column(Integer, nullable=False)  # bits: highest device id + 1
+    online_count = Column(Integer, nullable=False)
+    bits = Column(LargeBinary, nullable=False)  # zlib(packbits(online), little bit order), bit i = device id i
+
+class DeviceActivity(Base):
+    __tablename__ = 'device_activity'
+
+    bucket_seconds = Column(Integer, primary_key=True)  # 3600 | 86400
+    bucket_start = Column(DateTime, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id'), primary_key=True)
+    scans = Column(Integer, nullable=False, default=0)
+    online_minutes = Column(Float, nullable=False, default=0)
 
 class NeighborNetwork(Base):
     __tablename__ = 'neighbor_networks'
@@ -39,4 +95,124 @@ class NeighborStatus(Base):
 
     id = Column(Integer, primary_key=True)
     network_id = Column(Integer, ForeignKey('neighbor_networks.id'), nullable=False)
-    timestamp = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.now)
+    signal_strength = Column(Integer)  # dBm observed in this scan
+    scan_id = Column(Integer, ForeignKey('scans.id'), index=True)
+
+    __table_args__ = (
+        Index('ix_neighbor_statuses_timestamp_network', 'timestamp', 'network_id'),
+    )
+
+class CollectorState(Base):
+    __tablename__ = 'collector_state'
+
+    id = Column(Integer, primary_key=True)  # single row, id = 1
+    enabled = Column(Boolean, default=False, nullable=False)
+    interval_minutes = Column(Integer, default=2)
+    leader_pid = Column(Integer)
+    leader_host = Column(String)
+    leader_role = Column(String)  # embedded (inside an API process) | standalone
+    heartbeat_at = Column(DateTime)
+    last_run_at = Column(DateTime)
+    last_error = Column(String)
+    # Adaptive cadence (COLLECTOR_ADAPTIVE): current intervals and smoothed changes per minute
+    last_network_run_at = Column(DateTime)
+    device_interval_minutes = Column(Float)
+    network_interval_minutes = Column(Float)
+    device_churn = Column(Float)
+    network_churn = Column(Float)
+
+class ScanEvent(Base):
+    __tablename__ = 'scan_events'
+
+    id = Column(Integer, primary_key=True)  # doubles as the SSE event id
+    created_at = Column(DateTime, default=datetime.now)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text)  # JSON
+
+class DetectorState(Base):
+    __tablename__ = 'detector_state'
+
+    name = Column(String, primary_key=True)  # present once the detector is seeded
+    data = Column(Text)  # JSON; only set on rows written before the keyed tables below
+    updated_at = Column(DateTime, default=datetime.now)
+
+class DetectorCountStat(Base):
+    __tablename__ = 'detector_count_stats'
+
+    hour_of_week = Column(Integer, primary_key=True)  # weekday (0 = Monday) * 24 + hour
+    n = Column(Integer, nullable=False)
+    mean = Column(Float, nullable=False)
+    m2 = Column(Float, nullable=False)  # Welford sum of squared deviations
+
+class DetectorKnownMac(Base):
+    __tablename__ = 'detector_known_macs'
+
+    mac = Column(String, primary_key=True)
+    added_at = Column(DateTime, default=datetime.now)
+
+class DetectorApSignal(Base):
+    __tablename__ = 'detector_ap_signals'
+
+    mac = Column(String, primary_key=True)
+    signal_ewma = Column(Float, nullable=False)  # dBm
+
+class DailySketch(Base):
+    __tablename__ = 'daily_sketches'
+
+    day = Column(Date, primary_key=True)
+    kind = Column(String, primary_key=True)  # devices | networks
+    scans = Column(Integer, nullable=False, default=0)
+    data = Column(LargeBinary, nullable=False)  # zlib(HyperLogLog + t-digest + top-K), see analytics/sketches.py
+    updated_at = Column(DateTime, default=datetime.now)
+
+class Anomaly(Base):
+    __tablename__ = 'anomalies'
+
+    id = Column(Integer, primary_key=True)
+    detected_at = Column(DateTime, default=datetime.now, index=True)
+    anomaly_type = Column(String, nullable=False)
+    details = Column(Text)  # JSON
+
+class PageBlob(Base):
+    __tablename__ = 'page_blobs'
+
+    sha256 = Column(String(64), primary_key=True)  # of the uncompressed UTF-8 page
+    codec = Column(String, nullable=False)  # zlib | lzma
+    size = Column(Integer)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+
+class ArchivedPage(Base):
+    __tablename__ = 'archived_pages'
+
+    id = Column(Integer, primary_key=True)
+    scan_id = Column(Integer, ForeignKey('scans.id'), nullable=False)
+    path = Column(String, nullable=False)  # router path the page was fetched from
+    sha256 = Column(String(64), ForeignKey('page_blobs.sha256'), nullable=False)
+    fetched_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (Index('ix_archived_pages_scan_path', 'scan_id', 'path', unique=True),)
+
+class CollectionRun(Base):
+    __tablename__ = 'collection_runs'
+
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    finished_at = Column(DateTime)
+    trigger = Column(String, nullable=False)  # collector | manual_devices | manual_networks
+    status = Column(String, nullable=False)  # complete | failed
+    scan_id = Column(Integer, ForeignKey('scans.id'))
+    pages_fetched = Column(Integer, default=0)
+    devices_parsed = Column(Integer, default=0)
+    networks_parsed = Column(Integer, default=0)
+    rows_written = Column(Integer, default=0)
+    # Seconds spent per phase
+    login_seconds = Column(Float)
+    list_pages_seconds = Column(Float)
+    detail_pages_seconds = Column(Float)
+    neighbor_query_seconds = Column(Float)
+    db_commit_seconds = Column(Float)
+    # Seconds spent waiting on the router access governor
+    slot_wait_seconds = Column(Float)
+    throttle_seconds = Column(Float)
+    error = Column(String)
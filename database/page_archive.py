@@ -0,0 +1,75 @@
+"""
+Compressed archive of the raw router pages behind each scan.
+
+Every page the collector fetches is stored once per content hash in
+page_blobs (compressed with PAGE_ARCHIVE_CODEC) and indexed per scan and
+path in archived_pages. Identical pages across scans (empty neighbor
+tables, unchanged list pages) therefore cost one index row each.
+router.replay reparses the archive to rebuild scans offline.
+"""
+import hashlib
+import lzma
+import zlib
+from datetime import datetime
+from sqlalchemy import func
+from config import PAGE_ARCHIVE_CODEC
+from .models import ArchivedPage, PageBlob, Scan
+
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 9), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+def store_page(db, scan_id: int, path: str, html: str, fetched_at: datetime = None, codec: str = PAGE_ARCHIVE_CODEC):
+    """Archive one fetched page; a refetch of the same path in a resumed scan replaces the old one."""
+    raw = html.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    if db.get(PageBlob, digest) is None:
+        compress, _ = CODECS[codec]
+        db.add(PageBlob(sha256=digest, codec=codec, size=len(raw), data=compress(raw)))
+        db.flush()
+
+    page = db.query(ArchivedPage).filter_by(scan_id=scan_id, path=path).first()
+    if page:
+        page.sha256 = digest
+        page.fetched_at = fetched_at or datetime.now()
+    else:
+        db.add(ArchivedPage(scan_id=scan_id, path=path, sha256=digest, fetched_at=fetched_at or datetime.now()))
+    return digest
+
+def _decompress(blob: PageBlob) -> str:
+    _, decompress = CODECS[blob.codec]
+    return decompress(blob.data).decode("utf-8")
+
+def load_scan_pages(db, scan_id: int) -> dict[str, str]:
+    """All archived pages of a scan, keyed by path."""
+    rows = (
+        db.query(ArchivedPage.path, PageBlob)
+        .join(PageBlob, PageBlob.sha256 == ArchivedPage.sha256)
+        .filter(ArchivedPage.scan_id == scan_id)
+        .all()
+    )
+    return {path: _decompress(blob) for path, blob in rows}
+
+def archived_scans(db, start: datetime = None, end: datetime = None, scan_ids: list[int] = None) -> list[Scan]:
+    """Scans that have archived pages, oldest first."""
+    query = db.query(Scan).filter(Scan.id.in_(db.query(ArchivedPage.scan_id).distinct()))
+    if start:
+        query = query.filter(Scan.started_at >= start)
+    if end:
+        query = query.filter(Scan.started_at <= end)
+    if scan_ids:
+        query = query.filter(Scan.id.in_(scan_ids))
+    return query.order_by(Scan.started_at, Scan.id).all()
+
+def archive_stats(db) -> dict:
+    pages = db.query(func.count(ArchivedPage.id)).scalar()
+    blobs, raw_bytes, stored_bytes = db.query(
+        func.count(PageBlob.sha256), func.sum(PageBlob.size), func.sum(func.length(PageBlob.data))
+    ).one()
+    return {
+        "pages": pages,
+        "unique_pages": blobs,
+        "raw_bytes": raw_bytes or 0,
+        "stored_bytes": stored_bytes or 0,
+    }
@@ -0,0 +1,139 @@
+"""
+Run-length presence intervals.
+
+A device that stays online is stored as one PresenceInterval row
+(first_seen .. last_seen) that each scan extends in place, instead of one
+DeviceSession row per scan. A new interval starts when the device was
+absent for longer than PRESENCE_MAX_GAP_MINUTES or when the router's
+reported online duration went backwards (it reconnected between scans).
+
+Intervals replace the per-scan DeviceSession rows as the device history:
+/devices/stats, /devices/filter, /devices/<id>/history and /export/sessions
+read them (together with the per-scan presence bitmaps), and the collector
+no longer writes sessions unless DEVICE_SESSIONS_ENABLED is set. Each batch
+of sightings loads the open intervals of its devices with one query.
+
+Rebuild the table from device_sessions (recorded before intervals existed,
+or with DEVICE_SESSIONS_ENABLED) with:
+
+    python -m database.presence backfill
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, insert
+from config import PRESENCE_MAX_GAP_MINUTES, SCAN_INTERVAL_CEILING_MINUTES
+from .db import engine, init_db
+from .models import PresenceInterval
+from .shards import iter_segments
+
+def _continues(last_seen: datetime, last_duration, seen_at: datetime, duration) -> bool:
+    if seen_at - last_seen > timedelta(minutes=PRESENCE_MAX_GAP_MINUTES):
+        return False
+    if duration is not None and last_duration is not None and duration < last_duration:
+        return False
+    return True
+
+def record_presences(db, seen_at: datetime, durations: dict[int, int]) -> dict[int, PresenceInterval]:
+    """Extend or open the interval of every device in one scan's batch of sightings (device id -> duration)."""
+    if not durations:
+        return {}
+    # Only intervals that ended within the gap can continue; the latest one per device wins
+    latest = {}
+    for interval in (
+        db.query(PresenceInterval)
+        .filter(
+            PresenceInterval.device_id.in_(list(durations)),
+            PresenceInterval.last_seen >= seen_at - timedelta(minutes=PRESENCE_MAX_GAP_MINUTES),
+        )
+        .order_by(PresenceInterval.last_seen)
+    ):
+        latest[interval.device_id] = interval
+
+    intervals = {}
+    for device_id, duration in durations.items():
+        interval = latest.get(device_id)
+        if interval and interval.last_seen <= seen_at and _continues(interval.last_seen, interval.last_duration, seen_at, duration):
+            interval.last_seen = seen_at
+            interval.last_duration = duration
+        else:
+            interval = PresenceInterval(device_id=device_id, first_seen=seen_at, last_seen=seen_at, last_duration=duration)
+            db.add(interval)
+        intervals[device_id] = interval
+    return intervals
+
+def record_presence(db, device_id: int, seen_at: datetime, duration: int = None) -> PresenceInterval:
+    """Extend the device's open interval with this sighting, or open a new one."""
+    return record_presences(db, seen_at, {device_id: duration})[device_id]
+
+def online_at(db, at: datetime) -> list[PresenceInterval]:
+    """Intervals covering `at`; a device counts as online until the scan after its last sighting."""
+    grace = timedelta(minutes=SCAN_INTERVAL_CEILING_MINUTES)
+    return (
+        db.query(PresenceInterval)
+        .filter(PresenceInterval.first_seen <= at, PresenceInterval.last_seen >= at - grace)
+        .all()
+    )
+
+def online_minutes(db, start: datetime, end: datetime, device_id: int = None) -> dict[int, float]:
+    """Total online minutes per device, clipped to [start, end]."""
+    clipped = (
+        func.julianday(func.min(PresenceInterval.last_seen, end))
+        - func.julianday(func.max(PresenceInterval.first_seen, start))
+    ) * 1440
+    query = (
+        db.query(PresenceInterval.device_id, func.sum(clipped))
+        .filter(PresenceInterval.first_seen <= end, PresenceInterval.last_seen >= start)
+        .group_by(PresenceInterval.device_id)
+    )
+    if device_id is not None:
+        query = query.filter(PresenceInterval.device_id == device_id)
+    return {dev_id: round(minutes or 0, 2) for dev_id, minutes in query.all()}
+
+def backfill_presence_intervals(batch_size: int = 5000) -> int:
+    """Rebuild presence_intervals from device_sessions (sealed shards included); returns the number of intervals written."""
+    written = 0
+    pending = []
+    current = {}  # device_id -> open interval
+
+    # Shards cannot be ATTACHed inside the write transaction, so sessions are read on a second connection
+    with engine.begin() as conn, engine.connect() as reader:
+        conn.execute(PresenceInterval.__table__.delete())
+        # Oldest shard first, so every device's sightings arrive in time order
+        for scope, segment in iter_segments(reader):
+            sessions = scope.sessions
+            stmt = (
+                select(sessions.device_id, sessions.timestamp, sessions.online_duration)
+                .where(*segment.clause(sessions.timestamp))
+                .order_by(sessions.device_id, sessions.timestamp)
+            )
+            result = reader.execution_options(yield_per=batch_size).execute(stmt)
+            for device_id, timestamp, duration in result:
+                interval = current.get(device_id)
+                if interval and _continues(interval["last_seen"], interval["last_duration"], timestamp, duration):
+                    interval["last_seen"] = timestamp
+                    interval["last_duration"] = duration
+                    continue
+                if interval:
+                    pending.append(interval)
+                current[device_id] = {"device_id": device_id, "first_seen": timestamp, "last_seen": timestamp, "last_duration": duration}
+                if len(pending) >= batch_size:
+                    conn.execute(insert(PresenceInterval), pending)
+                    written += len(pending)
+                    pending = []
+        pending.extend(current.values())
+        if pending:
+            conn.execute(insert(PresenceInterval), pending)
+            written += len(pending)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain device presence intervals.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    init_db()
+    written = backfill_presence_intervals()
+    print(f"Backfilled {written} presence interval(s).")
+
+if __name__ == "__main__":
+    main()
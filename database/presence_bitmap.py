@@ -0,0 +1,157 @@
+"""
+Per-scan presence bitmaps.
+
+Every completed device scan stores one bitmap in presence_bitmaps: bit i
+is set when device id i was online in that scan. Device ids are dense
+autoincrement keys, so a scan of a few hundred devices is a few dozen
+bytes after packbits + zlib. A time range loads as one (scans x bytes)
+uint8 matrix, and the queries are numpy bit operations over it:
+
+- members at a point in time: the latest bitmap at or before it
+- union / intersection over a range: OR / AND reduced over the scans
+- fraction of scans each device was present in: column popcounts
+- pairwise co-occurrence: unpacked scans x devices matrix, M.T @ M
+
+Manual /devices/collect calls run a scan of their own and store a bitmap
+like the collector. Rebuild the table from device_sessions (sealed shards
+included) with:
+
+    python -m database.presence_bitmap backfill
+"""
+import argparse
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, insert
+from config import PRESENCE_MAX_GAP_MINUTES
+from .db import engine, init_db
+from .models import PresenceBitmap
+from .shards import iter_segments
+
+def encode(device_ids) -> tuple[int, int, bytes]:
+    """(width, online count, compressed bits) for a set of device ids."""
+    ids = np.unique(np.asarray(list(device_ids), dtype=np.int64))
+    width = int(ids[-1]) + 1 if len(ids) else 0
+    online = np.zeros(width, dtype=bool)
+    online[ids] = True
+    return width, len(ids), zlib.compress(np.packbits(online, bitorder="little").tobytes(), 9)
+
+def decode(bitmap: PresenceBitmap, n_bytes: int = None) -> np.ndarray:
+    """Packed bits of one scan as uint8, zero-padded to n_bytes."""
+    row = np.frombuffer(zlib.decompress(bitmap.bits), dtype=np.uint8)
+    if n_bytes is not None and len(row) < n_bytes:
+        row = np.concatenate([row, np.zeros(n_bytes - len(row), dtype=np.uint8)])
+    return row
+
+def members(row: np.ndarray) -> list[int]:
+    """Device ids whose bit is set in a packed row."""
+    return np.flatnonzero(np.unpackbits(row, bitorder="little")).tolist()
+
+def _row(scan_id: int, scanned_at: datetime, device_ids) -> dict:
+    width, count, bits = encode(device_ids)
+    return {"scan_id": scan_id, "scanned_at": scanned_at, "width": width, "online_count": count, "bits": bits}
+
+def store_scan_bitmap(db, scan_id: int, scanned_at: datetime, device_ids) -> PresenceBitmap:
+    """Write (or replace) the bitmap of one scan; committed with the caller's session."""
+    return db.merge(PresenceBitmap(**_row(scan_id, scanned_at, device_ids)))
+
+def bitmap_at(db, at: datetime) -> PresenceBitmap:
+    """Latest scan bitmap at or before `at`, or None when no scan ran within PRESENCE_MAX_GAP_MINUTES."""
+    return (
+        db.query(PresenceBitmap)
+        .filter(PresenceBitmap.scanned_at <= at, PresenceBitmap.scanned_at >= at - timedelta(minutes=PRESENCE_MAX_GAP_MINUTES))
+        .order_by(PresenceBitmap.scanned_at.desc())
+        .first()
+    )
+
+def load_range(db, start: datetime, end: datetime) -> tuple[list[datetime], np.ndarray]:
+    """Scan times and the (scans x bytes) packed matrix of every bitmap in [start, end]."""
+    bitmaps = (
+        db.query(PresenceBitmap)
+        .filter(PresenceBitmap.scanned_at.between(start, end))
+        .order_by(PresenceBitmap.scanned_at)
+        .all()
+    )
+    n_bytes = (max((b.width for b in bitmaps), default=0) + 7) // 8
+    matrix = np.zeros((len(bitmaps), n_bytes), dtype=np.uint8)
+    for i, bitmap in enumerate(bitmaps):
+        matrix[i] = decode(bitmap, n_bytes)
+    return [b.scanned_at for b in bitmaps], matrix
+
+def union(matrix: np.ndarray) -> np.ndarray:
+    return np.bitwise_or.reduce(matrix, axis=0) if len(matrix) else np.zeros(matrix.shape[1], dtype=np.uint8)
+
+def intersection(matrix: np.ndarray) -> np.ndarray:
+    return np.bitwise_and.reduce(matrix, axis=0) if len(matrix) else np.zeros(matrix.shape[1], dtype=np.uint8)
+
+def scan_counts(matrix: np.ndarray) -> np.ndarray:
+    """Number of scans each device id was present in."""
+    return np.unpackbits(matrix, axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+
+def present_in(counts: np.ndarray, n_scans: int, min_fraction: float) -> list[int]:
+    """Device ids present in at least min_fraction of n_scans (and in at least one)."""
+    return np.flatnonzero((counts > 0) & (counts >= min_fraction * n_scans)).tolist()
+
+def co_occurrence(matrix: np.ndarray, limit: int = 20, min_together: int = 1) -> list[tuple[int, int, int, int, int]]:
+    """Top device pairs by scans seen together: (device_a, device_b, together, scans_a, scans_b)."""
+    present = np.unpackbits(matrix, axis=1, bitorder="little")
+    active = np.flatnonzero(present.any(axis=0))
+    if len(active) < 2:
+        return []
+    # float32 counts are exact up to 2**24 scans
+    cols = present[:, active].astype(np.float32)
+    together = (cols.T @ cols).astype(np.int64)
+    counts = np.diag(together).copy()
+    a, b = np.triu_indices(len(active), k=1)
+    pair_counts = together[a, b]
+    keep = np.flatnonzero(pair_counts >= min_together)
+    top = keep[np.argsort(-pair_counts[keep], kind="stable")[:limit]]
+    return [
+        (int(active[a[i]]), int(active[b[i]]), int(pair_counts[i]), int(counts[a[i]]), int(counts[b[i]]))
+        for i in top
+    ]
+
+def backfill_presence_bitmaps(batch_size: int = 1000) -> int:
+    """Rebuild presence_bitmaps from device_sessions; returns the number of scans written."""
+    written = 0
+    pending = []
+
+    # Shards cannot be ATTACHed inside the write transaction, so sessions are read on a second connection
+    with engine.begin() as conn, engine.connect() as reader:
+        conn.execute(PresenceBitmap.__table__.delete())
+        for scope, segment in iter_segments(reader):
+            sessions = scope.sessions
+            stmt = (
+                select(sessions.scan_id, sessions.timestamp, sessions.device_id)
+                .where(sessions.scan_id.isnot(None), *segment.clause(sessions.timestamp))
+                .order_by(sessions.scan_id)
+            )
+            scan_id, scanned_at, device_ids = None, None, []
+            for row_scan_id, timestamp, device_id in reader.execution_options(yield_per=50000).execute(stmt):
+                if row_scan_id != scan_id:
+                    if scan_id is not None:
+                        pending.append(_row(scan_id, scanned_at, device_ids))
+                    scan_id, scanned_at, device_ids = row_scan_id, timestamp, []
+                device_ids.append(device_id)
+                if len(pending) >= batch_size:
+                    conn.execute(insert(PresenceBitmap), pending)
+                    written += len(pending)
+                    pending = []
+            if scan_id is not None:
+                pending.append(_row(scan_id, scanned_at, device_ids))
+        if pending:
+            conn.execute(insert(PresenceBitmap), pending)
+            written += len(pending)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-scan presence bitmaps.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    init_db()
+    written = backfill_presence_bitmaps()
+    print(f"Backfilled {written} presence bitmap(s).")
+
+if __name__ == "__main__":
+    main()
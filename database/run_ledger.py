@@ -0,0 +1,101 @@
+"""
+Ledger of collection runs.
+
+Every collect_data() run and manual collect call leaves one
+collection_runs row: what triggered it, pages fetched, records parsed and
+written, and seconds spent per phase (login, device list pages, device
+detail pages, neighbor query, DB commits, and the time spent waiting for a
+router session slot or page-load token). Page timings and governor waits
+come from RouterScraper.phase_seconds, commit time from whoever commits.
+"""
+import time
+from datetime import datetime
+import numpy as np
+from .db import SessionLocal
+from .models import CollectionRun
+
+PHASES = ("login", "list_pages", "detail_pages", "neighbor_query", "db_commit", "slot_wait", "throttle")
+PERCENTILES = (50, 95, 99)
+
+class RunRecorder:
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self.started_at = datetime.now()
+        self.devices_parsed = 0
+        self.networks_parsed = 0
+        self.rows_written = 0
+        self.commit_seconds = 0.0
+
+    def timed_commit(self, db):
+        start = time.perf_counter()
+        db.commit()
+        self.commit_seconds += time.perf_counter() - start
+
+    def finish(self, scraper=None, writer=None, error: Exception = None) -> CollectionRun:
+        """Write the run in its own session, so it is kept even when the scan rolled back."""
+        phase_seconds = dict(scraper.phase_seconds) if scraper else {}
+        commit_seconds = self.commit_seconds + (writer.commit_seconds if writer else 0.0)
+        run = CollectionRun(
+            started_at=self.started_at,
+            finished_at=datetime.now(),
+            trigger=self.trigger,
+            status="failed" if error else "complete",
+            scan_id=writer.scan.id if writer else None,
+            pages_fetched=scraper.pages_fetched if scraper else 0,
+            devices_parsed=self.devices_parsed,
+            networks_parsed=self.networks_parsed,
+            rows_written=self.rows_written + (writer.rows_written if writer else 0),
+            login_seconds=round(phase_seconds.get("login", 0.0), 3),
+            list_pages_seconds=round(phase_seconds.get("list_pages", 0.0), 3),
+            detail_pages_seconds=round(phase_seconds.get("detail_pages", 0.0), 3),
+            neighbor_query_seconds=round(phase_seconds.get("neighbor_query", 0.0), 3),
+            db_commit_seconds=round(commit_seconds, 3),
+            slot_wait_seconds=round(phase_seconds.get("slot_wait", 0.0), 3),
+            throttle_seconds=round(phase_seconds.get("throttle", 0.0), 3),
+            error=str(error) if error else None,
+        )
+        db = SessionLocal()
+        try:
+            db.add(run)
+            db.commit()
+            db.refresh(run)
+        except Exception as e:
+            print(f"Collector: Could not record collection run: {e}")
+        finally:
+            db.close()
+        return run
+
+def run_to_dict(run: CollectionRun) -> dict:
+    return {
+        "id": run.id,
+        "started_at": run.started_at.isoformat(),
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "duration_seconds": round((run.finished_at - run.started_at).total_seconds(), 3) if run.finished_at else None,
+        "trigger": run.trigger,
+        "status": run.status,
+        "scan_id": run.scan_id,
+        "pages_fetched": run.pages_fetched,
+        "devices_parsed": run.devices_parsed,
+        "networks_parsed": run.networks_parsed,
+        "rows_written": run.rows_written,
+        "phase_seconds": {phase: getattr(run, f"{phase}_seconds") for phase in PHASES},
+        "error": run.error,
+    }
+
+def _percentiles(values: list[float]) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {f"p{p}": None for p in PERCENTILES} | {"max": None}
+    points = np.percentile(values, PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, points)} | {"max": round(max(values), 3)}
+
+def summarize_runs(runs: list[CollectionRun]) -> dict:
+    """Percentiles of total and per-phase durations plus page/record counts."""
+    completed = [r for r in runs if r.status == "complete"]
+    return {
+        "runs": len(runs),
+        "failed": len(runs) - len(completed),
+        "duration_seconds": _percentiles([(r.finished_at - r.started_at).total_seconds() for r in completed if r.finished_at]),
+        "phase_seconds": {phase: _percentiles([getattr(r, f"{phase}_seconds") for r in completed]) for phase in PHASES},
+        "pages_fetched": _percentiles([r.pages_fetched for r in completed]),
+    }
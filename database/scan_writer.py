@@ -0,0 +1,237 @@
+"""
+Incremental persistence of one collector scan.
+
+Records from RouterScraper.iter_devices() / iter_neighboring_aps() are
+written in batches of SCAN_BATCH_SIZE, each commit also saving the
+scraper's resume cursor on the Scan row. Device records are buffered until
+the batch is written, so a batch looks up its devices and their open
+presence intervals with one query each. If the scan dies midway,
+everything up to the last commit is kept and the next collection resumes
+the same scan (same timestamp, same scan id) from that cursor.
+"""
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from config import SCAN_BATCH_SIZE, SCAN_RESUME_MAX_AGE_MINUTES, DEVICE_SESSIONS_ENABLED
+from .models import Device, DeviceSession, NeighborNetwork, NeighborStatus, PresenceInterval, Scan
+from .presence import record_presences
+from .page_archive import store_page
+from .presence_bitmap import store_scan_bitmap
+from .activity import record_activity
+
+class ScanWriter:
+    def __init__(self, db, scan: Scan, batch_size: int = SCAN_BATCH_SIZE, track_presence: bool = True):
+        self.db = db
+        self.scan = scan
+        self.batch_size = max(batch_size, 1)
+        self.track_presence = track_presence
+        self.pending = 0
+        self.rows_written = 0
+        self.commit_seconds = 0.0
+        self.online_ids = set()  # devices seen online by this writer, for the scan's presence bitmap
+        self.device_batch = []  # device records not yet written
+
+    @classmethod
+    def start(cls, db, kind: str = "full", batch_size: int = SCAN_BATCH_SIZE) -> "ScanWriter":
+        """Resume the latest unfinished scan of this kind if it is recent enough, otherwise start a new one."""
+        cutoff = datetime.now() - timedelta(minutes=SCAN_RESUME_MAX_AGE_MINUTES)
+        same_kind = or_(Scan.kind == kind, Scan.kind.is_(None)) if kind == "full" else Scan.kind == kind
+        scan = (
+            db.query(Scan)
+            .filter(Scan.status.in_(["running", "interrupted"]), Scan.started_at >= cutoff, same_kind)
+            .order_by(Scan.id.desc())
+            .first()
+        )
+        if scan:
+            print(f"Collector: Resuming scan {scan.id} from page {scan.device_page}.")
+            scan.status = "running"
+            scan.error = None
+        else:
+            scan = Scan(started_at=datetime.now(), status="running", kind=kind)
+            db.add(scan)
+        db.commit()
+        return cls(db, scan, batch_size)
+
+    @classmethod
+    def rewrite(cls, db, scan: Scan, devices: bool = True, batch_size: int = SCAN_BATCH_SIZE) -> "ScanWriter":
+        """Reopen an earlier scan so its rows can be written again (used by router.replay).
+
+        Device sessions are dropped when `devices` is set; neighbor rows are
+        dropped by begin_networks() as usual. Presence intervals are not
+        touched: they only grow forwards in time, so the caller rebuilds them
+        once every replayed scan is written.
+        """
+        if devices:
+            db.query(DeviceSession).filter(DeviceSession.scan_id == scan.id).delete(synchronize_session=False)
+            scan.devices_complete = False
+            scan.devices_written = 0
+        scan.error = None
+        db.commit()
+        return cls(db, scan, batch_size, track_presence=False)
+
+    @property
+    def scanned_at(self) -> datetime:
+        return self.scan.started_at
+
+    def resume_point(self) -> tuple[int, int, int]:
+        return self.scan.device_page or 1, self.scan.device_page_start_index or 0, self.scan.device_page_done or 0
+
+    def _written(self, cursor=None):
+        if cursor is not None:
+            self.scan.device_page, self.scan.device_page_start_index, self.scan.device_page_done = cursor
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._write_devices()
+        start = time.perf_counter()
+        self.db.commit()
+        self.commit_seconds += time.perf_counter() - start
+        self.pending = 0
+
+    def add_device(self, device, cursor=None):
+        self.device_batch.append(device)
+        self._written(cursor)
+
+    def _write_devices(self):
+        batch, self.device_batch = self.device_batch, []
+        if not batch:
+            return
+        known = {d.mac: d for d in self.db.query(Device).filter(Device.mac.in_({device.mac for device in batch}))}
+        for device in batch:
+            existing = known.get(device.mac)
+            if not existing:
+                existing = known[device.mac] = Device(
+                    hostname=device.hostname,
+                    ip=device.ip,
+                    mac=device.mac,
+                    port_type=device.port_type
+                )
+                self.db.add(existing)
+                self.rows_written += 1
+            elif device.status.lower() == "online":
+                # Keep the current address so IP changes show up in events
+                existing.hostname = device.hostname
+                existing.ip = device.ip
+                existing.port_type = device.port_type
+        self.db.flush()
+
+        durations = {}
+        for device in batch:
+            if device.status.lower() != "online":
+                continue
+            existing = known[device.mac]
+            durations[existing.id] = device.duration
+            if existing.first_seen is None or self.scanned_at < existing.first_seen:
+                existing.first_seen = self.scanned_at
+            if DEVICE_SESSIONS_ENABLED:
+                self.db.add(DeviceSession(
+                    device_id=existing.id,
+                    timestamp=self.scanned_at,
+                    online_duration=device.duration,
+                    scan_id=self.scan.id
+                ))
+                self.rows_written += 1
+            self.scan.devices_written = (self.scan.devices_written or 0) + 1
+        self.online_ids.update(durations)
+        if self.track_presence:
+            record_presences(self.db, self.scanned_at, durations)
+            record_activity(self.db, list(durations), self.scanned_at, self.scan.interval_minutes)
+
+    def archive_page(self, path: str, html: str):
+        """Page sink for RouterScraper; committed together with the records parsed from it."""
+        store_page(self.db, self.scan.id, path, html)
+
+    def complete_devices(self):
+        self._write_devices()
+        self.scan.devices_complete = True
+        store_scan_bitmap(self.db, self.scan.id, self.scanned_at, self.online_ids | self._committed_online_ids())
+        self.checkpoint()
+
+    def _committed_online_ids(self) -> set[int]:
+        """Devices a resumed scan recorded before this writer took over."""
+        if DEVICE_SESSIONS_ENABLED:
+            rows = self.db.query(DeviceSession.device_id).filter(DeviceSession.scan_id == self.scan.id)
+        elif self.track_presence:
+            rows = self.db.query(PresenceInterval.device_id).filter(PresenceInterval.last_seen == self.scanned_at)
+        else:
+            return set()
+        return {device_id for device_id, in rows.all()}
+
+    def begin_networks(self):
+        # The neighbor table is one page; drop rows of a half-written earlier attempt
+        self.db.query(NeighborStatus).filter(NeighborStatus.scan_id == self.scan.id).delete(synchronize_session=False)
+        self.scan.networks_written = 0
+        self.checkpoint()
+
+    def add_network(self, net: dict):
+        existing = self.db.query(NeighborNetwork).filter_by(mac=net.get("mac")).first()
+        if not existing:
+            existing = NeighborNetwork(
+                ssid=net.get("ssid"),
+                mac=net.get("mac"),
+                network_type=net.get("network_type"),
+                channel=int(net.get("channel")) if net.get("channel") else None,
+                signal_strength=net.get("signal_strength"),
+                auth_mode=net.get("auth_mode"),
+                working_mode=net.get("working_mode"),
+                max_rate=net.get("max_rate"),
+            )
+            self.db.add(existing)
+            self.db.flush()
+            self.rows_written += 1
+        else:
+            existing.ssid = net.get("ssid")
+            existing.network_type = net.get("network_type")
+            existing.channel = int(net.get("channel")) if net.get("channel") else None
+            existing.signal_strength = net.get("signal_strength")
+            existing.auth_mode = net.get("auth_mode")
+            existing.working_mode = net.get("working_mode")
+            existing.max_rate = net.get("max_rate")
+
+        self.db.add(NeighborStatus(
+            network_id=existing.id,
+            timestamp=self.scanned_at,
+            signal_strength=net.get("signal_strength"),
+            scan_id=self.scan.id
+        ))
+        self.scan.networks_written = (self.scan.networks_written or 0) + 1
+        self.rows_written += 1
+        self._written()
+
+    def complete_networks(self):
+        self.scan.networks_complete = True
+        self.checkpoint()
+
+    def finish(self):
+        self.scan.status = "complete"
+        self.scan.finished_at = datetime.now()
+        self.checkpoint()
+
+    def interrupt(self, error: Exception):
+        """Keep what was committed so far and mark the scan resumable."""
+        self.device_batch = []
+        self.db.rollback()
+        self.scan.status = "interrupted"
+        self.scan.error = str(error)
+        self.db.commit()
+        self.pending = 0
+
+    def online_devices(self) -> list[tuple[Device, int]]:
+        """Devices seen online in this scan, with their reported duration."""
+        return (
+            self.db.query(Device, PresenceInterval.last_duration)
+            .join(PresenceInterval, PresenceInterval.device_id == Device.id)
+            .filter(PresenceInterval.last_seen == self.scanned_at)
+            .all()
+        )
+
+    def visible_networks(self) -> list[tuple[NeighborNetwork, int]]:
+        """Networks sighted in this scan, with the observed signal."""
+        return (
+            self.db.query(NeighborNetwork, NeighborStatus.signal_strength)
+            .join(NeighborStatus, NeighborStatus.network_id == NeighborNetwork.id)
+            .filter(NeighborStatus.scan_id == self.scan.id)
+            .all()
+        )
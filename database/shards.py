@@ -0,0 +1,247 @@
+"""
+Monthly history shards.
+
+device_sessions and neighbor_statuses grow with every scan. Finished
+months can be sealed: their rows are moved into SHARD_DIR/history_YYYY_MM.db,
+a compacted, read-only SQLite file, and deleted from router_data.db. The
+current month always stays in the main database where the collector writes.
+
+Readers that take a time range walk iter_segments(): the range is split
+at sealed month boundaries, so every piece lives in exactly one table.
+For a sealed month that shard is ATTACHed (read-only, immutable, mmapped)
+and scope.sessions / scope.statuses are its tables mapped like
+DeviceSession / NeighborStatus; for the rest they are the plain models.
+Either way a query hits a single table and keeps its timestamp and
+covering indexes, and callers add up the per-segment results.
+
+The shard directory is the registry: retiring a month means moving its
+file out of SHARD_DIR, restoring it means moving it back.
+
+    python -m database.shards seal --before 2026-01   # seal every month before January
+    python -m database.shards list
+"""
+import argparse
+import os
+import re
+import stat
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from sqlalchemy import Column, Index, MetaData, Table, create_engine, insert, select, delete
+from sqlalchemy.orm import aliased
+from config import SHARD_DIR, SHARD_MMAP_BYTES
+from .db import engine, init_db
+from .models import DeviceSession, NeighborStatus
+
+SHARDED_MODELS = (DeviceSession, NeighborStatus)
+_SHARD_FILE_RE = re.compile(r"^history_(\d{4})_(\d{2})\.db$")
+_shard_metadata = MetaData()
+
+class ShardRangeError(ValueError):
+    pass
+
+def _next_month(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def shard_path(month: date) -> str:
+    return os.path.join(SHARD_DIR, f"history_{month.year:04d}_{month.month:02d}.db")
+
+def sealed_months() -> list[date]:
+    """First day of every month that has a shard file in SHARD_DIR, oldest first."""
+    if not os.path.isdir(SHARD_DIR):
+        return []
+    months = []
+    for name in os.listdir(SHARD_DIR):
+        match = _SHARD_FILE_RE.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+def _overlaps(month: date, start: datetime = None, end: datetime = None) -> bool:
+    lower = datetime.combine(month, datetime.min.time())
+    upper = datetime.combine(_next_month(month), datetime.min.time())
+    return (end is None or lower <= end) and (start is None or upper > start)
+
+def _shard_table(model, schema: str) -> Table:
+    """The model's table inside an attached shard: same columns, no foreign keys."""
+    key = f"{schema}.{model.__tablename__}"
+    if key not in _shard_metadata.tables:
+        Table(
+            model.__tablename__, _shard_metadata,
+            *[Column(c.name, c.type, primary_key=c.primary_key) for c in model.__table__.columns],
+            schema=schema,
+        )
+    return _shard_metadata.tables[key]
+
+def _alias(month: date) -> str:
+    return f"shard_{month.year:04d}_{month.month:02d}"
+
+class ShardScope:
+    def __init__(self, month: date = None):
+        self.month = month
+        if month is None:
+            self.sessions, self.statuses = DeviceSession, NeighborStatus
+            return
+        # The shard's own table under the model's attribute names, not a view over it
+        self.sessions, self.statuses = (
+            aliased(model, _shard_table(model, _alias(month)), adapt_on_names=True) for model in SHARDED_MODELS
+        )
+
+@contextmanager
+def _attached(db, month: date = None):
+    if month is None:
+        yield ShardScope()
+        return
+    conn = db if hasattr(db, "exec_driver_sql") else db.connection()
+    uri = f"file:{os.path.abspath(shard_path(month))}?mode=ro&immutable=1"
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {_alias(month)}", (uri,))
+    try:
+        conn.exec_driver_sql(f"PRAGMA {_alias(month)}.mmap_size = {SHARD_MMAP_BYTES}")
+        yield ShardScope(month)
+    finally:
+        conn.exec_driver_sql(f"DETACH DATABASE {_alias(month)}")
+
+@dataclass
+class Segment:
+    start: datetime = None
+    end: datetime = None
+    end_inclusive: bool = True
+    month: date = None  # sealed month covered by this segment, if any
+
+    def clause(self, column):
+        clauses = []
+        if self.start is not None:
+            clauses.append(column >= self.start)
+        if self.end is not None:
+            clauses.append(column <= self.end if self.end_inclusive else column < self.end)
+        return clauses
+
+def month_segments(start: datetime = None, end: datetime = None) -> list[Segment]:
+    """Split [start, end] at sealed month boundaries so each piece needs at most one shard."""
+    segments = []
+    cursor = start
+    for month in sealed_months():
+        if not _overlaps(month, start, end):
+            continue
+        lower = datetime.combine(month, datetime.min.time())
+        upper = datetime.combine(_next_month(month), datetime.min.time())
+        if cursor is None or cursor < lower:
+            segments.append(Segment(cursor, lower, False))
+        segment_end, inclusive = (end, True) if end is not None and end < upper else (upper, False)
+        segments.append(Segment(max(cursor, lower) if cursor else lower, segment_end, inclusive, month))
+        cursor = upper
+    if end is None or cursor is None or cursor <= end:
+        segments.append(Segment(cursor, end, True))
+    return segments
+
+def iter_segments(db, start: datetime = None, end: datetime = None):
+    """Yield (scope, segment) per month_segments() piece with its shard, if any, attached."""
+    for segment in month_segments(start, end):
+        with _attached(db, segment.month) as scope:
+            yield scope, segment
+
+def is_sealed(value: datetime) -> bool:
+    return month_start(value) in sealed_months()
+
+def seal_month(month: date, vacuum: bool = False) -> dict:
+    """Move one finished month of history into its read-only shard file."""
+    if month >= month_start(datetime.now()):
+        raise ShardRangeError("only months before the current one can be sealed")
+    path = shard_path(month)
+    if os.path.exists(path):
+        raise ShardRangeError(f"{path} already exists")
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    lower = datetime.combine(month, datetime.min.time())
+    upper = datetime.combine(_next_month(month), datetime.min.time())
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    shard_engine = create_engine(f"sqlite:///{temp_path}")
+    shard_metadata = MetaData()
+    for model in SHARDED_MODELS:
+        table = Table(
+            model.__tablename__, shard_metadata,
+            *[Column(c.name, c.type, primary_key=c.primary_key) for c in model.__table__.columns],
+        )
+        for index in model.__table__.indexes:
+            Index(index.name, *[table.c[c.name] for c in index.columns])
+    shard_metadata.create_all(shard_engine)
+    shard_engine.dispose()
+
+    moved = {}
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS sealing", (temp_path,))
+        try:
+            for model in SHARDED_MODELS:
+                source = model.__table__
+                target = _shard_table(model, "sealing")
+                in_month = (source.c.timestamp >= lower, source.c.timestamp < upper)
+                result = conn.execute(insert(target).from_select(
+                    [c.name for c in source.columns], select(*source.columns).where(*in_month).order_by(source.c.id)
+                ))
+                moved[model.__tablename__] = result.rowcount
+                conn.execute(delete(source).where(*in_month))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE sealing")
+            conn.commit()
+
+    shard_engine = create_engine(f"sqlite:///{temp_path}")
+    with shard_engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("VACUUM")
+    shard_engine.dispose()
+    os.replace(temp_path, path)
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+    if vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description="Seal and list monthly history shards.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    seal = subparsers.add_parser("seal", help="move finished months into read-only shard files")
+    seal.add_argument("--before", help="seal every month before this one (YYYY-MM), default: the current month")
+    seal.add_argument("--month", help="seal just this month (YYYY-MM)")
+    seal.add_argument("--vacuum", action="store_true", help="VACUUM router_data.db afterwards")
+    subparsers.add_parser("list", help="list sealed shards")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "list":
+        for month in sealed_months():
+            path = shard_path(month)
+            print(f"{month:%Y-%m}\t{os.path.getsize(path) / 1e6:.1f} MB\t{path}")
+        return
+
+    if args.month:
+        months = [month_start(datetime.strptime(args.month, "%Y-%m"))]
+    else:
+        before = month_start(datetime.strptime(args.before, "%Y-%m")) if args.before else month_start(datetime.now())
+        with engine.connect() as conn:
+            oldest = conn.execute(select(DeviceSession.timestamp).order_by(DeviceSession.timestamp).limit(1)).scalar()
+            oldest_status = conn.execute(select(NeighborStatus.timestamp).order_by(NeighborStatus.timestamp).limit(1)).scalar()
+        oldest = min([t for t in (oldest, oldest_status) if t is not None], default=None)
+        months = []
+        month = month_start(oldest) if oldest else before
+        while month < before:
+            if month not in sealed_months():
+                months.append(month)
+            month = _next_month(month)
+
+    for i, month in enumerate(months):
+        moved = seal_month(month, vacuum=args.vacuum and i == len(months) - 1)
+        print(f"Sealed {month:%Y-%m}: {moved}")
+
+if __name__ == "__main__":
+    main()
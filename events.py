@@ -0,0 +1,211 @@
+"""
+Scan-to-scan change events and their SSE feed.
+
+publish_scan() swaps in the new live snapshot, diffs it against the
+previous one and appends the resulting events to the scan_events table,
+which is trimmed to the last EVENT_BUFFER_SIZE rows and doubles as the
+replay buffer. Each worker process runs one EventFeed thread that tails the
+table and wakes the SSE clients connected to that process, so the database
+sees one small indexed query per process per EVENT_POLL_SECONDS no matter
+how many dashboards are listening.
+
+A stream occupies a worker thread, so each worker serves at most
+EVENT_MAX_STREAMS_PER_WORKER of them and closes each one after
+EVENT_STREAM_MAX_SECONDS; EventSource clients reconnect after the
+advertised retry delay and resume from Last-Event-ID. A client resuming
+from an event that already left the buffer gets a `reset` event first,
+telling it to refetch current state instead of relying on the stream.
+"""
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+from sqlalchemy import func
+from config import (
+    EVENT_BUFFER_SIZE, EVENT_POLL_SECONDS, EVENT_KEEPALIVE_SECONDS, EVENT_STREAM_MAX_SECONDS, EVENT_MAX_STREAMS_PER_WORKER
+)
+from database.db import SessionLocal
+from database.models import ScanEvent
+from snapshot import get_snapshot, publish_snapshot
+from analytics.anomaly import detect_anomalies
+from analytics.sketches import record_scan
+
+Event = namedtuple("Event", ["id", "event_type", "created_at", "payload"])
+
+DEVICE_JOINED = "device_joined"
+DEVICE_LEFT = "device_left"
+DEVICE_IP_CHANGED = "device_ip_changed"
+NETWORK_APPEARED = "network_appeared"
+NETWORK_DISAPPEARED = "network_disappeared"
+STREAM_RESET = "reset"
+# Anomalies from analytics.anomaly are published as "anomaly_<anomaly_type>"
+
+def _device_payload(device) -> dict:
+    return {"device_id": device.id, "hostname": device.hostname, "ip": device.ip, "mac": device.mac}
+
+def _network_payload(network) -> dict:
+    return {"network_id": network.id, "ssid": network.ssid, "mac": network.mac, "channel": network.channel,
+            "signal_strength": network.observed_signal}
+
+def diff_snapshots(previous, current) -> list[tuple[str, dict]]:
+    """Events between two snapshots; parts never scanned before produce none."""
+    events = []
+    if previous is None:
+        return events
+
+    if previous.devices_scanned_at and current.devices_scanned_at != previous.devices_scanned_at:
+        before = {d.id: d for d in previous.devices}
+        after = {d.id: d for d in current.devices}
+        for device_id, device in after.items():
+            if device_id not in before:
+                events.append((DEVICE_JOINED, _device_payload(device)))
+            elif before[device_id].ip != device.ip:
+                events.append((DEVICE_IP_CHANGED, {**_device_payload(device), "previous_ip": before[device_id].ip}))
+        for device_id, device in before.items():
+            if device_id not in after:
+                events.append((DEVICE_LEFT, _device_payload(device)))
+
+    if previous.networks_scanned_at and current.networks_scanned_at != previous.networks_scanned_at:
+        before = {n.id: n for n in previous.networks}
+        after = {n.id: n for n in current.networks}
+        for network_id, network in after.items():
+            if network_id not in before:
+                events.append((NETWORK_APPEARED, _network_payload(network)))
+        for network_id, network in before.items():
+            if network_id not in after:
+                events.append((NETWORK_DISAPPEARED, _network_payload(network)))
+
+    return events
+
+def publish_events(events: list[tuple[str, dict]], created_at: datetime = None):
+    if not events:
+        return
+    created_at = created_at or datetime.now()
+    db = SessionLocal()
+    try:
+        for event_type, payload in events:
+            db.add(ScanEvent(created_at=created_at, event_type=event_type, payload=json.dumps(payload)))
+        db.flush()
+        newest = db.query(func.max(ScanEvent.id)).scalar()
+        db.query(ScanEvent).filter(ScanEvent.id <= newest - EVENT_BUFFER_SIZE).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def publish_scan(scanned_at: datetime, devices: list = None, networks: list = None) -> list[tuple[str, dict]]:
+    """Publish the new snapshot and the events it implies; returns the events."""
+    previous = get_snapshot()
+    current = publish_snapshot(scanned_at, devices=devices, networks=networks)
+    events = diff_snapshots(previous, current)
+    try:
+        anomalies = detect_anomalies(scanned_at, devices, networks)
+        events.extend((f"anomaly_{anomaly['anomaly_type']}", anomaly) for anomaly in anomalies)
+    except Exception as e:
+        print(f"Events: anomaly detection failed: {e}")
+    try:
+        record_scan(scanned_at, devices, networks)
+    except Exception as e:
+        print(f"Events: could not update the daily sketches: {e}")
+    try:
+        publish_events(events, scanned_at)
+    except Exception as e:
+        print(f"Events: could not store {len(events)} event(s): {e}")
+    return events
+
+class EventFeed:
+    """Per-process tail of scan_events feeding the SSE clients of this worker."""
+
+    def __init__(self):
+        self.buffer = deque(maxlen=EVENT_BUFFER_SIZE)
+        self.condition = threading.Condition()
+        self.last_id = 0
+        self.thread = None
+        self.streams = 0
+
+    def _fetch_after(self, after_id: int) -> list[Event]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(ScanEvent)
+                .filter(ScanEvent.id > after_id)
+                .order_by(ScanEvent.id)
+                .limit(EVENT_BUFFER_SIZE)
+                .all()
+            )
+            return [Event(r.id, r.event_type, r.created_at, r.payload) for r in rows]
+        finally:
+            db.close()
+
+    def _poll_loop(self):
+        while True:
+            try:
+                events = self._fetch_after(self.last_id)
+            except Exception as e:
+                print(f"Events: poll failed: {e}")
+                events = []
+            if events:
+                with self.condition:
+                    self.buffer.extend(events)
+                    self.last_id = events[-1].id
+                    self.condition.notify_all()
+            time.sleep(EVENT_POLL_SECONDS)
+
+    def start(self):
+        with self.condition:
+            if self.thread is not None:
+                return
+            # Seed the replay buffer with whatever the table still holds
+            db = SessionLocal()
+            try:
+                newest = db.query(func.max(ScanEvent.id)).scalar() or 0
+            finally:
+                db.close()
+            events = self._fetch_after(max(newest - EVENT_BUFFER_SIZE, 0))
+            self.buffer.extend(events)
+            self.last_id = events[-1].id if events else newest
+            self.thread = threading.Thread(target=self._poll_loop, daemon=True)
+            self.thread.start()
+
+    def open_stream(self) -> bool:
+        """Reserve one of this worker's stream slots; False when all are taken."""
+        with self.condition:
+            if self.streams >= EVENT_MAX_STREAMS_PER_WORKER:
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self):
+        with self.condition:
+            self.streams -= 1
+
+    def stream(self, last_event_id: int = None):
+        """Yield SSE-formatted chunks for up to EVENT_STREAM_MAX_SECONDS, resuming after last_event_id when given."""
+        self.start()
+        with self.condition:
+            cursor = last_event_id if last_event_id is not None else self.last_id
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+
+        yield f"retry: {int(EVENT_POLL_SECONDS * 1000) * 2}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self.condition:
+                pending = [e for e in self.buffer if e.id > cursor]
+                if not pending:
+                    self.condition.wait(timeout=min(EVENT_KEEPALIVE_SECONDS, remaining))
+                    pending = [e for e in self.buffer if e.id > cursor]
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            if pending[0].id > cursor + 1:
+                # Events between the cursor and the oldest buffered one are gone
+                data = json.dumps({"last_event_id": cursor, "oldest_available_id": pending[0].id})
+                yield f"event: {STREAM_RESET}\ndata: {data}\n\n"
+            for event in pending:
+                data = json.dumps({"created_at": event.created_at.isoformat(), **json.loads(event.payload or "{}")})
+                yield f"id: {event.id}\nevent: {event.event_type}\ndata: {data}\n\n"
+                cursor = event.id
+
+event_feed = EventFeed()
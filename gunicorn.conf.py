@@ -0,0 +1,19 @@
+from config import WEB_BIND, WEB_WORKERS, WEB_THREADS, API_READ_ONLY, COLLECTOR_MODE
+
+bind = WEB_BIND
+workers = WEB_WORKERS
+threads = WEB_THREADS
+worker_class = "gthread"
+
+def on_starting(server):
+    # Create the schema once in the master instead of in every worker
+    from database.db import init_db
+    init_db()
+
+def post_worker_init(worker):
+    # Every worker takes part in the election; only the lock holder collects.
+    # With an external collector process the workers only serve requests.
+    if API_READ_ONLY or COLLECTOR_MODE != "embedded":
+        return
+    from collector import start_leader_election
+    start_leader_election()
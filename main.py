@@ -1,4 +1,20 @@
-from api.routes import app
+import sys
+from config import SERVER_MODE, API_READ_ONLY, COLLECTOR_MODE
+
+def run_production():
+    # Multi-process gthread workers; see gunicorn.conf.py for sizing and hooks
+    from gunicorn.app.wsgiapp import run
+    sys.argv = ["gunicorn", "-c", "gunicorn.conf.py", "api.routes:app"]
+    run()
 
 if __name__ == "__main__":
-    app.run(debug=False, port=5000, host="0.0.0.0")
\ No newline at end of file
+    if SERVER_MODE == "production":
+        run_production()
+    else:
+        from database.db import init_db
+        from api.routes import app
+        init_db()
+        if not API_READ_ONLY and COLLECTOR_MODE == "embedded":
+            from collector import start_leader_election
+            start_leader_election()
+        app.run(debug=False, port=5000, host="0.0.0.0")
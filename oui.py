@@ -0,0 +1,176 @@
+"""
+Memory-mapped MAC vendor (OUI) index.
+
+The index is built offline from the IEEE registry files (MA-L oui.csv,
+MA-M mam.csv, MA-S oui36.csv, or the classic oui.txt) into one compact
+file:
+
+    header   "OUIX", version, then (prefix bits, count, offset) per section
+    sections sorted (prefix u64, vendor offset u32) records for 36, 28 and
+             24 bit prefixes, most specific first
+    strings  deduplicated, length-prefixed UTF-8 vendor names
+
+Lookups mmap the file read-only (so all workers share the same page-cache
+pages), then binary-search each section with struct.unpack_from: no
+parsing at startup and no per-process dict.
+
+    python -m oui build oui.csv mam.csv oui36.csv -o oui.idx
+    python -m oui lookup 00:1A:2B:3C:4D:5E
+"""
+import argparse
+import csv
+import mmap
+import re
+import struct
+import threading
+from config import OUI_INDEX_FILE
+
+MAGIC = b"OUIX"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+SECTION = struct.Struct("<BxxxII")
+RECORD = struct.Struct("<QI")
+STRING_LENGTH = struct.Struct("<H")
+PREFIX_BITS = (36, 28, 24)  # MA-S, MA-M, MA-L
+
+REGISTRY_BITS = {"MA-L": 24, "MA-M": 28, "MA-S": 36}
+_OUI_TXT_RE = re.compile(r"^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$")
+
+def mac_to_int(mac: str):
+    digits = re.sub(r"[^0-9A-Fa-f]", "", mac or "")
+    if len(digits) != 12:
+        return None
+    return int(digits, 16)
+
+def read_registry(path: str):
+    """Yield (prefix bits, prefix value, organization) from an IEEE CSV or oui.txt file."""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        if first.startswith("Registry"):
+            for row in csv.DictReader(f):
+                bits = REGISTRY_BITS.get(row.get("Registry", "").strip())
+                assignment = row.get("Assignment", "").strip()
+                if bits and assignment:
+                    yield bits, int(assignment, 16), row.get("Organization Name", "").strip()
+        else:
+            for line in f:
+                match = _OUI_TXT_RE.match(line)
+                if match:
+                    yield 24, int("".join(match.group(1, 2, 3)), 16), match.group(4)
+
+def build_index(sources: list[str], output: str) -> int:
+    """Write the index file; returns the number of prefixes."""
+    sections = {bits: {} for bits in PREFIX_BITS}
+    for path in sources:
+        for bits, prefix, organization in read_registry(path):
+            sections[bits][prefix] = organization
+
+    strings = bytearray()
+    string_offsets = {}
+    def string_offset(name: str) -> int:
+        if name not in string_offsets:
+            encoded = name.encode("utf-8")[:65535]
+            string_offsets[name] = len(strings)
+            strings.extend(STRING_LENGTH.pack(len(encoded)))
+            strings.extend(encoded)
+        return string_offsets[name]
+
+    offset = HEADER.size + SECTION.size * len(PREFIX_BITS) + 4
+    section_headers = []
+    records = bytearray()
+    for bits in PREFIX_BITS:
+        entries = sorted(sections[bits].items())
+        section_headers.append(SECTION.pack(bits, len(entries), offset + len(records)))
+        for prefix, organization in entries:
+            records.extend(RECORD.pack(prefix, string_offset(organization)))
+    strings_offset = offset + len(records)
+
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(PREFIX_BITS)))
+        for header in section_headers:
+            f.write(header)
+        f.write(struct.pack("<I", strings_offset))
+        f.write(records)
+        f.write(strings)
+    return sum(len(entries) for entries in sections.values())
+
+class OUIIndex:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, section_count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an OUI index (version {VERSION})")
+        self.sections = [
+            SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size) for i in range(section_count)
+        ]
+        (self.strings_offset,) = struct.unpack_from("<I", self.map, HEADER.size + section_count * SECTION.size)
+
+    def _search(self, offset: int, count: int, key: int):
+        low, high = 0, count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            prefix, name_offset = RECORD.unpack_from(self.map, offset + middle * RECORD.size)
+            if prefix < key:
+                low = middle + 1
+            elif prefix > key:
+                high = middle - 1
+            else:
+                return name_offset
+        return None
+
+    def _string(self, name_offset: int) -> str:
+        position = self.strings_offset + name_offset
+        (length,) = STRING_LENGTH.unpack_from(self.map, position)
+        start = position + STRING_LENGTH.size
+        return self.map[start:start + length].decode("utf-8")
+
+    def lookup(self, mac: str):
+        """Vendor of a MAC address, most specific registration first; None if unknown."""
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        for bits, count, offset in self.sections:
+            name_offset = self._search(offset, count, value >> (48 - bits))
+            if name_offset is not None:
+                return self._string(name_offset)
+        return None
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+def lookup_vendor(mac: str):
+    """Vendor for a MAC using OUI_INDEX_FILE; None when unknown or no index is installed."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                try:
+                    _index = OUIIndex(OUI_INDEX_FILE)
+                except (OSError, ValueError) as e:
+                    print(f"OUI: vendor lookup disabled ({e})")
+                    _index = None
+                _index_loaded = True
+    return _index.lookup(mac) if _index else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the MAC vendor index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="build the index from IEEE registry files")
+    build.add_argument("sources", nargs="+", help="oui.csv / mam.csv / oui36.csv / oui.txt")
+    build.add_argument("-o", "--output", default=OUI_INDEX_FILE)
+    lookup = subparsers.add_parser("lookup", help="look up MAC addresses")
+    lookup.add_argument("macs", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.sources, args.output)
+        print(f"Wrote {count} prefixes to {args.output}.")
+    else:
+        for mac in args.macs:
+            print(f"{mac}\t{lookup_vendor(mac) or '--'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Router access governor shared by every scraping entry point.
+
+The ONT only tolerates a few admin sessions, and a new root login kicks
+out the others. Every caller that talks to the router (collector, manual
+collect endpoints, /router/summary) therefore opens it through
+router_session(), which
+
+- holds one of ROUTER_MAX_SESSIONS session slots from login to quit.
+  Slots are flocks on files in ROUTER_GOVERNOR_DIR, so they are shared by
+  the collector process and every API worker, and the kernel frees a slot
+  when its holder dies;
+- gives interactive callers priority: while one waits for a slot it holds
+  a shared flock on interactive.lock, and background callers do not take a
+  free slot as long as that lock is held. A background session also checks
+  that lock before every page load; if an interactive caller is waiting, it
+  quits the browser, hands its slot over, and logs in again once it gets a
+  slot back. A long scan therefore delays /router/summary by at most one
+  page load, even with a single slot;
+- paces page loads with a token bucket (ROUTER_PAGES_PER_SECOND, bursts
+  of ROUTER_PAGE_BURST) kept in a small flocked file, so the rate limit
+  holds across processes too. RouterScraper calls throttle_page_load()
+  before every navigation.
+
+Slot and throttle waits are added to scraper.phase_seconds (slot_wait,
+throttle), so they end up in the run ledger, and this process's waits are
+summarised by governor_stats().
+"""
+import fcntl
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from config import (
+    ROUTER_URL, USERNAME, PASSWORD, ROUTER_GOVERNOR_DIR, ROUTER_MAX_SESSIONS,
+    ROUTER_PAGES_PER_SECOND, ROUTER_PAGE_BURST, ROUTER_SLOT_TIMEOUT_SECONDS
+)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+POLL_SECONDS = 0.2
+RECENT_WAITS = 1000
+
+_stats_lock = threading.Lock()
+_waits = {priority: deque(maxlen=RECENT_WAITS) for priority in PRIORITIES}
+_counters = {priority: {"acquired": 0, "timed_out": 0, "handed_over": 0, "wait_seconds_total": 0.0} for priority in PRIORITIES}
+_throttle = {"pages": 0, "throttled": 0, "wait_seconds_total": 0.0}
+_held = 0
+
+class RouterBusyError(RuntimeError):
+    pass
+
+def _path(name: str) -> str:
+    os.makedirs(ROUTER_GOVERNOR_DIR, exist_ok=True)
+    return os.path.join(ROUTER_GOVERNOR_DIR, name)
+
+def _interactive_waiting() -> bool:
+    with open(_path("interactive.lock"), "a+") as marker:
+        try:
+            fcntl.flock(marker.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(marker.fileno(), fcntl.LOCK_UN)
+        return False
+
+def _try_slot():
+    for i in range(max(ROUTER_MAX_SESSIONS, 1)):
+        slot = open(_path(f"slot_{i}.lock"), "a+")
+        try:
+            fcntl.flock(slot.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return slot
+        except OSError:
+            slot.close()
+    return None
+
+def _record_wait(priority: str, waited: float, acquired: bool):
+    with _stats_lock:
+        counters = _counters[priority]
+        counters["acquired" if acquired else "timed_out"] += 1
+        counters["wait_seconds_total"] += waited
+        _waits[priority].append(waited)
+
+def acquire_slot(priority: str = BACKGROUND, timeout: float = None, cancel_event: threading.Event = None):
+    """
+    Block until a session slot is free and return (slot file, seconds waited).
+    Raises RouterBusyError after timeout seconds or once cancel_event is set.
+    """
+    global _held
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    started = time.monotonic()
+    marker = None
+    if priority == INTERACTIVE:
+        marker = open(_path("interactive.lock"), "a+")
+        fcntl.flock(marker.fileno(), fcntl.LOCK_SH)
+    try:
+        while True:
+            if priority == INTERACTIVE or not _interactive_waiting():
+                slot = _try_slot()
+                if slot is not None:
+                    waited = time.monotonic() - started
+                    _record_wait(priority, waited, acquired=True)
+                    with _stats_lock:
+                        _held += 1
+                    return slot, waited
+            waited = time.monotonic() - started
+            if cancel_event is not None and cancel_event.is_set():
+                _record_wait(priority, waited, acquired=False)
+                raise RouterBusyError("cancelled while waiting for a router session slot")
+            if timeout is not None and waited >= timeout:
+                _record_wait(priority, waited, acquired=False)
+                raise RouterBusyError(
+                    f"router busy: no session slot free after {waited:.1f}s ({ROUTER_MAX_SESSIONS} allowed)"
+                )
+            time.sleep(POLL_SECONDS)
+    finally:
+        if marker is not None:
+            marker.close()  # drops the shared lock
+
+def release_slot(slot):
+    global _held
+    fcntl.flock(slot.fileno(), fcntl.LOCK_UN)
+    slot.close()
+    with _stats_lock:
+        _held -= 1
+
+def _take_token() -> float:
+    """Take one page token from the shared bucket; return 0, or the seconds until one is available."""
+    with open(_path("bucket"), "a+") as bucket:
+        fcntl.flock(bucket.fileno(), fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            burst = max(float(ROUTER_PAGE_BURST), 1.0)
+            bucket.seek(0)
+            try:
+                tokens, updated_at = (float(v) for v in bucket.read().split())
+            except ValueError:
+                tokens, updated_at = burst, now
+            tokens = min(burst, tokens + max(now - updated_at, 0.0) * ROUTER_PAGES_PER_SECOND)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / ROUTER_PAGES_PER_SECOND
+            bucket.seek(0)
+            bucket.truncate()
+            bucket.write(f"{tokens} {now}")
+            bucket.flush()
+            return wait
+        finally:
+            fcntl.flock(bucket.fileno(), fcntl.LOCK_UN)
+
+def throttle_page_load() -> float:
+    """Wait for a page-load token; returns the seconds spent waiting."""
+    if ROUTER_PAGES_PER_SECOND <= 0:
+        return 0.0
+    waited = 0.0
+    while True:
+        wait = _take_token()
+        if wait <= 0:
+            break
+        time.sleep(wait)
+        waited += wait
+    with _stats_lock:
+        _throttle["pages"] += 1
+        _throttle["throttled"] += waited > 0
+        _throttle["wait_seconds_total"] += waited
+    return waited
+
+@contextmanager
+def router_session(priority: str = BACKGROUND, timeout: float = None, cancel_event: threading.Event = None):
+    """
+    Yield a logged-in RouterScraper while holding a session slot; the
+    browser is quit and the slot released when the block exits.
+    Interactive callers give up after ROUTER_SLOT_TIMEOUT_SECONDS unless a
+    timeout is passed; background callers wait until cancel_event is set,
+    and hand their slot to waiting interactive callers between page loads.
+    """
+    from .scraper import RouterScraper
+    if timeout is None and priority == INTERACTIVE:
+        timeout = ROUTER_SLOT_TIMEOUT_SECONDS
+    slot, waited = acquire_slot(priority, timeout, cancel_event)
+    scraper = None
+
+    def hand_over():
+        nonlocal slot
+        if not _interactive_waiting():
+            return
+        # A new login would kick this session out anyway, so quit it before giving the slot away
+        scraper.quit()
+        release_slot(slot)
+        slot = None
+        with _stats_lock:
+            _counters[priority]["handed_over"] += 1
+        slot, waited = acquire_slot(priority, timeout, cancel_event)
+        scraper.phase_seconds["slot_wait"] += waited
+        scraper.open_browser()
+        scraper.login(USERNAME, PASSWORD)
+
+    try:
+        scraper = RouterScraper(ROUTER_URL)
+        scraper.phase_seconds["slot_wait"] += waited
+        scraper.login(USERNAME, PASSWORD)
+        if priority == BACKGROUND:
+            scraper.before_page = hand_over
+        yield scraper
+    finally:
+        if scraper:
+            scraper.quit()
+        if slot is not None:
+            release_slot(slot)
+
+def _wait_percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(list(values), (50, 95, 99))
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(max(values), 3)}
+
+def governor_stats() -> dict:
+    """Limits plus this process's slot waits (last RECENT_WAITS per priority) and page throttling."""
+    with _stats_lock:
+        return {
+            "pid": os.getpid(),
+            "max_sessions": ROUTER_MAX_SESSIONS,
+            "pages_per_second": ROUTER_PAGES_PER_SECOND,
+            "page_burst": ROUTER_PAGE_BURST,
+            "sessions_held": _held,
+            "slots": {
+                priority: dict(_counters[priority], wait_seconds_total=round(_counters[priority]["wait_seconds_total"], 3),
+                               wait_seconds=_wait_percentiles(_waits[priority]))
+                for priority in PRIORITIES
+            },
+            "page_throttle": dict(_throttle, wait_seconds_total=round(_throttle["wait_seconds_total"], 3)),
+        }
@@ -0,0 +1,171 @@
+"""
+Decode data arrays embedded in the router's ASP pages as inline JavaScript.
+
+The ONT pages ship their tables as script literals such as
+
+    function USERDevice(Domain, IpAddr, MacAddr, PortType, DevStatus, IpType, Time, HostName, ...) { ... }
+    var UserDevinfo = new Array(new USERDevice("InternetGatewayDevice.LANDevice.1.X_HW_UserDev.1","192.168.1.3",...), null);
+
+This module tokenizes that source directly (no DOM, no JS engine) and
+turns array literals into Python lists, with `new Ctor(...)` elements
+returned as JSCall(name, args) so callers can map them onto the
+constructor's parameter names.
+"""
+import re
+from collections import namedtuple
+
+JSCall = namedtuple("JSCall", ["name", "args"])
+
+class JSParseError(ValueError):
+    pass
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>-?(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?))
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<punct>[()\[\]{},;:+.=])
+""", re.VERBOSE | re.DOTALL)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0"}
+_ESCAPE_RE = re.compile(r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|.)", re.DOTALL)
+
+_ARRAY_DECL_RE = re.compile(r"\b([A-Za-z_$][\w$]*)\s*=\s*(?=new\s+Array\s*\(|\[)")
+_FUNCTION_RE = re.compile(r"\bfunction\s+([A-Za-z_$][\w$]*)\s*\(([^)]*)\)")
+
+def _unescape(literal: str) -> str:
+    def replace(match):
+        esc = match.group(1)
+        if esc[0] in "xu" and len(esc) > 1:
+            return chr(int(esc[1:], 16))
+        return _ESCAPES.get(esc, esc)
+    return _ESCAPE_RE.sub(replace, literal[1:-1])
+
+def _number(literal: str):
+    if literal.lower().lstrip("-").startswith("0x"):
+        return int(literal, 16)
+    if any(c in literal for c in ".eE"):
+        return float(literal)
+    return int(literal)
+
+def tokenize(source: str, pos: int = 0):
+    """Yield (kind, value, end_position) tokens, skipping whitespace and comments."""
+    length = len(source)
+    while pos < length:
+        match = _TOKEN_RE.match(source, pos)
+        if not match:
+            # Not part of a literal (e.g. the closing </script>); the parser
+            # only fails if it actually needs this token
+            pos += 1
+            yield "other", source[pos - 1], pos
+            continue
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "ws":
+            continue
+        yield kind, match.group(kind), pos
+
+class _Parser:
+    def __init__(self, source: str, pos: int):
+        self.tokens = tokenize(source, pos)
+        self.current = next(self.tokens, None)
+
+    def advance(self):
+        token = self.current
+        self.current = next(self.tokens, None)
+        return token
+
+    def expect(self, value: str):
+        token = self.advance()
+        if token is None or token[1] != value:
+            raise JSParseError(f"Expected {value!r}, got {token[1] if token else 'end of input'!r}")
+
+    def parse_list(self, closing: str) -> list:
+        items = []
+        while self.current and self.current[1] != closing:
+            items.append(self.parse_value())
+            if self.current and self.current[1] == ",":
+                self.advance()
+        self.expect(closing)
+        return items
+
+    def parse_value(self):
+        value = self.parse_atom()
+        # String concatenation ("a" + "b") is common in generated pages
+        while self.current and self.current[1] == "+":
+            self.advance()
+            value = f"{value}{self.parse_atom()}"
+        return value
+
+    def parse_atom(self):
+        token = self.advance()
+        if token is None:
+            raise JSParseError("Unexpected end of input")
+        kind, value, _ = token
+        if kind == "string":
+            return _unescape(value)
+        if kind == "number":
+            return _number(value)
+        if value == "[":
+            return self.parse_list("]")
+        if value == "{":
+            return self.parse_object()
+        if kind == "name":
+            if value in ("null", "undefined"):
+                return None
+            if value in ("true", "false"):
+                return value == "true"
+            if value == "new":
+                name = self.advance()[1]
+                self.expect("(")
+                args = self.parse_list(")")
+                return args if name == "Array" else JSCall(name, args)
+            if self.current and self.current[1] == "(":
+                self.advance()
+                return JSCall(value, self.parse_list(")"))
+            return value  # bare identifier; callers treat it as opaque
+        raise JSParseError(f"Unexpected token {value!r}")
+
+    def parse_object(self) -> dict:
+        result = {}
+        while self.current and self.current[1] != "}":
+            key = self.advance()[1]
+            if key[0] in "\"'":
+                key = _unescape(key)
+            self.expect(":")
+            result[key] = self.parse_value()
+            if self.current and self.current[1] == ",":
+                self.advance()
+        self.expect("}")
+        return result
+
+def parse_js_value(source: str, pos: int = 0):
+    return _Parser(source, pos).parse_value()
+
+def find_arrays(html: str) -> dict[str, list]:
+    """All `name = new Array(...)` / `name = [...]` literals in the page, by variable name."""
+    arrays = {}
+    for match in _ARRAY_DECL_RE.finditer(html):
+        try:
+            value = parse_js_value(html, match.end())
+        except (JSParseError, StopIteration, TypeError):
+            continue
+        if isinstance(value, list):
+            arrays[match.group(1)] = value
+    return arrays
+
+def find_constructors(html: str) -> dict[str, list[str]]:
+    """Parameter names of every `function Name(a, b, ...)` declared in the page."""
+    return {
+        name: [param.strip() for param in params.split(",") if param.strip()]
+        for name, params in _FUNCTION_RE.findall(html)
+    }
+
+def records_from_array(items: list, constructors: dict[str, list[str]]) -> list[dict]:
+    """Turn `new Ctor(...)` elements into dicts keyed by the constructor's parameter names."""
+    records = []
+    for item in items:
+        if not isinstance(item, JSCall) or item.name not in constructors:
+            continue
+        records.append(dict(zip(constructors[item.name], item.args)))
+    return records
@@ -1,5 +1,6 @@
 from bs4 import BeautifulSoup
 from .data_models import DeviceInfo
+from .jsarrays import find_arrays, find_constructors, records_from_array
 import re
 
 def parse_device_list(html: str):
@@ -50,6 +51,66 @@ def parse_device_details(html: str) -> DeviceInfo:
         duration=online_minutes
     )
 
+# The list page declares its hosts as `new USERDevice(...)` elements; these are
+# the constructor parameters behind each DeviceInfo field. Domain is the
+# host's TR-069 object path, not a name.
+JS_DEVICE_CONSTRUCTOR = "USERDevice"
+JS_DEVICE_FIELDS = {
+    "hostname": "HostName",
+    "ip": "IpAddr",
+    "mac": "MacAddr",
+    "port_type": "PortType",
+    "status": "DevStatus",
+    "duration": "Time",
+}
+
+def _js_text(record: dict, field: str) -> str:
+    return str(record[JS_DEVICE_FIELDS[field]] or "--").strip()
+
+def _js_duration_minutes(value) -> int:
+    # Numeric values are seconds; text looks like the detail page ("5 hours 41 minutes")
+    if isinstance(value, (int, float)):
+        return int(value) // 60
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip()) // 60
+    return parse_duration_to_minutes(value or "")
+
+def parse_device_list_js(html: str):
+    """
+    Full device records from the list page's inline USERDevice array, or None
+    when the page has no such array or its constructor lacks one of the
+    JS_DEVICE_FIELDS parameters (callers then fall back to the per-device
+    detail pages).
+    """
+    params = find_constructors(html).get(JS_DEVICE_CONSTRUCTOR)
+    if params is None:
+        return None
+    missing = [name for name in JS_DEVICE_FIELDS.values() if name not in params]
+    if missing:
+        print(f"{JS_DEVICE_CONSTRUCTOR}() has no {', '.join(missing)} parameter; reading detail pages instead.")
+        return None
+
+    constructors = {JS_DEVICE_CONSTRUCTOR: params}
+    for items in find_arrays(html).values():
+        records = records_from_array(items, constructors)
+        if not records:
+            continue
+        if any(name not in r for r in records for name in JS_DEVICE_FIELDS.values()):
+            print(f"{JS_DEVICE_CONSTRUCTOR} entries stop before the device fields; reading detail pages instead.")
+            return None
+        return [
+            DeviceInfo(
+                hostname=_js_text(r, "hostname"),
+                ip=_js_text(r, "ip"),
+                mac=_js_text(r, "mac"),
+                port_type=_js_text(r, "port_type"),
+                status=_js_text(r, "status"),
+                duration=_js_duration_minutes(r[JS_DEVICE_FIELDS["duration"]])
+            )
+            for r in records
+        ]
+    return None
+
 def parse_duration_to_minutes(duration_str: str) -> int:
     """Parses a duration like '5 hours 41 minutes' into total minutes."""
     hours = 0
@@ -194,7 +255,7 @@ def parse_wlan_packets(html: str):
             wlan_info.append(wlan_entry)
     
     enc_table = soup.find("table", id="wlan_ssidinfo_table")
-    if not table:
+    if not enc_table:
         return wlan_info
 
     rows = enc_table.find_all("tr")[1:]  # Skip header rows
@@ -0,0 +1,199 @@
+"""
+Rebuild scans from the raw page archive without touching the router.
+
+Each archived scan is reparsed in a worker process by running the normal
+RouterScraper page walk against the stored pages, so parser fixes apply
+to history exactly as they would to a live scan. The parent process
+writes the results back through ScanWriter, oldest scan first.
+
+    python -m router.replay                      # every archived scan
+    python -m router.replay --since 2025-06-01 --workers 4
+    python -m router.replay --scan 812 --dry-run # parse and report only
+
+Scans whose archive is incomplete (for example a scan that was
+interrupted before the neighbor page) only have the parts rewritten that
+were fully archived.
+"""
+import argparse
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from config import DEVICE_SESSIONS_ENABLED
+from analytics.sketches import rebuild_daily_sketches
+from database.activity import rebuild_activity
+from database.db import SessionLocal, engine, init_db
+from database.page_archive import load_scan_pages, archived_scans, archive_stats
+from database.presence import backfill_presence_intervals
+from database.scan_writer import ScanWriter
+from database.shards import is_sealed
+from .data_models import DeviceInfo
+from .parser import parse_neighbor_aps
+from .scraper import RouterScraper, NEIGHBOR_AP_PAGE
+
+class ArchivedScraper(RouterScraper):
+    """RouterScraper that serves pages from a scan's archive instead of a browser."""
+
+    def __init__(self, pages: dict[str, str]):
+        self.pages = pages
+        self.device_cursor = (1, 0, 0)
+        self.page_sink = None
+
+    def login(self, username: str, password: str):
+        pass
+
+    def get_page_html(self, path: str) -> str:
+        return self.pages[path]  # KeyError: the page was never archived
+
+    def iter_neighboring_aps(self):
+        yield from parse_neighbor_aps(self.pages[NEIGHBOR_AP_PAGE])
+
+    def quit(self):
+        pass
+
+@dataclass
+class ReplayResult:
+    scan_id: int
+    devices: list[tuple[DeviceInfo, tuple]] = field(default_factory=list)
+    networks: list[dict] = field(default_factory=list)
+    devices_complete: bool = False
+    networks_complete: bool = False
+    error: str = None
+
+def _init_worker():
+    # Never reuse the parent's pooled SQLite connections after fork
+    engine.dispose(close=False)
+
+def _parts(kind: str) -> tuple[bool, bool]:
+    """(devices, networks) covered by a scan of this kind; older scans have none and are full."""
+    return kind in (None, "full", "devices"), kind in (None, "full", "networks")
+
+def parse_archived_scan(scan_id: int, kind: str = "full") -> ReplayResult:
+    db = SessionLocal()
+    try:
+        pages = load_scan_pages(db, scan_id)
+    finally:
+        db.close()
+
+    result = ReplayResult(scan_id)
+    scraper = ArchivedScraper(pages)
+    scan_devices, scan_networks = _parts(kind)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if scan_devices:
+            try:
+                for device in scraper.iter_devices():
+                    result.devices.append((device, scraper.device_cursor))
+                result.devices_complete = True
+            except KeyError as e:
+                result.error = f"device page {e.args[0]} not archived"
+            except Exception as e:
+                result.error = f"device pages: {e}"
+
+        if scan_networks:
+            try:
+                result.networks = list(scraper.iter_neighboring_aps())
+                result.networks_complete = True
+            except KeyError:
+                result.error = result.error or "neighbor page not archived"
+            except Exception as e:
+                result.error = result.error or f"neighbor page: {e}"
+    return result
+
+def write_result(db, scan, result: ReplayResult):
+    writer = ScanWriter.rewrite(db, scan, devices=result.devices_complete)
+    if result.devices_complete:
+        for device, cursor in result.devices:
+            writer.add_device(device, cursor)
+        writer.complete_devices()
+    if result.networks_complete:
+        writer.begin_networks()
+        for net in result.networks:
+            writer.add_network(net)
+        writer.complete_networks()
+
+    scan_devices, scan_networks = _parts(scan.kind)
+    if (scan.devices_complete or not scan_devices) and (scan.networks_complete or not scan_networks):
+        scan.status = "complete"
+    else:
+        scan.status = "interrupted"
+        scan.error = result.error
+    writer.checkpoint()
+
+def replay(start: datetime = None, end: datetime = None, scan_ids: list[int] = None, workers: int = None, dry_run: bool = False) -> dict:
+    db = SessionLocal()
+    scans = archived_scans(db, start, end, scan_ids)
+    by_id = {scan.id: scan for scan in scans}
+    print(f"Replaying {len(scans)} archived scan(s)...")
+
+    totals = {"scans": 0, "devices": 0, "networks": 0, "incomplete": 0, "sealed": 0}
+    devices_rewritten = False
+    rewritten_days = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        kinds = [scan.kind for scan in by_id.values()]
+        for result in pool.map(parse_archived_scan, list(by_id), kinds, chunksize=4):
+            scan = by_id[result.scan_id]
+            if is_sealed(scan.started_at):
+                # Sealed shards are read-only; rewriting would duplicate their rows in the main database
+                print(f"Scan {scan.id} ({scan.started_at}): month is sealed, skipped")
+                totals["sealed"] += 1
+                continue
+            totals["scans"] += 1
+            totals["devices"] += len(result.devices)
+            totals["networks"] += len(result.networks)
+            if result.error:
+                totals["incomplete"] += 1
+                print(f"Scan {scan.id} ({scan.started_at}): {result.error}")
+            if not dry_run:
+                write_result(db, scan, result)
+                devices_rewritten = devices_rewritten or result.devices_complete
+                rewritten_days.add(scan.started_at.date())
+    db.close()
+
+    if rewritten_days:
+        # Sketches cannot take rows back out, so every day that was rewritten is rebuilt whole
+        written = rebuild_daily_sketches(min(rewritten_days), max(rewritten_days))
+        print(f"Rebuilt {written} daily sketch(es).")
+
+    if devices_rewritten:
+        if DEVICE_SESSIONS_ENABLED:
+            print(f"Rebuilt {backfill_presence_intervals()} presence interval(s).")
+            written = rebuild_activity(min(rewritten_days), max(rewritten_days))
+            print(f"Rebuilt {written} device activity row(s).")
+        else:
+            print("Device sessions are disabled; presence intervals and device activity were left unchanged.")
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Reparse archived router pages into the database.")
+    parser.add_argument("--since", help="only scans started at or after this time (ISO 8601)")
+    parser.add_argument("--until", help="only scans started at or before this time (ISO 8601)")
+    parser.add_argument("--scan", type=int, action="append", dest="scan_ids", help="scan id (repeatable)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes")
+    parser.add_argument("--dry-run", action="store_true", help="parse and report without writing")
+    parser.add_argument("--stats", action="store_true", help="print archive size and exit")
+    args = parser.parse_args()
+
+    init_db()
+    if args.stats:
+        db = SessionLocal()
+        print(archive_stats(db))
+        db.close()
+        return
+
+    totals = replay(
+        start=datetime.fromisoformat(args.since) if args.since else None,
+        end=datetime.fromisoformat(args.until) if args.until else None,
+        scan_ids=args.scan_ids,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+    print(
+        f"Replayed {totals['scans']} scan(s): {totals['devices']} device record(s), "
+        f"{totals['networks']} network record(s), {totals['incomplete']} incomplete, "
+        f"{totals['sealed']} skipped in sealed months."
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,74 @@
 import time
+from collections import defaultdict
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.service import Service
-from .parser import parse_device_list, parse_device_details, extract_total_pages, parse_dhcp_server_info, parse_wlan_packets, parse_eth_packets, parse_device_name, parse_dhcp_info
+from .parser import parse_device_list, parse_device_list_js, parse_device_details, extract_total_pages, parse_dhcp_server_info, parse_wlan_packets, parse_eth_packets, parse_device_name, parse_dhcp_info
 from .data_models import DeviceInfo
 from .parser import parse_neighbor_aps
 from selenium.webdriver.firefox.options import Options  
+from config import SCRAPE_INLINE_JS
+from .governor import throttle_page_load
+
+# Archive key of the neighbor AP table, captured after clicking Query on the WLAN info page
+NEIGHBOR_AP_PAGE = "html/amp/wlaninfo/wlaninfo.asp#neighbor_aps"
+
+def _page_phase(path: str) -> str:
+    if path.startswith("html/bbsp/userdevinfo/userdetdevinfo.asp"):
+        return "detail_pages"
+    if path.startswith("html/bbsp/userdevinfo/userdevinfo.asp"):
+        return "list_pages"
+    return "other_pages"
 
 class RouterScraper:
     def __init__(self, base_url: str):
         self.base_url = base_url
+        self.driver = None
+        self.open_browser()
+        self.device_cursor = (1, 0, 0)
+        self.page_sink = None  # optional callable(path, html) receiving every fetched page
+        self.before_page = None  # optional callable run before every navigation; the governor hands the slot over there
+        self.pages_fetched = 0
+        # login, list_pages, detail_pages, neighbor_query, other_pages, plus slot_wait/throttle from the governor
+        self.phase_seconds = defaultdict(float)
+    
+    def open_browser(self):
         options = Options()
         options.headless = True
         self.driver = webdriver.Firefox(options=options)
-    
+
     def login(self, username: str, password: str):
+        self.phase_seconds["throttle"] += throttle_page_load()
+        start = time.perf_counter()
         self.driver.get(self.base_url)
         time.sleep(1)
         self.driver.find_element(By.ID, "txt_Username").send_keys(username)
         self.driver.find_element(By.ID, "txt_Password").send_keys(password)
         self.driver.find_element(By.ID, "button").click()
         time.sleep(2)
+        self.phase_seconds["login"] += time.perf_counter() - start
 
     def get_page_html(self, path: str) -> str:
+        if self.before_page:
+            self.before_page()
+        self.phase_seconds["throttle"] += throttle_page_load()
+        start = time.perf_counter()
         self.driver.get(f"{self.base_url}/{path}")
         time.sleep(2)
-        return self.driver.page_source
+        html = self.driver.page_source
+        self.pages_fetched += 1
+        self.phase_seconds[_page_phase(path)] += time.perf_counter() - start
+        if self.page_sink:
+            self.page_sink(path, html)
+        return html
 
-    def scrape_neighboring_aps(self) -> list[dict]:
+    def iter_neighboring_aps(self):
+        """Yield neighbor AP records from the WLAN info page as they are parsed."""
+        if self.before_page:
+            self.before_page()
         print("[*] Navigating to WLAN info page...")
+        self.phase_seconds["throttle"] += throttle_page_load()
+        start = time.perf_counter()
         url = f"{self.base_url}/html/amp/wlaninfo/wlaninfo.asp"
         self.driver.get(url)
         time.sleep(1)
@@ -39,38 +79,90 @@ class RouterScraper:
             print("[+] Clicked Query button.")
         except Exception as e:
             print(f"[!] Could not click Query button: {e}")
-            return []
+            self.phase_seconds["neighbor_query"] += time.perf_counter() - start
+            return
 
         # Wait manually for content to load after clicking
         print("[*] Waiting for neighbor AP table to populate...")
         time.sleep(15)  # Increase if needed
 
         html = self.driver.page_source
-        return parse_neighbor_aps(html)
+        self.pages_fetched += 1
+        self.phase_seconds["neighbor_query"] += time.perf_counter() - start
+        if self.page_sink:
+            self.page_sink(NEIGHBOR_AP_PAGE, html)
+        yield from parse_neighbor_aps(html)
+
+    def scrape_neighboring_aps(self, stream: bool = False):
+        if stream:
+            return self.iter_neighboring_aps()
+        return list(self.iter_neighboring_aps())
+
+    def iter_devices(self, start_page: int = 1, page_start_index: int = 0, skip_in_page: int = 0):
+        """
+        Yield DeviceInfo records as each detail page is parsed.
 
-    def scrape_all(self):
+        Before every yield, self.device_cursor is set to the
+        (page, page_start_index, done_in_page) position just after that
+        record, so a caller that persisted it can resume from there.
+        """
         initial_html = self.get_page_html("html/bbsp/userdevinfo/userdevinfo.asp?1")
         total_pages = extract_total_pages(initial_html)
         print(f"Found {total_pages} page(s) of devices.")
 
-        all_devices: list[DeviceInfo] = []
-        global_index = 0
+        global_index = page_start_index
+        self.device_cursor = (start_page, page_start_index, skip_in_page)
 
-        for page in range(1, total_pages + 1):
+        seen_macs = set()
+
+        for page in range(start_page, total_pages + 1):
             print(f"Scraping page {page}...")
-            page_html = self.get_page_html(f"html/bbsp/userdevinfo/userdevinfo.asp?{page}")
-            device_list = parse_device_list(page_html)
+            if page == 1:
+                page_html = initial_html
+            else:
+                page_html = self.get_page_html(f"html/bbsp/userdevinfo/userdevinfo.asp?{page}")
+            page_start = global_index
+            skip = skip_in_page if page == start_page else 0
 
-            for _ in device_list:
-                detail_html = self.get_page_html(f"html/bbsp/userdevinfo/userdetdevinfo.asp?{global_index}?{page}")
+            # The list page's inline host array already carries every field,
+            # which saves one detail page load per device
+            inline_devices = parse_device_list_js(page_html) if SCRAPE_INLINE_JS else None
+            if inline_devices is not None:
+                for position in range(skip, len(inline_devices)):
+                    device_info = inline_devices[position]
+                    self.device_cursor = (page, page_start, position + 1)
+                    if device_info.mac in seen_macs:
+                        continue  # array repeated the hosts of an earlier page
+                    seen_macs.add(device_info.mac)
+                    print(device_info)
+                    yield device_info
+                global_index = page_start + len(inline_devices)
+                self.device_cursor = (page + 1, global_index, 0)
+                continue
+
+            device_list = parse_device_list(page_html)
+            for position in range(skip, len(device_list)):
+                index = page_start + position
+                detail_html = self.get_page_html(f"html/bbsp/userdevinfo/userdetdevinfo.asp?{index}?{page}")
                 device_info = parse_device_details(detail_html)
                 print(device_info)
-                all_devices.append(device_info)  # <<== missing line
-                global_index += 1
+                self.device_cursor = (page, page_start, position + 1)
+                yield device_info
+
+            global_index = page_start + len(device_list)
+            self.device_cursor = (page + 1, global_index, 0)
+
+    def scrape_all(self, stream: bool = False):
+        if stream:
+            return self.iter_devices()
+        all_devices: list[DeviceInfo] = list(self.iter_devices())
         print(all_devices)
         return all_devices
+
     def quit(self):
-        self.driver.quit()
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
 
     def scrape_router_summary(self) -> dict:
         summary = {}
@@ -0,0 +1,114 @@
+"""
+Immutable in-process snapshot of the latest scan.
+
+The collector (and the manual collect endpoints) publish a new ScanSnapshot
+after each successful commit; readers grab the current reference once and
+work on that object, so a swap never tears a request. The snapshot is also
+written to SNAPSHOT_FILE (atomic rename) so other worker processes pick it
+up by comparing the file's mtime, without a database query.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict, replace
+from datetime import datetime
+from config import SNAPSHOT_FILE
+
+@dataclass(frozen=True)
+class DeviceState:
+    id: int
+    hostname: str
+    ip: str
+    mac: str
+    port_type: str
+    online_duration: int
+
+@dataclass(frozen=True)
+class NetworkState:
+    id: int
+    ssid: str
+    mac: str
+    network_type: str
+    channel: int
+    signal_strength: str
+    auth_mode: str
+    working_mode: str
+    max_rate: str
+    observed_signal: int
+
+@dataclass(frozen=True)
+class ScanSnapshot:
+    devices_scanned_at: datetime = None
+    devices: tuple = ()
+    networks_scanned_at: datetime = None
+    networks: tuple = ()
+
+_current = None
+_loaded_mtime = None
+_publish_lock = threading.Lock()
+
+def device_state(device, online_duration: int) -> DeviceState:
+    return DeviceState(device.id, device.hostname, device.ip, device.mac, device.port_type, online_duration)
+
+def network_state(network, observed_signal: int) -> NetworkState:
+    signal_strength = str(network.signal_strength) if network.signal_strength is not None else None
+    return NetworkState(
+        network.id, network.ssid, network.mac, network.network_type, network.channel,
+        signal_strength, network.auth_mode, network.working_mode, network.max_rate, observed_signal
+    )
+
+def _to_json(snapshot: ScanSnapshot) -> dict:
+    return {
+        "devices_scanned_at": snapshot.devices_scanned_at.isoformat() if snapshot.devices_scanned_at else None,
+        "devices": [asdict(d) for d in snapshot.devices],
+        "networks_scanned_at": snapshot.networks_scanned_at.isoformat() if snapshot.networks_scanned_at else None,
+        "networks": [asdict(n) for n in snapshot.networks],
+    }
+
+def _from_json(data: dict) -> ScanSnapshot:
+    return ScanSnapshot(
+        devices_scanned_at=datetime.fromisoformat(data["devices_scanned_at"]) if data["devices_scanned_at"] else None,
+        devices=tuple(DeviceState(**d) for d in data["devices"]),
+        networks_scanned_at=datetime.fromisoformat(data["networks_scanned_at"]) if data["networks_scanned_at"] else None,
+        networks=tuple(NetworkState(**n) for n in data["networks"]),
+    )
+
+def _write_file(snapshot: ScanSnapshot):
+    global _loaded_mtime
+    tmp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_to_json(snapshot), f)
+    os.replace(tmp_path, SNAPSHOT_FILE)
+    _loaded_mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+
+def get_snapshot() -> ScanSnapshot:
+    """Latest published snapshot, or None if no scan has been published yet."""
+    global _current, _loaded_mtime
+    try:
+        mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return _current
+    if mtime != _loaded_mtime:
+        try:
+            with open(SNAPSHOT_FILE, encoding="utf-8") as f:
+                _current = _from_json(json.load(f))
+            _loaded_mtime = mtime
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Snapshot: could not load {SNAPSHOT_FILE}: {e}")
+    return _current
+
+def publish_snapshot(scanned_at: datetime, devices: list = None, networks: list = None) -> ScanSnapshot:
+    """Swap in a new snapshot; pass devices and/or networks for the parts that were scanned."""
+    global _current
+    with _publish_lock:
+        snapshot = get_snapshot() or ScanSnapshot()
+        if devices is not None:
+            snapshot = replace(snapshot, devices_scanned_at=scanned_at, devices=tuple(devices))
+        if networks is not None:
+            snapshot = replace(snapshot, networks_scanned_at=scanned_at, networks=tuple(networks))
+        _current = snapshot
+        try:
+            _write_file(snapshot)
+        except OSError as e:
+            print(f"Snapshot: could not write {SNAPSHOT_FILE}: {e}")
+    return snapshot
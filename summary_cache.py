@@ -0,0 +1,122 @@
+"""
+Shared, short-lived cache of the /router/summary scrape.
+
+A summary costs a browser start, a login and five page loads, and the
+router tolerates very few concurrent admin sessions. get_summary() therefore
+coalesces concurrent callers into one in-flight scrape (single flight) and
+keeps its result for SUMMARY_CACHE_TTL_SECONDS. For SUMMARY_STALE_SECONDS
+after that the previous summary is still served while one refresh runs in
+the background (stale-while-revalidate); older entries make the caller wait
+for a fresh scrape.
+
+The result is written to SUMMARY_CACHE_FILE (atomic rename) and the scrape
+itself runs under a flock on SUMMARY_LOCK_FILE, so worker processes share
+both the cached summary and the single flight: a process that waited for
+the lock reuses the summary another process just wrote instead of scraping
+again.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from config import SUMMARY_CACHE_TTL_SECONDS, SUMMARY_STALE_SECONDS, SUMMARY_CACHE_FILE, SUMMARY_LOCK_FILE
+
+_entry = None  # (fetched_at epoch seconds, summary dict)
+_loaded_mtime = None
+_flight = None
+_flight_lock = threading.Lock()
+
+class _Flight:
+    def __init__(self):
+        self.started_at = time.time()
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+def _load_entry():
+    """Newest cached entry, picking up summaries written by other processes."""
+    global _entry, _loaded_mtime
+    try:
+        mtime = os.stat(SUMMARY_CACHE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return _entry
+    if mtime != _loaded_mtime:
+        try:
+            with open(SUMMARY_CACHE_FILE, encoding="utf-8") as f:
+                data = json.load(f)
+            if _entry is None or data["fetched_at"] >= _entry[0]:
+                _entry = (data["fetched_at"], data["summary"])
+            _loaded_mtime = mtime
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Summary cache: could not load {SUMMARY_CACHE_FILE}: {e}")
+    return _entry
+
+def _store_entry(entry):
+    global _entry, _loaded_mtime
+    _entry = entry
+    tmp_path = f"{SUMMARY_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": entry[0], "summary": entry[1]}, f)
+        os.replace(tmp_path, SUMMARY_CACHE_FILE)
+        _loaded_mtime = os.stat(SUMMARY_CACHE_FILE).st_mtime_ns
+    except OSError as e:
+        print(f"Summary cache: could not write {SUMMARY_CACHE_FILE}: {e}")
+
+def _scrape(flight: _Flight, fetch):
+    global _flight
+    try:
+        with open(SUMMARY_LOCK_FILE, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                entry = _load_entry()
+                # Another process finished a scrape while we waited for the lock
+                if entry is None or entry[0] < flight.started_at:
+                    summary = fetch()
+                    entry = (time.time(), summary)
+                    _store_entry(entry)
+                flight.entry = entry
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    except Exception as e:
+        flight.error = e
+    finally:
+        with _flight_lock:
+            _flight = None
+        flight.done.set()
+
+def _join_flight(fetch, background: bool = False) -> _Flight:
+    """The scrape currently in flight, or a new one led by this thread (or a background thread)."""
+    global _flight
+    with _flight_lock:
+        if _flight is not None:
+            return _flight
+        flight = _flight = _Flight()
+    if background:
+        threading.Thread(target=_scrape, args=(flight, fetch), name="summary-refresh", daemon=True).start()
+    else:
+        _scrape(flight, fetch)
+    return flight
+
+def get_summary(fetch, force_refresh: bool = False) -> tuple[dict, float, str]:
+    """
+    Return (summary, age in seconds, cache state) where the state is "hit",
+    "stale" (served while a refresh runs) or "miss" (scraped for this call).
+    fetch() performs the actual scrape; its exceptions propagate to every
+    caller waiting on that flight.
+    """
+    entry = None if force_refresh else _load_entry()
+    if entry is not None:
+        age = time.time() - entry[0]
+        if age < SUMMARY_CACHE_TTL_SECONDS:
+            return entry[1], age, "hit"
+        if age < SUMMARY_CACHE_TTL_SECONDS + SUMMARY_STALE_SECONDS:
+            _join_flight(fetch, background=True)
+            return entry[1], age, "stale"
+
+    flight = _join_flight(fetch)
+    flight.done.wait()
+    if flight.error is not None:
+        raise flight.error
+    return flight.entry[1], time.time() - flight.entry[0], "miss"